@@ -0,0 +1,306 @@
+"""MarkItDown 转换器性能基准
+
+离线生成合成测试文件（xlsx / docx / pptx / pdf / csv），用与图形界面相同的转换逻辑
+逐个转换，记录墙钟时间、CPU 时间和峰值内存，并将结果写入 JSON 文件以便与基线比较。
+
+    python benchmark.py                          # 默认规模运行全部用例
+    python benchmark.py --xlsx-rows 200000 -o results.json
+    python benchmark.py --baseline baseline.json # 与基线比较，退化超出容差时返回 1
+
+xlsx 用例分别以 openpyxl（xlsx）和 lxml（xlsx_lxml）读取引擎各运行一次，并输出两者的速度比。
+"""
+import sys
+import os
+import json
+import time
+import random
+import fnmatch
+import platform
+import argparse
+import multiprocessing
+from pathlib import Path
+from datetime import datetime, timezone
+from importlib import metadata
+
+import converter
+
+
+# ===== 合成测试文件 =====
+_WORDS = ("alpha beta gamma delta epsilon zeta theta lambda sigma omega "
+          "数据 报告 季度 收入 成本 利润 客户 项目 进度 风险").split()
+
+
+def _sentence(rng, words=12):
+    return " ".join(rng.choice(_WORDS) for _ in range(words))
+
+
+def make_xlsx(path, rows, cols, sheets, rng):
+    """生成包含多个 sheet 的 xlsx，单元格混合数字、文本和空值"""
+    import openpyxl
+    workbook = openpyxl.Workbook(write_only=True)
+    for sheet_index in range(sheets):
+        worksheet = workbook.create_sheet(f"Sheet{sheet_index + 1}")
+        worksheet.append([f"列{c + 1}" for c in range(cols)])
+        for r in range(rows):
+            worksheet.append([
+                r * cols + c if c % 3 == 0 else
+                round(rng.random() * 1000, 2) if c % 3 == 1 else
+                (rng.choice(_WORDS) if rng.random() > 0.1 else None)
+                for c in range(cols)
+            ])
+    workbook.save(path)
+
+
+def make_docx(path, paragraphs, rng):
+    """生成包含大量段落和少量标题的 docx"""
+    import docx
+    document = docx.Document()
+    for i in range(paragraphs):
+        if i % 50 == 0:
+            document.add_heading(f"第 {i // 50 + 1} 节", level=1)
+        document.add_paragraph(_sentence(rng, 30))
+    document.save(path)
+
+
+def make_pptx(path, slides, rng):
+    """生成包含标题和正文的多页 pptx"""
+    import pptx
+    presentation = pptx.Presentation()
+    layout = presentation.slide_layouts[1]
+    for i in range(slides):
+        slide = presentation.slides.add_slide(layout)
+        slide.shapes.title.text = f"幻灯片 {i + 1}"
+        slide.placeholders[1].text = "\n".join(_sentence(rng, 8) for _ in range(5))
+    presentation.save(path)
+
+
+def make_pdf(path, pages, rng, lines_per_page=40):
+    """不依赖第三方库，直接写出一个每页若干行文本的多页 PDF"""
+    def escape(text):
+        return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+    ascii_words = [w for w in _WORDS if w.isascii()]
+    objects = []  # 第 i 个元素对应对象编号 i + 1
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    objects.append(None)  # 页面树，最后填写
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    page_ids = []
+    for page in range(pages):
+        lines = [f"Page {page + 1}"] + [" ".join(rng.choice(ascii_words) for _ in range(10))
+                                        for _ in range(lines_per_page)]
+        stream = "BT /F1 10 Tf 14 TL 50 780 Td " + " ".join(f"({escape(line)}) Tj T*" for line in lines) + " ET"
+        stream = stream.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream")
+        content_id = len(objects)
+        objects.append(b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                       b"/Resources << /Font << /F1 3 0 R >> >> /Contents %d 0 R >>" % content_id)
+        page_ids.append(len(objects))
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids).encode("ascii")
+    objects[1] = b"<< /Type /Pages /Kids [" + kids + b"] /Count %d >>" % pages
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for number, body in enumerate(objects, start=1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % number + body + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for offset in offsets:
+            f.write(b"%010d 00000 n \n" % offset)
+        f.write(b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref))
+
+
+def make_csv(path, rows, cols, rng):
+    """生成大 CSV 文件"""
+    with open(path, "w", encoding="utf-8", newline="") as f:
+        f.write(",".join(f"col{c + 1}" for c in range(cols)) + "\n")
+        for r in range(rows):
+            f.write(",".join(str(r * cols + c) if c % 2 else rng.choice(_WORDS) for c in range(cols)) + "\n")
+
+
+def generate_corpus(corpus_dir, args):
+    """按参数生成测试文件，返回 {用例名: 文件路径}；相同参数的文件已存在时直接复用"""
+    corpus_dir = Path(corpus_dir)
+    corpus_dir.mkdir(parents=True, exist_ok=True)
+    rng = random.Random(args.seed)
+    specs = {
+        "xlsx": (f"xlsx_{args.xlsx_rows}x{args.xlsx_cols}x{args.xlsx_sheets}.xlsx",
+                 lambda p: make_xlsx(p, args.xlsx_rows, args.xlsx_cols, args.xlsx_sheets, rng)),
+        "docx": (f"docx_{args.docx_paragraphs}.docx", lambda p: make_docx(p, args.docx_paragraphs, rng)),
+        "pptx": (f"pptx_{args.pptx_slides}.pptx", lambda p: make_pptx(p, args.pptx_slides, rng)),
+        "pdf": (f"pdf_{args.pdf_pages}.pdf", lambda p: make_pdf(p, args.pdf_pages, rng)),
+        "csv": (f"csv_{args.csv_rows}x{args.csv_cols}.csv", lambda p: make_csv(p, args.csv_rows, args.csv_cols, rng)),
+    }
+    corpus = {}
+    for name, (filename, make) in specs.items():
+        path = corpus_dir / f"seed{args.seed}_{filename}"
+        if not path.exists():
+            print(f"生成 {path.name} ...", file=sys.stderr)
+            temp_path = path.with_name(path.stem + ".tmp" + path.suffix)
+            make(temp_path)
+            os.replace(temp_path, path)
+        corpus[name] = str(path)
+    return corpus
+
+
+# ===== 测量 =====
+# 以其他 Excel 读取引擎重复测量的 xlsx 用例：{用例名: 引擎}，原 xlsx 用例固定使用 openpyxl
+XLSX_ENGINE_CASES = {"xlsx_lxml": "lxml"}
+
+
+def _measure_case(source, conn, excel_engine=None):
+    """在独立子进程中转换一次并回传测量结果，保证峰值内存互不影响"""
+    try:
+        md = converter.LazyMarkItDown()
+        excel_file = sheets = None
+        if Path(source).suffix.lower() == ".xlsx":
+            excel_file = source
+            sheets = list(converter._xlsx_sheet_parts(source))
+        else:
+            md.get()  # 初始化时间不计入转换耗时
+        rss_before = converter._current_rss_bytes()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        # 关闭 sheet 缓存，测量的是实际转换而不是缓存命中
+        markdown_content = converter.convert_source(md, source, excel_file, sheets, max_workers=1,
+                                                    sheet_cache=False, excel_engine=excel_engine)
+        conn.send({
+            "wall_seconds": time.perf_counter() - wall_start,
+            "cpu_seconds": time.process_time() - cpu_start,
+            "peak_rss_bytes": converter._peak_rss_bytes(),
+            "rss_before_bytes": rss_before,
+            "output_chars": len(markdown_content),
+        })
+    except Exception as e:
+        conn.send({"error": f"{type(e).__name__}: {e}"})
+    finally:
+        conn.close()
+
+
+def measure(source, repeat, excel_engine=None):
+    """重复转换 repeat 次，取墙钟时间的中位数所在的那次结果"""
+    context = multiprocessing.get_context("spawn")
+    runs = []
+    for _ in range(repeat):
+        parent_conn, child_conn = context.Pipe(duplex=False)
+        process = context.Process(target=_measure_case, args=(source, child_conn, excel_engine))
+        process.start()
+        child_conn.close()
+        try:
+            result = parent_conn.recv()
+        except EOFError:
+            result = {"error": f"测量进程异常退出（退出码 {process.exitcode}）"}
+        process.join()
+        if "error" in result:
+            return result
+        runs.append(result)
+    runs.sort(key=lambda run: run["wall_seconds"])
+    result = dict(runs[len(runs) // 2])
+    result["wall_seconds_all"] = [round(run["wall_seconds"], 4) for run in runs]
+    result["input_bytes"] = os.path.getsize(source)
+    return result
+
+
+def compare(results, baseline, tolerance):
+    """与基线比较墙钟时间和峰值内存，返回退化的用例列表"""
+    regressions = []
+    print(f"\n{'用例':<10}{'时间(s)':>12}{'基线(s)':>12}{'变化':>9}{'内存(MB)':>12}{'基线(MB)':>12}{'变化':>9}")
+    for name, current in results["cases"].items():
+        base = baseline.get("cases", {}).get(name)
+        if not base or "error" in current or "error" in base:
+            continue
+        line = f"{name:<10}"
+        for key, scale in (("wall_seconds", 1), ("peak_rss_bytes", 1024 * 1024)):
+            now, before = current.get(key), base.get(key)
+            if not now or not before:
+                line += f"{'-':>12}{'-':>12}{'-':>9}"
+                continue
+            change = now / before - 1
+            line += f"{now / scale:>12.2f}{before / scale:>12.2f}{change:>+9.1%}"
+            if change > tolerance:
+                regressions.append(f"{name}.{key}")
+        print(line)
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="MarkItDown 转换器性能基准")
+    parser.add_argument("--corpus-dir", default=str(Path(__file__).with_name("bench_corpus")),
+                        help="测试文件目录（默认 ./bench_corpus，已生成的文件会复用）")
+    parser.add_argument("-o", "--output", default="bench_results.json", help="结果 JSON 文件")
+    parser.add_argument("--baseline", help="用于比较的基线结果 JSON")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="允许的退化比例（默认 0.10）")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例重复次数，取中位数（默认 3）")
+    parser.add_argument("--only", default="*", help="只运行匹配的用例，如 'xlsx' 或 'p*'")
+    parser.add_argument("--seed", type=int, default=1234, help="随机种子，保证生成的文件可复现")
+    parser.add_argument("--xlsx-rows", type=int, default=20000)
+    parser.add_argument("--xlsx-cols", type=int, default=12)
+    parser.add_argument("--xlsx-sheets", type=int, default=3)
+    parser.add_argument("--docx-paragraphs", type=int, default=2000)
+    parser.add_argument("--pptx-slides", type=int, default=200)
+    parser.add_argument("--pdf-pages", type=int, default=100)
+    parser.add_argument("--csv-rows", type=int, default=50000)
+    parser.add_argument("--csv-cols", type=int, default=10)
+    args = parser.parse_args(argv)
+
+    corpus = generate_corpus(args.corpus_dir, args)
+    versions = {}
+    for package in ("markitdown", "openpyxl", "pdfminer.six"):
+        try:
+            versions[package] = metadata.version(package)
+        except metadata.PackageNotFoundError:
+            versions[package] = None
+    results = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+            "versions": versions,
+            "params": {key: value for key, value in vars(args).items()
+                       if key.split("_")[0] in ("xlsx", "docx", "pptx", "pdf", "csv", "seed")},
+        },
+        "cases": {},
+    }
+    cases = {name: (source, "openpyxl" if name == "xlsx" else None) for name, source in corpus.items()}
+    cases.update((name, (corpus["xlsx"], engine)) for name, engine in XLSX_ENGINE_CASES.items())
+    for name, (source, excel_engine) in cases.items():
+        if not fnmatch.fnmatch(name, args.only):
+            continue
+        print(f"运行 {name} ...", file=sys.stderr)
+        result = measure(source, max(1, args.repeat), excel_engine)
+        if excel_engine:
+            result["excel_engine"] = excel_engine
+        results["cases"][name] = result
+        if "error" in result:
+            print(f"  失败: {result['error']}", file=sys.stderr)
+        else:
+            peak = result["peak_rss_bytes"]
+            memory = f"  峰值内存 {peak / 1024 / 1024:.1f} MB" if peak else ""
+            print(f"  墙钟 {result['wall_seconds']:.3f}s  CPU {result['cpu_seconds']:.3f}s{memory}", file=sys.stderr)
+
+    openpyxl_result = results["cases"].get("xlsx", {})
+    for name in XLSX_ENGINE_CASES:
+        result = results["cases"].get(name, {})
+        if openpyxl_result.get("wall_seconds") and result.get("wall_seconds"):
+            print(f"{name} 相对 openpyxl 提速 {openpyxl_result['wall_seconds'] / result['wall_seconds']:.2f} 倍",
+                  file=sys.stderr)
+
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.output}", file=sys.stderr)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        if regressions:
+            print(f"\n性能退化: {', '.join(regressions)}", file=sys.stderr)
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
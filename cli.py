@@ -0,0 +1,256 @@
+"""命令行（无界面）模式"""
+import sys
+import os
+import glob
+import argparse
+import time
+import json
+import multiprocessing
+
+from converter import (TRACE_LOG_PATH, CHUNK_FORMATS, CHUNK_CHARS, URL_HOST_MIN_INTERVAL,
+                       URL_HOST_MAX_CONNECTIONS, URL_FETCH_WORKERS, _is_url, HostRateLimiter, UrlFetcher,
+                       _normalize_pages, EXCEL_ENGINES, EXCEL_ENGINE, _set_excel_engine, LIMIT_KEYS,
+                       _normalize_limits, _run_batch, _dedupe_summary, _plan_batch_jobs, _collect_batch_files,
+                       WATCH_MANIFEST_NAME, WATCH_POLL_INTERVAL, WATCH_DEBOUNCE_SECONDS, FolderWatcher,
+                       _format_bytes, WORKER_MAX_JOBS, WORKER_MAX_RSS_MB)
+from daemon import serve
+
+
+# 这些参数交给命令行处理，其余情况启动图形界面
+CLI_COMMANDS = ("convert", "watch", "serve", "-h", "--help")
+
+
+# ===== 命令行（无界面）模式 =====
+def _build_cli_parser():
+    parser = argparse.ArgumentParser(
+        prog="markitdown_ui",
+        description="MarkItDown 文件转换器。不带子命令时启动图形界面。")
+    subparsers = parser.add_subparsers(dest="command")
+
+    convert_parser = subparsers.add_parser(
+        "convert", help="批量转换文件（无需图形界面）",
+        description="将文件、通配符或文件夹中的文件转换为 Markdown，与图形界面使用相同的转换逻辑。")
+    convert_parser.add_argument("inputs", nargs="+", help="文件、通配符（如 'docs/**/*.pdf'）、文件夹或 URL")
+    convert_parser.add_argument("-o", "--output-dir", help="输出目录，默认保存在源文件旁")
+    _add_conversion_arguments(convert_parser)
+    convert_parser.add_argument("--pages", help="PDF 只转换这些页，如 '1-20,35,40-'")
+    convert_parser.add_argument("--url-jobs", type=int, default=URL_FETCH_WORKERS,
+                                help=f"并发下载 URL 的线程数（默认 {URL_FETCH_WORKERS}）")
+    convert_parser.add_argument("--host-interval", type=float, default=URL_HOST_MIN_INTERVAL,
+                                help=f"同一主机两次请求之间的最小间隔秒数（默认 {URL_HOST_MIN_INTERVAL:g}）")
+    convert_parser.add_argument("--host-connections", type=int, default=URL_HOST_MAX_CONNECTIONS,
+                                help=f"同一主机最多同时进行的请求数（默认 {URL_HOST_MAX_CONNECTIONS}）")
+    convert_parser.add_argument("--summary", help="将耗时和失败信息以 JSON 写入此文件，'-' 表示标准输出")
+    convert_parser.add_argument("--chunks", choices=CHUNK_FORMATS,
+                                help="按结构分块输出，每块写完即可被读取：files 写入 <名称>.chunks 文件夹中的"
+                                     "编号文件，jsonl 每块一行写入 <名称>.jsonl")
+    convert_parser.add_argument("--no-dedupe", dest="dedupe", action="store_false",
+                                help="不检测重复输入：默认内容相同的文件只转换一次，其余复制其结果")
+    convert_parser.add_argument("--chunk-chars", type=int, default=CHUNK_CHARS,
+                                help=f"分块输出时每块的目标字符数（默认 {CHUNK_CHARS}，取 MARKITDOWN_CHUNK_CHARS）")
+
+    watch_parser = subparsers.add_parser(
+        "watch", help="监视文件夹并自动转换新增或修改的文件",
+        description="持续监视文件夹（包括子文件夹），文件写完后自动转换；"
+                    f"转换记录保存在 {WATCH_MANIFEST_NAME} 中，重启后只处理有变化的文件。按 Ctrl+C 停止。")
+    watch_parser.add_argument("folder", help="要监视的文件夹")
+    watch_parser.add_argument("-o", "--output-dir", help="输出目录（保持子目录结构），默认保存在源文件旁")
+    _add_conversion_arguments(watch_parser)
+    watch_parser.add_argument("--interval", type=float, default=WATCH_POLL_INTERVAL,
+                              help=f"扫描间隔秒数（默认 {WATCH_POLL_INTERVAL:g}）")
+    watch_parser.add_argument("--debounce", type=float, default=WATCH_DEBOUNCE_SECONDS,
+                              help=f"文件保持不变多少秒后才转换（默认 {WATCH_DEBOUNCE_SECONDS:g}）")
+
+    serve_parser = subparsers.add_parser(
+        "serve", help="启动本地转换服务",
+        description="常驻后台并保持转换器已加载，通过 HTTP 接收转换请求；图形界面会自动使用正在运行的服务。")
+    serve_parser.add_argument("--host", default="127.0.0.1", help="监听地址（默认仅本机）")
+    serve_parser.add_argument("--port", type=int, default=8765, help="监听端口（默认 8765）")
+    serve_parser.add_argument("-j", "--workers", type=int, default=os.cpu_count() or 1,
+                              help="转换进程数（默认为 CPU 核数）")
+    serve_parser.add_argument("--max-jobs", type=int, default=WORKER_MAX_JOBS,
+                              help=f"转换进程处理多少个任务后回收重建，0 表示不限"
+                                   f"（默认 {WORKER_MAX_JOBS}，取 MARKITDOWN_WORKER_MAX_JOBS）")
+    serve_parser.add_argument("--max-rss", type=int, default=WORKER_MAX_RSS_MB, metavar="MB",
+                              help=f"转换进程常驻内存超过多少 MB 后回收重建，0 表示不限"
+                                   f"（默认 {WORKER_MAX_RSS_MB}，取 MARKITDOWN_WORKER_MAX_RSS_MB）")
+    _add_excel_engine_argument(serve_parser)
+    serve_parser.add_argument("-v", "--verbose", action="store_true", help="输出每个请求的日志")
+    return parser
+
+
+def _positive_int(text):
+    """argparse 参数类型：正整数"""
+    try:
+        value = int(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"不是整数: {text}")
+    if value <= 0:
+        raise argparse.ArgumentTypeError(f"必须大于 0: {text}")
+    return value
+
+
+def _add_excel_engine_argument(parser):
+    parser.add_argument("--excel-engine", choices=EXCEL_ENGINES, default=EXCEL_ENGINE,
+                        help="Excel 读取引擎，auto 在安装了 lxml 时使用 lxml（默认取 MARKITDOWN_EXCEL_ENGINE）")
+
+
+def _add_conversion_arguments(parser):
+    """convert 和 watch 子命令共用的转换参数"""
+    parser.add_argument("-j", "--jobs", type=int, default=os.cpu_count() or 1,
+                        help="并发进程数（默认为 CPU 核数）")
+    parser.add_argument("--sheets", help="Excel 要转换的 sheet，用逗号分隔，默认全部")
+    parser.add_argument("--max-rows", type=_positive_int, help="Excel 每个 sheet 表头之后最多转换的行数")
+    parser.add_argument("--max-columns", type=_positive_int, help="Excel 每个 sheet 最多转换的列数")
+    parser.add_argument("--range", dest="cell_range", help="Excel 只转换此 A1 区域，如 B2:F200")
+    parser.add_argument("--tail-rows", type=_positive_int,
+                        help="抽样模式：除前 --max-rows 行外再附上最后这么多行")
+    _add_excel_engine_argument(parser)
+    parser.add_argument("--trace-log", default=TRACE_LOG_PATH,
+                        help="将各阶段耗时以 JSON Lines 追加写入此文件（默认取 MARKITDOWN_TRACE_LOG）")
+
+
+def _cli_watch(args):
+    """执行 watch 子命令，直到按下 Ctrl+C"""
+    if not os.path.isdir(args.folder):
+        print(f"找不到文件夹 {args.folder}", file=sys.stderr)
+        return 2
+    sheets = [name.strip() for name in args.sheets.split(",") if name.strip()] if args.sheets else None
+    try:
+        limits = _normalize_limits({key: getattr(args, key) for key in LIMIT_KEYS})
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    watcher = FolderWatcher(args.folder, args.output_dir, max(1, args.jobs), sheets, limits,
+                            poll_interval=max(0.1, args.interval), debounce=max(0.0, args.debounce),
+                            trace_log=args.trace_log)
+    def on_event(info):
+        event = info['event']
+        if event == 'converted':
+            print(f"完成 {info['source']} → {info['output']} ({info['seconds']:.2f}s)", file=sys.stderr)
+        elif event == 'unchanged':
+            print(f"内容未变，跳过 {info['source']}", file=sys.stderr)
+        elif event == 'failed':
+            print(f"失败 {info['source']}: {info['message']}", file=sys.stderr)
+        elif event == 'removed':
+            print(f"已删除 {info['source']}", file=sys.stderr)
+
+    print(f"正在监视 {watcher.root}，按 Ctrl+C 停止", file=sys.stderr)
+    try:
+        watcher.run(on_event)
+    except KeyboardInterrupt:
+        print("已停止监视", file=sys.stderr)
+    return 0
+
+
+def _cli_convert(args):
+    """执行 convert 子命令，返回进程退出码"""
+    urls = list(dict.fromkeys(path for path in args.inputs if _is_url(path)))
+    paths = [path for path in args.inputs if not _is_url(path)]
+    for pattern in paths:
+        if not (glob.has_magic(pattern) or os.path.exists(pattern)):
+            print(f"警告: 找不到 {pattern}", file=sys.stderr)
+    files = _collect_batch_files(paths) + urls
+    if not files:
+        print("没有找到支持的文件", file=sys.stderr)
+        return 2
+
+    sheets = [name.strip() for name in args.sheets.split(",") if name.strip()] if args.sheets else None
+    try:
+        limits = _normalize_limits({key: getattr(args, key) for key in LIMIT_KEYS})
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    try:
+        pages = _normalize_pages(args.pages)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+    jobs = _plan_batch_jobs(files, args.output_dir, sheets)
+    results = [None] * len(files)
+
+    start = time.perf_counter()
+    if urls:
+        # 先在主进程中共用连接池并发下载，按主机限速；转换进程随后直接读取 HTTP 缓存。
+        # 下载失败的 URL 交给转换进程重试并报告错误
+        fetcher = UrlFetcher(pool_size=max(1, args.url_jobs),
+                             limiter=HostRateLimiter(max(0.0, args.host_interval), args.host_connections))
+
+        def on_fetched(url, fetched, error):
+            if error:
+                print(f"下载失败 {url}: {error}", file=sys.stderr)
+            else:
+                print(f"已下载 {url} ({_format_bytes(fetched['size'])}"
+                      f"{'，未修改' if fetched['status'] == 'not_modified' else ''})", file=sys.stderr)
+
+        fetcher.fetch_many(urls, max(1, args.url_jobs), on_fetched)
+
+    duplicate_of = {}
+
+    def on_finished(index, success, message, seconds):
+        results[index] = (success, message, seconds)
+        state = "完成" if success else "失败"
+        if index in duplicate_of:
+            state += f"（与 {files[duplicate_of[index]]} 内容相同，复用结果）"
+        print(f"[{sum(r is not None for r in results)}/{len(files)}] {state} {files[index]}"
+              f" ({seconds:.2f}s){'' if success else ': ' + message}", file=sys.stderr)
+
+    chunks = (args.chunks, max(1, args.chunk_chars)) if args.chunks else None
+    dedupe_stats = {}
+    succeeded, failed = _run_batch(jobs, max(1, args.jobs), on_finished=on_finished,
+                                   trace_log=args.trace_log, limits=limits, pages=pages, chunks=chunks,
+                                   dedupe=args.dedupe, on_duplicate=duplicate_of.__setitem__, stats=dedupe_stats)
+    elapsed = time.perf_counter() - start
+    print(f"完成: 成功 {succeeded}，失败 {failed}，用时 {elapsed:.2f}s", file=sys.stderr)
+    if dedupe_stats.get('duplicates'):
+        print(f"重复输入: {_dedupe_summary(dedupe_stats)}", file=sys.stderr)
+
+    if args.summary:
+        summary = {
+            "jobs": max(1, args.jobs),
+            "elapsed_seconds": round(elapsed, 3),
+            "total": len(files),
+            "succeeded": succeeded,
+            "failed": failed,
+            "duplicates": dedupe_stats.get('duplicates', 0),
+            "duplicate_bytes": dedupe_stats.get('saved_bytes', 0),
+            "saved_seconds": round(dedupe_stats.get('saved_seconds', 0.0), 3),
+            "files": [
+                {
+                    "source": source,
+                    "output": result[1] if result and result[0] else None,
+                    "success": bool(result and result[0]),
+                    "seconds": round(result[2], 3) if result else None,
+                    "error": None if result and result[0] else (result[1] if result else "未处理"),
+                    "duplicate_of": files[duplicate_of[index]] if index in duplicate_of else None,
+                }
+                for (index, source, _, _), result in zip(jobs, results)
+            ],
+        }
+        text = json.dumps(summary, ensure_ascii=False, indent=2)
+        if args.summary == "-":
+            print(text)
+        else:
+            with open(args.summary, 'w', encoding='utf-8') as f:
+                f.write(text)
+    return 1 if failed else 0
+
+
+def run_cli(argv):
+    """解析命令行并执行子命令，返回进程退出码"""
+    args = _build_cli_parser().parse_args(argv)
+    if getattr(args, "excel_engine", None):
+        # 通过环境变量传给之后启动的转换进程
+        _set_excel_engine(args.excel_engine)
+    if args.command == "convert":
+        return _cli_convert(args)
+    if args.command == "watch":
+        return _cli_watch(args)
+    if args.command == "serve":
+        serve(args.host, args.port, args.workers, args.verbose, args.max_jobs, args.max_rss)
+    return 0
+
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(run_cli(sys.argv[1:]))
@@ -0,0 +1,3481 @@
+"""与界面无关的转换逻辑，图形界面、命令行和转换服务共用"""
+import sys
+import os
+from pathlib import Path
+import warnings
+import re
+import io
+import glob
+import time
+import json
+import atexit
+import signal
+import subprocess
+import queue
+import uuid
+from contextlib import contextmanager, closing
+from urllib.parse import urlparse
+import hashlib
+import shutil
+import zipfile
+import threading
+import tempfile
+import posixpath
+import xml.etree.ElementTree as ET
+import multiprocessing
+from collections import OrderedDict, deque
+from importlib import metadata, util as importlib_util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+
+
+# openpyxl 和 markitdown 只在真正需要时才导入，避免拖慢窗口启动
+EXCEL_SUPPORT = importlib_util.find_spec("openpyxl") is not None
+
+# 忽略各种警告
+warnings.filterwarnings("ignore", message="Couldn't find ffmpeg or avconv")
+warnings.filterwarnings("ignore", message="Unsupported Windows version")
+warnings.filterwarnings("ignore", category=UserWarning, module="onnxruntime")
+
+
+class LazyMarkItDown:
+    """延迟创建的 MarkItDown：首次使用时才导入并初始化
+
+    格式明确的本地文件直接交给对应的转换器，MarkItDown（及其 magika 模型）
+    只在需要识别文件类型时才创建。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._md = None
+        self._error = None
+        self._converters = {}
+
+    def get(self):
+        """返回 MarkItDown 实例，必要时在当前线程完成初始化"""
+        with self._lock:
+            if self._md is None and self._error is None:
+                try:
+                    from markitdown import MarkItDown
+                    self._md = MarkItDown()
+                except ImportError as e:
+                    self._error = RuntimeError(
+                        f"无法导入 markitdown 库，请运行: pip install markitdown[all]（{e}）")
+                except Exception as e:
+                    self._error = RuntimeError(f"无法初始化MarkItDown: {e}")
+        if self._error is not None:
+            raise self._error
+        return self._md
+
+    def is_ready(self):
+        return self._md is not None
+
+    def warm_up(self):
+        """导入 markitdown 并创建常见格式的转换器，不加载 magika 模型"""
+        for converter_name, _magic, _member in _KNOWN_FORMATS.values():
+            self._converter(converter_name)
+
+    def _converter(self, converter_name):
+        """返回指定类名的 markitdown 转换器实例，首次使用时创建"""
+        with self._lock:
+            converter = self._converters.get(converter_name)
+            if converter is None:
+                try:
+                    from markitdown import converters
+                except ImportError as e:
+                    raise RuntimeError(
+                        f"无法导入 markitdown 库，请运行: pip install markitdown[all]（{e}）")
+                converter = self._converters[converter_name] = getattr(converters, converter_name)()
+        return converter
+
+    def convert(self, source, **kwargs):
+        if kwargs or _is_url(str(source)):
+            return self.get().convert(source, **kwargs)
+        return self.convert_local(str(source))[0]
+
+    def convert_local(self, path):
+        """转换本地文件，返回 (结果, 识别方式)
+
+        扩展名和文件头能确认格式时直接调用对应的转换器（'signature'），
+        否则由 MarkItDown 用 magika 识别，识别结果按内容摘要缓存（'magika' 或 'memo'）。
+        缓存识别结果依赖 MarkItDown 的私有方法，markitdown 版本中没有时直接调用
+        MarkItDown.convert（'markitdown'）。
+        """
+        from markitdown import StreamInfo
+        extension = os.path.splitext(path)[1]
+        base_guess = StreamInfo(local_path=path, extension=extension, filename=os.path.basename(path))
+        converter_name = _detect_known_format(path)
+        with open(path, 'rb') as fh:
+            if converter_name is not None:
+                return self._convert_known(converter_name, fh, base_guess), 'signature'
+            md = self.get()
+            if not (hasattr(md, '_get_stream_info_guesses') and hasattr(md, '_convert')):
+                return md.convert_stream(fh, stream_info=base_guess), 'markitdown'
+            guesses, detection = _detection_memo.guesses(md, fh, base_guess)
+            return md._convert(file_stream=fh, stream_info_guesses=guesses), detection
+
+    def _convert_known(self, converter_name, fh, stream_info):
+        """与 MarkItDown 选中该转换器时的处理相同：转换、包装异常并规范化结果"""
+        from markitdown import FileConversionException, FailedConversionAttempt
+        converter = self._converter(converter_name)
+        try:
+            result = converter.convert(fh, stream_info, file_extension=stream_info.extension)
+        except Exception:
+            raise FileConversionException(
+                attempts=[FailedConversionAttempt(converter=converter, exc_info=sys.exc_info())])
+        result.text_content = _normalize_markdown(result.text_content)
+        return result
+
+
+def _normalize_markdown(markdown):
+    """与 MarkItDown 对转换结果的规范化相同：去掉行尾空白，合并多余的空行"""
+    markdown = "\n".join(line.rstrip() for line in re.split(r"\r?\n", markdown))
+    return re.sub(r"\n{3,}", "\n\n", markdown)
+
+
+# ===== 文件类型识别 =====
+_ZIP_SIGNATURE = b'PK\x03\x04'
+_OLE_SIGNATURE = b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1'
+
+# 扩展名 -> (markitdown 转换器类名, 文件头, 压缩包中必须存在的文件)
+# 这些格式由扩展名唯一决定 MarkItDown 选用的转换器，文件头相符时无需再用 magika 识别
+_KNOWN_FORMATS = {
+    '.pdf': ('PdfConverter', b'%PDF-', None),
+    '.docx': ('DocxConverter', _ZIP_SIGNATURE, 'word/document.xml'),
+    '.pptx': ('PptxConverter', _ZIP_SIGNATURE, 'ppt/presentation.xml'),
+    '.xlsx': ('XlsxConverter', _ZIP_SIGNATURE, 'xl/workbook.xml'),
+    '.xls': ('XlsConverter', _OLE_SIGNATURE, None),
+    '.epub': ('EpubConverter', _ZIP_SIGNATURE, 'META-INF/container.xml'),
+}
+
+# magika 读取文件首尾各一个块，字符集检测读取开头 64 KiB（可能多读 3 字节补全 UTF-8 字符）
+_DETECTION_HEAD_BYTES = 65536 + 3
+_DETECTION_TAIL_BYTES = 4096
+DETECTION_MEMO_SIZE = 4096
+
+
+def _detect_known_format(path):
+    """按扩展名和文件头确认格式，返回转换器类名；无法确认时返回 None"""
+    spec = _KNOWN_FORMATS.get(os.path.splitext(path)[1].lower())
+    if spec is None:
+        return None
+    converter_name, signature, member = spec
+    try:
+        with open(path, 'rb') as fh:
+            if fh.read(len(signature)) != signature:
+                return None
+        if member is not None:
+            with zipfile.ZipFile(path) as archive:
+                archive.getinfo(member)
+    except (OSError, KeyError, zipfile.BadZipFile):
+        return None
+    return converter_name
+
+
+class DetectionMemo:
+    """按内容摘要缓存 magika 的识别结果
+
+    摘要覆盖文件大小以及识别时读取的首尾字节，内容相同的文件（如重复转换或改名后的副本）
+    不再运行模型。
+    """
+
+    def __init__(self, max_entries=DETECTION_MEMO_SIZE):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _digest(fh, extension):
+        start = fh.tell()
+        fh.seek(0, os.SEEK_END)
+        size = fh.tell() - start
+        digest = hashlib.sha256(f"{size}\0{extension}\0".encode('utf-8'))
+        fh.seek(start)
+        digest.update(fh.read(_DETECTION_HEAD_BYTES))
+        fh.seek(max(start, start + size - _DETECTION_TAIL_BYTES))
+        digest.update(fh.read(_DETECTION_TAIL_BYTES))
+        fh.seek(start)
+        return digest.hexdigest()
+
+    def guesses(self, md, fh, base_guess):
+        """返回 (StreamInfo 猜测列表, 'magika' 或 'memo')，文件位置保持不变"""
+        from markitdown import StreamInfo
+        key = self._digest(fh, base_guess.extension)
+        with self._lock:
+            cached = self._entries.get(key)
+            if cached is not None:
+                self._entries.move_to_end(key)
+        if cached is not None:
+            return [StreamInfo(mimetype=mimetype, extension=extension, charset=charset,
+                               filename=base_guess.filename, local_path=base_guess.local_path)
+                    for mimetype, extension, charset in cached], 'memo'
+        guesses = md._get_stream_info_guesses(file_stream=fh, base_guess=base_guess)
+        with self._lock:
+            self._entries[key] = [(guess.mimetype, guess.extension, guess.charset) for guess in guesses]
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return guesses, 'magika'
+
+
+_detection_memo = DetectionMemo()
+
+# 批量转换时会被收集的文件类型（拖入文件夹时按此过滤）
+BATCH_EXTENSIONS = {
+    '.pdf', '.docx', '.pptx', '.xlsx', '.xls', '.csv', '.html', '.htm',
+    '.epub', '.jpg', '.jpeg', '.png', '.gif', '.bmp', '.txt', '.json', '.xml',
+}
+
+
+def _env_int(name, default):
+    """读取整数环境变量，未设置或无效时返回默认值"""
+    try:
+        return int(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+# ===== 阶段耗时追踪 =====
+# 设置此环境变量后，每次转换的各阶段耗时以 JSON Lines 追加写入该文件
+TRACE_LOG_PATH = os.environ.get("MARKITDOWN_TRACE_LOG")
+
+# 状态栏摘要中显示的阶段及其名称
+_TRACE_SUMMARY_STAGES = (
+    ('cache.lookup', '缓存查找'),
+    ('sheet_cache.lookup', 'sheet 缓存'),
+    ('workbook.open', '打开工作簿'),
+    ('sheet.read', '读取'),
+    ('sheet.assemble', '生成'),
+    ('url.fetch', '下载'),
+    ('markitdown.convert', 'MarkItDown'),
+    ('pdf.convert', 'PDF 分页'),
+    ('daemon.request', '转换服务'),
+    ('render', '显示'),
+    ('save', '保存'),
+)
+
+
+class Tracer:
+    """以 span 形式记录转换各阶段的耗时和属性
+
+    span 可以嵌套；子进程中记录的 span 可通过 extend 合并到父进程的追踪器中。
+    """
+
+    def __init__(self, trace_id=None):
+        self.trace_id = trace_id or uuid.uuid4().hex[:12]
+        self.spans = []
+        self._stack = []
+
+    @contextmanager
+    def span(self, name, **attributes):
+        """记录一个阶段，返回可在阶段内补充的属性字典"""
+        record = {
+            'id': len(self.spans),
+            'parent': self._stack[-1] if self._stack else None,
+            'name': name,
+            'start': time.time(),
+            'duration': 0.0,
+            'attributes': attributes,
+        }
+        self.spans.append(record)
+        self._stack.append(record['id'])
+        start = time.perf_counter()
+        try:
+            yield attributes
+        finally:
+            record['duration'] = time.perf_counter() - start
+            self._stack.pop()
+
+    def add(self, name, duration, **attributes):
+        """记录一个已单独计时的阶段，挂到当前 span 之下"""
+        self.spans.append({
+            'id': len(self.spans),
+            'parent': self._stack[-1] if self._stack else None,
+            'name': name,
+            'start': time.time() - duration,
+            'duration': duration,
+            'attributes': attributes,
+        })
+
+    def extend(self, spans):
+        """合并其他追踪器（如子进程）的 span，挂到当前 span 之下"""
+        offset = len(self.spans)
+        parent = self._stack[-1] if self._stack else None
+        for record in spans:
+            record = dict(record)
+            record['id'] += offset
+            record['parent'] = parent if record['parent'] is None else record['parent'] + offset
+            self.spans.append(record)
+
+    def total(self, name):
+        return sum(record['duration'] for record in self.spans if record['name'] == name)
+
+    def summary(self):
+        """生成状态栏用的紧凑摘要，如“总计 1.52s（打开工作簿 0.10s，读取 1.20s）”"""
+        stages = []
+        for name, label in _TRACE_SUMMARY_STAGES:
+            if any(record['name'] == name for record in self.spans):
+                stages.append(f"{label} {self.total(name):.2f}s")
+        total = sum(record['duration'] for record in self.spans if record['parent'] is None)
+        return f"总计 {total:.2f}s（{'，'.join(stages)}）" if stages else f"总计 {total:.2f}s"
+
+    def write_jsonl(self, path):
+        """将所有 span 以 JSON Lines 追加写入 path"""
+        lines = "".join(
+            json.dumps(dict(record, trace_id=self.trace_id), ensure_ascii=False, default=str) + "\n"
+            for record in self.spans)
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(lines)
+
+
+def _write_trace_log(tracer, path=None):
+    """在配置了追踪日志时写出 span，写入失败不影响转换"""
+    path = path or TRACE_LOG_PATH
+    if not path:
+        return
+    try:
+        tracer.write_jsonl(path)
+    except OSError:
+        pass
+
+
+def _conversion_error_message(e):
+    """将转换异常转换为用户可读的错误信息"""
+    try:
+        from markitdown import UnsupportedFormatException, MissingDependencyException
+    except ImportError:
+        return f"转换失败: {str(e)}"
+    if isinstance(e, UnsupportedFormatException):
+        return "不支持的文件格式"
+    if isinstance(e, MissingDependencyException):
+        return f"缺少依赖: {e}"
+    return f"转换失败: {str(e)}"
+
+
+def _source_size(source):
+    """本地文件的大小，URL 或无法访问时返回 None"""
+    try:
+        return os.path.getsize(source)
+    except (OSError, TypeError, ValueError):
+        return None
+
+
+def convert_source(md, source, excel_file=None, selected_sheets=None, max_workers=None, tracer=None,
+                   progress=None, limits=None, sheet_cache=True, url_max_age=0, pages=None, excel_engine=None):
+    """转换单个文件或URL，返回 Markdown 文本
+
+    max_workers 限制 Excel 多 sheet 并行转换的进程数，已在进程池中运行时应传入 1。
+    传入 tracer 时记录各阶段耗时。传入 progress 时以 progress(unit, done, total, **details)
+    汇报进度：Excel 为已处理行数（rows），PDF 为页数（pages），URL 为已下载字节数（bytes）；
+    total 未知时为 0。limits 限制 Excel 转换的行列范围，参见 LIMIT_KEYS。
+    sheet_cache 为 True 时复用本进程中已转换过的 sheet，参见 SheetCache。
+    URL 经 UrlFetcher 下载，url_max_age 秒内验证过的缓存内容直接使用，否则发送条件请求。
+    pages 为 PDF 的页码范围（如 '1-20,35'），指定页码或页数较多时按页段并行转换。
+    excel_engine 为 Excel 读取引擎，参见 EXCEL_ENGINES，默认使用 EXCEL_ENGINE。
+    """
+    tracer = tracer or Tracer()
+    # 检查是否为 Excel 文件且需要特殊处理
+    if _uses_excel_converter(source, excel_file, selected_sheets):
+        # 使用自定义的 Excel 转换
+        return _convert_excel_sheets(source, selected_sheets, max_workers=max_workers, tracer=tracer,
+                                     progress=progress, limits=limits, sheet_cache=sheet_cache,
+                                     engine=excel_engine)
+    if _uses_pdf_pages(source, pages, max_workers):
+        return _convert_pdf_pages(source, pages, max_workers=max_workers, tracer=tracer, progress=progress)
+    if _is_url(source):
+        with tracer.span('url.fetch', url=source) as attributes:
+            fetched = _get_url_fetcher().fetch(source, progress, max_age=url_max_age)
+            attributes.update(status=fetched['status'], size=fetched['size'])
+        with tracer.span('markitdown.convert', file_size=fetched['size']) as attributes:
+            with closing(_fetched_response(fetched)) as response:
+                if progress:
+                    # 下载的内容也可能是 PDF，同样按页汇报
+                    with _pdf_page_progress(progress):
+                        result = md.get().convert_response(response)
+                else:
+                    result = md.get().convert_response(response)
+            markdown_content = result.markdown
+            attributes['output_chars'] = len(markdown_content)
+        return markdown_content
+    # 使用 MarkItDown 的默认转换
+    with tracer.span('markitdown.convert', file_size=_source_size(source)) as attributes:
+        if progress and Path(source).suffix.lower() == '.pdf':
+            with _pdf_page_progress(progress):
+                result, attributes['detection'] = md.convert_local(source)
+        else:
+            result, attributes['detection'] = md.convert_local(source)
+        markdown_content = result.markdown
+        attributes['output_chars'] = len(markdown_content)
+    return markdown_content
+
+
+def _uses_pdf_pages(source, pages, max_workers):
+    """是否使用分页转换：指定了页码范围，或页数多到值得并行"""
+    if not _is_pdf_path(source):
+        return False
+    if pages:
+        return True
+    # 单核时多进程分页转换比 MarkItDown 顺序转换更慢；无法复现 PdfConverter 的处理时结果会不同
+    if max_workers == 1 or (os.cpu_count() or 1) < 2 or _pdf_converter_helpers() is None:
+        return False
+    try:
+        return _pdf_declared_page_count(source) >= PARALLEL_PDF_MIN_PAGES
+    except Exception:
+        return False  # 无法解析页面树的文件交给 MarkItDown 处理
+
+
+def _uses_excel_converter(source, excel_file, selected_sheets):
+    """是否按选中的 sheet 使用自定义的 Excel 转换"""
+    return bool(excel_file and excel_file == source and EXCEL_SUPPORT and selected_sheets)
+
+
+# 直接写入文件时在内存中保留的预览长度（字符）
+OUTPUT_PREVIEW_CHARS = 256 * 1024
+
+
+def _partial_path(output_path):
+    """写入 output_path 期间使用的临时文件，与目标在同一目录以便原子替换"""
+    return f"{output_path}.part"
+
+
+def _remove_partial(output_path):
+    """清理转换中途被终止时遗留的临时文件"""
+    try:
+        os.remove(_partial_path(output_path))
+    except OSError:
+        pass
+
+
+@contextmanager
+def _atomic_output(output_path):
+    """打开 output_path 的临时文件供写入，成功结束后原子替换目标，出错时删除临时文件"""
+    partial = _partial_path(output_path)
+    try:
+        with open(partial, 'w', encoding='utf-8') as f:
+            yield f
+        os.replace(partial, output_path)
+    except BaseException:
+        _remove_partial(output_path)
+        raise
+
+
+class _PreviewWriter:
+    """写入文件的同时保留开头一段文本用于预览"""
+
+    def __init__(self, f, preview_chars):
+        self._f = f
+        self._preview = []
+        self._remaining = preview_chars
+
+    def write(self, text):
+        self._f.write(text)
+        if self._remaining > 0:
+            part = text[:self._remaining]
+            self._preview.append(part)
+            self._remaining -= len(part)
+
+    def preview(self):
+        return ''.join(self._preview)
+
+
+def _read_preview(path, preview_chars=OUTPUT_PREVIEW_CHARS):
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read(preview_chars)
+
+
+def convert_source_to_file(md, source, output_path, excel_file=None, selected_sheets=None, max_workers=None,
+                           tracer=None, progress=None, limits=None, preview_chars=OUTPUT_PREVIEW_CHARS,
+                           sheet_cache=True, url_max_age=0, pages=None, excel_engine=None):
+    """转换单个文件或URL并直接写入 output_path，返回 {'output_path', 'preview', 'size'}
+
+    结果先写入同目录的临时文件，完成后原子替换目标，中途失败不会留下不完整的文件。
+    Excel 结果按 sheet 写出（每个 sheet 读完后逐行写出），内存中只保留开头 preview_chars 个字符的预览；
+    其他格式由 MarkItDown 一次生成全文后写出。其余参数同 convert_source。
+    """
+    tracer = tracer or Tracer()
+    with tracer.span('output.file', path=output_path) as attributes:
+        with _atomic_output(output_path) as f:
+            writer = _PreviewWriter(f, preview_chars)
+            if _uses_excel_converter(source, excel_file, selected_sheets):
+                _convert_excel_sheets(source, selected_sheets, sink=writer, max_workers=max_workers,
+                                      tracer=tracer, progress=progress, limits=limits, sheet_cache=sheet_cache,
+                                      engine=excel_engine)
+            else:
+                markdown_content = convert_source(md, source, max_workers=max_workers, tracer=tracer,
+                                                  progress=progress, url_max_age=url_max_age, pages=pages)
+                with tracer.span('save', path=output_path, chars=len(markdown_content)):
+                    writer.write(markdown_content)
+                del markdown_content
+        attributes['size'] = os.path.getsize(output_path)
+    return {'output_path': output_path, 'preview': writer.preview(), 'size': attributes['size']}
+
+
+# ===== 分块输出 =====
+# 供索引等下游处理使用：结果按结构切成有限大小的块，每产生一块就写出，不必等整个文件转换完。
+# files 写为 <名称>.chunks/0001.md、0002.md ……，jsonl 每块一行写入 <名称>.jsonl
+CHUNK_FORMATS = ('files', 'jsonl')
+# 每块的目标字符数
+CHUNK_CHARS = _env_int("MARKITDOWN_CHUNK_CHARS", 4000)
+
+_MD_HEADING_RE = re.compile(r'(#{1,6})\s+(.*?)\s*#*\s*$')
+_MD_TABLE_SEPARATOR_RE = re.compile(r'\|(?:\s*:?-+:?\s*\|)+\s*$')
+_MD_FENCE_RE = re.compile(r'\s{0,3}(```|~~~)')
+_CHUNK_FILE_RE = re.compile(r'\d{4,}\.md(?:\.part)?$')
+
+
+class MarkdownChunker:
+    """将流式写入的 Markdown 按结构边界切成约 chunk_chars 个字符的块
+
+    只在标题前、空行之后和表格数据行之间切分，一级标题在当前块已过半时另起一块，
+    代码块不会被切开；块末尾的标题移到下一块，与其后的内容放在一起；
+    表格被切开时，后续的块开头重复表头和分隔行。
+    每产生一块即以 on_chunk(chunk) 回调，chunk 含 index（从 1 开始）、text、chars
+    和 headings（块开始处所在的各级标题）。
+    单行本身超过 chunk_chars 时不拆分该行。
+    """
+
+    def __init__(self, on_chunk, chunk_chars=CHUNK_CHARS):
+        self._on_chunk = on_chunk
+        self.chunk_chars = max(1, chunk_chars)
+        self.count = 0
+        self.chars = 0
+        self._pending = ''
+        self._lines = []
+        self._size = 0
+        self._previous = None
+        self._headings = []
+        self._chunk_headings = None
+        self._table_header = None
+        self._in_fence = False
+        # 当前块末尾连续的标题（可夹有空行）的起始位置，以及此时所在的各级标题
+        self._heading_tail = None
+        self._heading_tail_headings = None
+
+    def write(self, text):
+        self.chars += len(text)
+        lines = (self._pending + text).split('\n')
+        self._pending = lines.pop()
+        for line in lines:
+            self._add_line(line)
+
+    def close(self):
+        """写出剩余内容"""
+        if self._pending:
+            self._add_line(self._pending)
+            self._pending = ''
+        self._flush()
+
+    def _add_line(self, line):
+        previous = self._previous
+        self._previous = line
+        fence = _MD_FENCE_RE.match(line)
+        if self._in_fence or fence:
+            # 代码块开始处可以切分，块内不切分
+            boundary = not self._in_fence and previous is not None and not previous.strip()
+            if fence:
+                self._in_fence = not self._in_fence
+            heading = self._table_header = None
+        else:
+            heading = _MD_HEADING_RE.match(line)
+            if not line.startswith('|'):
+                self._table_header = None
+            boundary = (heading is not None or self._table_header is not None
+                        or (previous is not None and not previous.strip()))
+
+        # 超出目标大小时切分；一级标题（如 sheet 标题）在当前块已过半时另起一块
+        if boundary and self._lines and (
+                self._size + len(line) + 1 > self.chunk_chars
+                or (heading is not None and len(heading.group(1)) == 1 and self._size >= self.chunk_chars // 2)):
+            carried = carried_headings = None
+            if self._heading_tail is not None:
+                carried, carried_headings = self._lines[self._heading_tail:], self._heading_tail_headings
+                del self._lines[self._heading_tail:]
+            self._flush()
+            if carried:
+                self._lines.extend(carried)
+                self._size = sum(len(carried_line) + 1 for carried_line in carried)
+                self._chunk_headings = carried_headings
+                self._heading_tail, self._heading_tail_headings = 0, carried_headings
+            if self._table_header is not None:
+                self._lines.extend(self._table_header)
+                self._size += sum(len(header) + 1 for header in self._table_header)
+
+        if heading is not None:
+            level = len(heading.group(1))
+            self._headings = [item for item in self._headings if item[0] < level]
+            self._headings.append((level, heading.group(2)))
+        elif (self._table_header is None and previous is not None and previous.startswith('|')
+              and not self._in_fence and _MD_TABLE_SEPARATOR_RE.match(line)):
+            self._table_header = [previous, line]
+        if self._chunk_headings is None and line.strip():
+            self._chunk_headings = [text for _, text in self._headings]
+        if heading is not None:
+            if self._heading_tail is None:
+                self._heading_tail = len(self._lines)
+                self._heading_tail_headings = [text for _, text in self._headings]
+        elif line.strip():
+            self._heading_tail = None
+        self._lines.append(line)
+        self._size += len(line) + 1
+
+    def _flush(self):
+        lines = self._lines
+        # 去掉首尾的空行和 sheet 之间的分隔线
+        start, end = 0, len(lines)
+        while start < end and (not lines[start].strip() or lines[start].strip() == '---'):
+            start += 1
+        while end > start and (not lines[end - 1].strip()
+                               or (lines[end - 1].strip() == '---' and end - 1 > start
+                                   and not lines[end - 2].strip())):
+            end -= 1
+        if start < end:
+            self.count += 1
+            text = '\n'.join(lines[start:end]) + '\n'
+            self._on_chunk({'index': self.count, 'text': text, 'chars': len(text),
+                            'headings': self._chunk_headings or []})
+        self._lines = []
+        self._size = 0
+        self._chunk_headings = None
+        self._heading_tail = None
+
+
+def _chunk_output_path(output_path, chunk_format):
+    """单文件输出路径对应的分块输出位置：files 为 <名称>.chunks 文件夹，jsonl 为 <名称>.jsonl"""
+    base = os.path.splitext(output_path)[0]
+    return f"{base}.chunks" if chunk_format == 'files' else f"{base}.jsonl"
+
+
+def _remove_chunk_output(target, chunk_format):
+    """删除未完成的分块输出；files 格式只删除编号的块文件，文件夹为空时再删除文件夹"""
+    try:
+        if chunk_format == 'files':
+            for name in os.listdir(target):
+                if _CHUNK_FILE_RE.match(name):
+                    os.remove(os.path.join(target, name))
+            os.rmdir(target)
+        else:
+            os.remove(target)
+    except OSError:
+        pass
+
+
+class _ChunkFileSink:
+    """每块写为文件夹中的一个编号文件，写完即原子替换，读取方不会看到写了一半的块"""
+
+    def __init__(self, directory, source):
+        self.directory = directory
+        self.size = 0
+        os.makedirs(directory, exist_ok=True)
+        # 清除上次转换留下的块，避免与本次的混在一起
+        for name in os.listdir(directory):
+            if _CHUNK_FILE_RE.match(name):
+                os.remove(os.path.join(directory, name))
+
+    def write(self, chunk):
+        with _atomic_output(os.path.join(self.directory, f"{chunk['index']:04d}.md")) as f:
+            f.write(chunk['text'])
+        self.size += len(chunk['text'].encode('utf-8'))
+
+    def close(self):
+        pass
+
+
+class _ChunkJsonlSink:
+    """每块一行 JSON 追加写入并立即刷新，下游可以边转换边读取"""
+
+    def __init__(self, path, source):
+        self._source = source
+        self._f = open(path, 'w', encoding='utf-8')
+        self.size = 0
+
+    def write(self, chunk):
+        line = json.dumps(dict(source=self._source, **chunk), ensure_ascii=False) + '\n'
+        self._f.write(line)
+        self._f.flush()
+        self.size += len(line.encode('utf-8'))
+
+    def close(self):
+        self._f.close()
+
+
+def convert_source_to_chunks(md, source, output_path, chunk_format='jsonl', chunk_chars=CHUNK_CHARS,
+                             excel_file=None, selected_sheets=None, max_workers=None, tracer=None,
+                             progress=None, limits=None, preview_chars=OUTPUT_PREVIEW_CHARS, sheet_cache=True,
+                             url_max_age=0, pages=None, excel_engine=None):
+    """转换单个文件或URL并按结构分块写出，返回 {'output_path', 'preview', 'size', 'chunks'}
+
+    output_path 为单文件输出时的路径，实际写入 _chunk_output_path 给出的位置（返回值中的
+    output_path），分块方式参见 MarkdownChunker。Excel 每个 sheet 读完即分块写出；其他格式由
+    MarkItDown 一次生成全文后再分块。转换失败时删除已写出的块。其余参数同 convert_source_to_file。
+    """
+    if chunk_format not in CHUNK_FORMATS:
+        raise ValueError(f"未知的分块格式: {chunk_format}（可选 {', '.join(CHUNK_FORMATS)}）")
+    tracer = tracer or Tracer()
+    target = _chunk_output_path(output_path, chunk_format)
+    with tracer.span('output.chunks', path=target, format=chunk_format) as attributes:
+        sink = (_ChunkFileSink if chunk_format == 'files' else _ChunkJsonlSink)(target, source)
+        try:
+            chunker = MarkdownChunker(sink.write, chunk_chars)
+            writer = _PreviewWriter(chunker, preview_chars)
+            if _uses_excel_converter(source, excel_file, selected_sheets):
+                _convert_excel_sheets(source, selected_sheets, sink=writer, max_workers=max_workers,
+                                      tracer=tracer, progress=progress, limits=limits, sheet_cache=sheet_cache,
+                                      engine=excel_engine)
+            else:
+                markdown_content = convert_source(md, source, max_workers=max_workers, tracer=tracer,
+                                                  progress=progress, url_max_age=url_max_age, pages=pages)
+                with tracer.span('save', path=target, chars=len(markdown_content)):
+                    writer.write(markdown_content)
+                del markdown_content
+            chunker.close()
+        except BaseException:
+            sink.close()
+            _remove_chunk_output(target, chunk_format)
+            raise
+        sink.close()
+        attributes.update(chunks=chunker.count, size=sink.size)
+    return {'output_path': target, 'preview': writer.preview(), 'size': sink.size, 'chunks': chunker.count}
+
+
+# ===== URL 下载 =====
+# 下载内容的磁盘缓存上限，超出时淘汰最久未验证的条目
+HTTP_CACHE_MAX_BYTES = 256 * 1024 * 1024
+# 同一主机两次请求开始之间的最小间隔（秒）和最多同时进行的请求数
+URL_HOST_MIN_INTERVAL = 0.2
+URL_HOST_MAX_CONNECTIONS = 4
+# 批量转换时并发下载的线程数，也是连接池的大小
+URL_FETCH_WORKERS = 8
+# 与 MarkItDown 默认会话相同：服务器支持时优先返回 Markdown
+_URL_ACCEPT = "text/markdown, text/html;q=0.9, text/plain;q=0.8, */*;q=0.1"
+
+
+def _is_url(source):
+    return isinstance(source, str) and source.startswith(('http://', 'https://'))
+
+
+class HostRateLimiter:
+    """按主机限制请求的开始频率和同时进行的请求数，线程安全"""
+
+    def __init__(self, min_interval=URL_HOST_MIN_INTERVAL, max_connections=URL_HOST_MAX_CONNECTIONS):
+        self.min_interval = min_interval
+        self.max_connections = max(1, max_connections)
+        self._lock = threading.Lock()
+        self._next_start = {}
+        self._slots = {}
+
+    @contextmanager
+    def acquire(self, host):
+        """在 with 块内占用该主机的一个连接名额，必要时先等待到允许的开始时间"""
+        with self._lock:
+            slots = self._slots.setdefault(host, threading.BoundedSemaphore(self.max_connections))
+        with slots:
+            with self._lock:
+                now = time.monotonic()
+                start = max(now, self._next_start.get(host, now))
+                self._next_start[host] = start + self.min_interval
+            if start > now:
+                time.sleep(start - now)
+            yield
+
+
+class UrlFetcher:
+    """带连接池、按主机限速和磁盘 HTTP 缓存的下载器，可在多个线程中共用
+
+    响应内容先写入缓存目录再交给转换器。缓存的响应带有 ETag 或 Last-Modified 时，
+    再次下载会发送条件请求，服务器返回 304 时直接使用缓存的内容。
+    """
+
+    def __init__(self, cache_dir=None, pool_size=URL_FETCH_WORKERS, limiter=None,
+                 max_bytes=HTTP_CACHE_MAX_BYTES, timeout=60):
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.cache_dir = Path(cache_dir) if cache_dir else _default_cache_dir() / 'http'
+        self.limiter = limiter or HostRateLimiter()
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.session.headers['Accept'] = _URL_ACCEPT
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self._lock = threading.Lock()
+
+    def _paths(self, url):
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        return self.cache_dir / f"{key}.json", self.cache_dir / f"{key}.body"
+
+    @staticmethod
+    def _load_meta(meta_path, body_path):
+        try:
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                meta = json.load(f)
+            if os.path.getsize(body_path) != meta['size']:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+        return meta
+
+    @staticmethod
+    def _write_meta(meta_path, meta):
+        temp_path = meta_path.with_name(f"{meta_path.name}.{uuid.uuid4().hex}.tmp")
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(meta, f, ensure_ascii=False)
+        os.replace(temp_path, meta_path)
+
+    @staticmethod
+    def _result(meta, body_path, status):
+        return {'url': meta['final_url'], 'headers': meta['headers'], 'body_path': str(body_path),
+                'size': meta['size'], 'status': status}
+
+    def fetch(self, url, progress=None, max_age=0):
+        """下载 url，返回 {'url', 'headers', 'body_path', 'size', 'status'}
+
+        status 为 'fresh'（max_age 秒内验证过，未联网）、'not_modified'（服务器返回 304）
+        或 'downloaded'。progress 参见 convert_source，按已接收字节数汇报。
+        """
+        meta_path, body_path = self._paths(url)
+        meta = self._load_meta(meta_path, body_path)
+        if meta and max_age and time.time() - meta['validated_at'] < max_age:
+            return self._result(meta, body_path, 'fresh')
+        headers = {}
+        if meta and meta.get('etag'):
+            headers['If-None-Match'] = meta['etag']
+        if meta and meta.get('last_modified'):
+            headers['If-Modified-Since'] = meta['last_modified']
+
+        with self.limiter.acquire(urlparse(url).hostname or ''):
+            with self.session.get(url, headers=headers, stream=True, timeout=self.timeout) as response:
+                if meta and headers and response.status_code == 304:
+                    meta['validated_at'] = time.time()
+                    self._write_meta(meta_path, meta)
+                    if progress:
+                        progress('bytes', meta['size'], meta['size'])
+                    return self._result(meta, body_path, 'not_modified')
+                response.raise_for_status()
+                self.cache_dir.mkdir(parents=True, exist_ok=True)
+                temp_path = body_path.with_name(f"{body_path.name}.{uuid.uuid4().hex}.part")
+                total = int(response.headers.get('content-length') or 0)
+                received = 0
+                try:
+                    with open(temp_path, 'wb') as f:
+                        for chunk in response.iter_content(chunk_size=64 * 1024):
+                            f.write(chunk)
+                            received += len(chunk)
+                            if progress:
+                                progress('bytes', received, total)
+                    os.replace(temp_path, body_path)
+                except BaseException:
+                    try:
+                        os.remove(temp_path)
+                    except OSError:
+                        pass
+                    raise
+
+        # no-store 的响应只用于本次转换，不保存验证信息，下次照常完整下载
+        cacheable = 'no-store' not in response.headers.get('Cache-Control', '').lower()
+        meta = {
+            'url': url,
+            'final_url': response.url,
+            # 内容已按 Content-Encoding 解压后保存
+            'headers': {key: value for key, value in response.headers.items()
+                        if key.lower() not in ('content-encoding', 'content-length', 'transfer-encoding')},
+            'etag': response.headers.get('ETag') if cacheable else None,
+            'last_modified': response.headers.get('Last-Modified') if cacheable else None,
+            'size': received,
+            'validated_at': time.time(),
+        }
+        self._write_meta(meta_path, meta)
+        self._evict()
+        return self._result(meta, body_path, 'downloaded')
+
+    def _evict(self):
+        """缓存超过上限时删除最久未验证的条目"""
+        with self._lock:
+            entries = []
+            for meta_path in self.cache_dir.glob('*.json'):
+                try:
+                    with open(meta_path, 'r', encoding='utf-8') as f:
+                        meta = json.load(f)
+                    entries.append((meta['validated_at'], meta['size'], meta_path))
+                except (OSError, ValueError, KeyError):
+                    continue
+            total = sum(size for _, size, _ in entries)
+            for _, size, meta_path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                for path in (meta_path, meta_path.with_suffix('.body')):
+                    try:
+                        os.remove(path)
+                    except OSError:
+                        pass
+                total -= size
+
+    def fetch_many(self, urls, max_workers=URL_FETCH_WORKERS, on_fetched=None):
+        """并发下载多个 URL，on_fetched(url, 结果或 None, 错误信息) 在每个下载结束时调用"""
+        with ThreadPoolExecutor(max_workers=max(1, max_workers)) as executor:
+            futures = {executor.submit(self.fetch, url): url for url in urls}
+            for future in as_completed(futures):
+                try:
+                    result, error = future.result(), None
+                except Exception as e:
+                    result, error = None, _conversion_error_message(e)
+                if on_fetched:
+                    on_fetched(futures[future], result, error)
+
+
+def _fetched_response(fetched):
+    """用下载好的内容构造 requests.Response，交给 MarkItDown.convert_response 转换
+
+    convert_response 本来就会把内容全部读入内存，这里直接读入 response.content，
+    不留下需要关闭的文件。
+    """
+    import requests
+    from requests.structures import CaseInsensitiveDict
+    response = requests.Response()
+    response.status_code = 200
+    response.url = fetched['url']
+    response.headers = CaseInsensitiveDict(fetched['headers'])
+    with open(fetched['body_path'], 'rb') as f:
+        response._content = f.read()
+    response._content_consumed = True
+    return response
+
+
+# 每个进程一个下载器，常驻的转换进程在会话期间复用其连接
+_url_fetcher = None
+
+
+def _get_url_fetcher():
+    global _url_fetcher
+    if _url_fetcher is None:
+        _url_fetcher = UrlFetcher()
+    return _url_fetcher
+
+
+# 当前线程正在汇报进度的 PDF 转换状态，见 _pdf_page_progress
+_pdf_progress_local = threading.local()
+_pdf_progress_hooks_lock = threading.Lock()
+_pdf_progress_hooks_installed = False
+
+
+def _install_pdf_progress_hooks():
+    """为 PDFPage.create_pages 和 PDFPageInterpreter.process_page 安装计数的包装，每个进程只安装一次
+
+    包装只在当前线程处于 _pdf_page_progress 中时计数，否则直接调用原函数，
+    因此多个线程同时转换时各自的进度互不干扰。
+    """
+    global _pdf_progress_hooks_installed
+    from pdfminer.pdfpage import PDFPage
+    from pdfminer.pdfinterp import PDFPageInterpreter
+    from pdfminer.pdftypes import resolve1
+
+    with _pdf_progress_hooks_lock:
+        if _pdf_progress_hooks_installed:
+            return
+        create_pages = PDFPage.create_pages
+        process_page = PDFPageInterpreter.process_page
+
+        def counting_create_pages(cls, document):
+            state = getattr(_pdf_progress_local, 'state', None)
+            if state is not None:
+                try:
+                    state['next_total'] = int(resolve1(resolve1(document.catalog['Pages'])['Count']))
+                except Exception:
+                    state['next_total'] = 0
+            return create_pages(document)
+
+        def counting_process_page(self, page):
+            state = getattr(_pdf_progress_local, 'state', None)
+            if state is None:
+                return process_page(self, page)
+            if state['next_total'] is not None:
+                state.update(done=0, total=state['next_total'], next_total=None, **{'pass': state['pass'] + 1})
+            process_page(self, page)
+            state['done'] += 1
+            state['progress']('pages', state['done'], state['total'], pass_no=state['pass'])
+
+        PDFPage.create_pages = classmethod(counting_create_pages)
+        PDFPageInterpreter.process_page = counting_process_page
+        _pdf_progress_hooks_installed = True
+
+
+@contextmanager
+def _pdf_page_progress(progress):
+    """转换 PDF 期间按 pdfminer 解析的页数汇报进度，只统计当前线程处理的页面
+
+    MarkItDown 先用 pdfplumber 逐页检查，再可能用 pdfminer 整体提取文本，
+    两遍都经过 PDFPage.create_pages 和 PDFPageInterpreter.process_page，
+    因此每遍开始处理页面时重新计数，并在 details 中给出当前遍数。
+    pdfplumber 关闭时也会调用 create_pages，但不处理页面，不算作一遍。
+    """
+    try:
+        _install_pdf_progress_hooks()
+    except ImportError:
+        yield
+        return
+
+    previous = getattr(_pdf_progress_local, 'state', None)
+    _pdf_progress_local.state = {'done': 0, 'total': 0, 'pass': 0, 'next_total': None, 'progress': progress}
+    try:
+        yield
+    finally:
+        _pdf_progress_local.state = previous
+
+
+# ===== PDF 分页转换 =====
+# 页数少于此值的 PDF 交给 MarkItDown 顺序转换，多进程启动开销大于收益
+PARALLEL_PDF_MIN_PAGES = 16
+# 每个工作进程平均分到的页段数，页段越小负载越均衡，但每段都要重新打开文档
+PDF_CHUNKS_PER_WORKER = 4
+_PAGE_RANGE_RE = re.compile(r'^(\d+)?\s*[-~～–]\s*(\d+)?$|^(\d+)$')
+
+
+def _is_pdf_path(source):
+    return not _is_url(source) and Path(source).suffix.lower() == '.pdf'
+
+
+def _parse_page_ranges(spec):
+    """解析 '1-5, 8, 10-' 形式的页码范围，返回 [(起始页, 结束页或 None)]，页码从 1 开始"""
+    ranges = []
+    for part in re.split(r'[,，;；]', spec):
+        part = part.strip()
+        if not part:
+            continue
+        match = _PAGE_RANGE_RE.match(part)
+        if not match:
+            raise ValueError(f"无效的页码范围: {part}")
+        if match.group(3):
+            start = end = int(match.group(3))
+        else:
+            start = int(match.group(1) or 1)
+            end = int(match.group(2)) if match.group(2) else None
+        if start < 1 or (end is not None and end < start):
+            raise ValueError(f"无效的页码范围: {part}")
+        ranges.append((start, end))
+    return ranges
+
+
+def _normalize_pages(spec):
+    """规范化页码范围文本，未指定时返回 None，便于作为缓存键和跨进程传递"""
+    if not spec or not str(spec).strip():
+        return None
+    ranges = _parse_page_ranges(str(spec))
+    if not ranges:
+        return None
+    return ",".join(str(start) if start == end else f"{start}-{end or ''}" for start, end in ranges)
+
+
+def _select_pages(spec, page_count):
+    """返回页码范围内实际存在的页码（从 1 开始，升序去重）"""
+    if not spec:
+        return list(range(1, page_count + 1))
+    pages = set()
+    for start, end in _parse_page_ranges(spec):
+        pages.update(range(start, min(end or page_count, page_count) + 1))
+    if not pages:
+        raise ValueError(f"页码范围 {spec} 超出文档页数（共 {page_count} 页）")
+    return sorted(pages)
+
+
+def _pdf_page_count(filename):
+    """只读取页面树统计页数，不解析页面内容"""
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdfpage import PDFPage
+    with open(filename, 'rb') as f:
+        return sum(1 for _ in PDFPage.create_pages(PDFDocument(PDFParser(f))))
+
+
+def _pdf_declared_page_count(filename):
+    """页面树根节点记录的页数（/Count），不遍历页面树；缺失或无效时退回 _pdf_page_count"""
+    from pdfminer.pdfparser import PDFParser
+    from pdfminer.pdfdocument import PDFDocument
+    from pdfminer.pdftypes import resolve1
+    with open(filename, 'rb') as f:
+        document = PDFDocument(PDFParser(f))
+        pages = resolve1(document.catalog.get('Pages'))
+        count = resolve1(pages.get('Count')) if isinstance(pages, dict) else None
+    if isinstance(count, int) and not isinstance(count, bool) and count >= 0:
+        return count
+    return _pdf_page_count(filename)
+
+
+def _pdf_converter_helpers():
+    """返回 markitdown PdfConverter 逐页处理用到的 (_extract_form_content_from_words,
+    _merge_partial_numbering_lines)
+
+    两者是 markitdown 0.1.x 的私有函数，其他版本中不存在时返回 None：分页转换只提取
+    pdfminer 的文本，未指定页码范围时仍交给 MarkItDown 转换整个文档。
+    """
+    try:
+        from markitdown.converters._pdf_converter import (_extract_form_content_from_words,
+                                                          _merge_partial_numbering_lines)
+    except ImportError:
+        return None
+    return _extract_form_content_from_words, _merge_partial_numbering_lines
+
+
+def _pdf_page_workers(page_count, max_workers):
+    """决定 PDF 转换使用的进程数，返回 1 表示在当前进程中转换"""
+    if max_workers == 1 or page_count < PARALLEL_PDF_MIN_PAGES or (os.cpu_count() or 1) < 2:
+        return 1
+    return max(1, min(max_workers or os.cpu_count() or 1, page_count // 4))
+
+
+def _pdf_chunks(pages, workers):
+    """将页码列表切成连续的页段，返回 [[页码, ...], ...]"""
+    size = max(1, -(-len(pages) // (workers * PDF_CHUNKS_PER_WORKER)))
+    return [pages[i:i + size] for i in range(0, len(pages), size)]
+
+
+def _convert_pdf_chunk(filename, pages, with_text=None):
+    """转换一段页面，与 MarkItDown 的 PdfConverter 逐页做相同的处理
+
+    返回 {'chunks', 'form_pages', 'failed', 'text', 'spans'}：chunks 为 pdfplumber 提取的
+    各页内容，text 为 pdfminer 提取的整段文本。with_text 为 None 时只在本段没有表单页
+    或 pdfplumber 失败时提取 text（全文没有表单页时需要它），为 True 时总是提取。
+    markitdown 中没有 PdfConverter 的内部函数时（参见 _pdf_converter_helpers）只提取 text。
+    """
+    import pdfminer.high_level
+    helpers = _pdf_converter_helpers()
+    if helpers is None:
+        with_text = True
+    tracer = Tracer()
+    chunks = []
+    form_pages = 0
+    failed = False
+    with tracer.span('pdf.pages', first=pages[0], last=pages[-1], pages=len(pages)):
+        if with_text is not True:
+            try:
+                import pdfplumber
+                with pdfplumber.open(filename, pages=pages) as pdf:
+                    for page in pdf.pages:
+                        page_content = helpers[0](page)
+                        if page_content is not None:
+                            form_pages += 1
+                            if page_content.strip():
+                                chunks.append(page_content)
+                        else:
+                            text = page.extract_text()
+                            if text and text.strip():
+                                chunks.append(text.strip())
+                        page.close()
+            except Exception:
+                failed = True
+        text = None
+        if with_text or failed or form_pages == 0:
+            text = pdfminer.high_level.extract_text(filename, page_numbers=[page - 1 for page in pages])
+    return {'chunks': chunks, 'form_pages': form_pages, 'failed': failed, 'text': text,
+            'spans': tracer.spans}
+
+
+def _convert_pdf_pages(filename, pages=None, max_workers=None, tracer=None, progress=None):
+    """按页段转换 PDF，页段较多时在进程池中并行，再按页码顺序合并
+
+    结果与 MarkItDown 转换整个文档相同：全文没有表单页时使用 pdfminer 的文本，
+    否则拼接 pdfplumber 逐页提取的内容。pages 为页码范围文本，None 表示全部页面。
+    progress 参见 convert_source，按已完成的页数汇报。
+    """
+    helpers = _pdf_converter_helpers()
+    tracer = tracer or Tracer()
+    with tracer.span('pdf.open'):
+        page_count = _pdf_page_count(filename)
+    selected = _select_pages(pages, page_count)
+    workers = _pdf_page_workers(len(selected), max_workers)
+    segments = _pdf_chunks(selected, workers)
+    with tracer.span('pdf.convert', file_size=_source_size(filename), pages=len(selected),
+                     workers=workers) as attributes:
+        results = [None] * len(segments)
+        executor = None
+        if workers > 1:
+            executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'))
+
+        def run_all(indices, with_text=None, pass_no=1):
+            done_pages = 0
+            if executor is None:
+                outcomes = ((i, _convert_pdf_chunk(filename, segments[i], with_text)) for i in indices)
+            else:
+                futures = {executor.submit(_convert_pdf_chunk, filename, segments[i], with_text): i
+                           for i in indices}
+                outcomes = ((futures[future], future.result()) for future in as_completed(futures))
+            total_pages = sum(len(segments[i]) for i in indices)
+            for index, result in outcomes:
+                tracer.extend(result.pop('spans'))
+                results[index] = result if results[index] is None else dict(results[index], text=result['text'])
+                done_pages += len(segments[index])
+                if progress:
+                    progress('pages', done_pages, total_pages, pass_no=pass_no)
+
+        try:
+            run_all(range(len(segments)))
+            # 与 PdfConverter 相同：没有表单页或 pdfplumber 失败时改用 pdfminer 的全文
+            use_text = (any(result['failed'] for result in results)
+                        or sum(result['form_pages'] for result in results) == 0)
+            markdown = "" if use_text else "\n\n".join(
+                chunk for result in results for chunk in result['chunks']).strip()
+            if use_text or not markdown:
+                missing = [i for i, result in enumerate(results) if result['text'] is None]
+                if missing:
+                    run_all(missing, with_text=True, pass_no=2)
+                markdown = "".join(result['text'] for result in results)
+        finally:
+            if executor is not None:
+                executor.shutdown()
+        if helpers is not None:
+            markdown = helpers[1](markdown)
+        markdown = _normalize_markdown(markdown)
+        attributes['output_chars'] = len(markdown)
+    return markdown
+
+
+# 工作簿文件小于此大小时，多进程启动开销大于收益，按顺序转换
+PARALLEL_SHEETS_MIN_BYTES = 4 * 1024 * 1024
+
+_XLSX_MAIN_NS = 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'
+_XLSX_REL_NS = 'http://schemas.openxmlformats.org/officeDocument/2006/relationships'
+_PACKAGE_REL_NS = 'http://schemas.openxmlformats.org/package/2006/relationships'
+
+
+def _xlsx_sheet_parts(filename):
+    """直接从 zip 读取 {sheet 名称: sheet XML 路径}，不构建工作簿对象"""
+    with zipfile.ZipFile(filename) as archive:
+        workbook_xml = ET.fromstring(archive.read('xl/workbook.xml'))
+        rels_xml = ET.fromstring(archive.read('xl/_rels/workbook.xml.rels'))
+    targets = {}
+    for rel in rels_xml.iter(f'{{{_PACKAGE_REL_NS}}}Relationship'):
+        target = rel.get('Target', '')
+        if target.startswith('/'):
+            target = target.lstrip('/')
+        else:
+            target = posixpath.normpath(posixpath.join('xl', target))
+        targets[rel.get('Id')] = target
+    parts = {}
+    for sheet in workbook_xml.iter(f'{{{_XLSX_MAIN_NS}}}sheet'):
+        parts[sheet.get('name')] = targets.get(sheet.get(f'{{{_XLSX_REL_NS}}}id'))
+    return parts
+
+
+# <dimension> 位于 sheet XML 开头，只需读取这么多字节
+_DIMENSION_SCAN_BYTES = 64 * 1024
+_DIMENSION_RE = re.compile(rb'<(?:\w+:)?dimension\s+ref="([^"]+)"')
+_CELL_REF_RE = re.compile(r'^\$?([A-Za-z]{1,3})?\$?(\d+)?$')
+
+
+def _column_index(letters):
+    """列字母转为从 1 开始的列号，如 'A' -> 1，'AA' -> 27"""
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - ord('A') + 1
+    return index
+
+
+def _parse_cell_range(ref):
+    """解析 A1 区域，返回 (min_col, min_row, max_col, max_row)，省略的边界为 None
+
+    支持 'B2:D10'、'A1'、整列 'A:C' 和整行 '2:100'。
+    """
+    bounds = []
+    for part in ref.split(':', 1):
+        match = _CELL_REF_RE.match(part.strip())
+        if not match or not any(match.groups()):
+            raise ValueError(f"无效的单元格区域: {ref}")
+        letters, digits = match.groups()
+        bounds.append((_column_index(letters) if letters else None, int(digits) if digits else None))
+    (min_col, min_row), (max_col, max_row) = bounds[0], bounds[-1]
+    return min_col, min_row, max_col, max_row
+
+
+def _xlsx_sheet_info(filename):
+    """从 zip 中读取各 sheet 的名称、dimension 行列数和 XML 大小，不构建工作簿对象
+
+    返回按工作簿顺序排列的 [{'name', 'rows', 'columns', 'size'}]，
+    sheet 缺少 dimension 记录时 rows 和 columns 为 None。
+    """
+    parts = _xlsx_sheet_parts(filename)
+    sheets = []
+    with zipfile.ZipFile(filename) as archive:
+        for name, path in parts.items():
+            info = {'name': name, 'rows': None, 'columns': None, 'size': None}
+            if path in archive.NameToInfo:
+                info['size'] = archive.getinfo(path).file_size
+                with archive.open(path) as f:
+                    match = _DIMENSION_RE.search(f.read(_DIMENSION_SCAN_BYTES))
+                if match:
+                    try:
+                        min_col, min_row, max_col, max_row = _parse_cell_range(match.group(1).decode('ascii'))
+                        info['rows'] = max_row - (min_row or 1) + 1 if max_row else None
+                        info['columns'] = max_col - (min_col or 1) + 1 if max_col else None
+                    except (ValueError, TypeError):
+                        pass
+            sheets.append(info)
+    return sheets
+
+
+def _read_dimension(src):
+    """在 sheet XML 开头查找 dimension，返回 (min_col, min_row, max_col, max_row)，没有时返回 None"""
+    from openpyxl.utils.cell import range_boundaries
+    match = _DIMENSION_RE.search(src.read(_DIMENSION_SCAN_BYTES))
+    return range_boundaries(match.group(1).decode('ascii')) if match else None
+
+
+# Excel 读取引擎：openpyxl 为每个单元格构建 Python 对象；lxml 直接从 zip 中逐行解析 sheet XML，
+# 两者输出相同。auto 在安装了 lxml 时使用 lxml
+EXCEL_ENGINES = ('auto', 'openpyxl', 'lxml')
+EXCEL_ENGINE = os.environ.get("MARKITDOWN_EXCEL_ENGINE", "auto")
+
+
+def _resolve_excel_engine(engine=None):
+    """将引擎名（None 表示 EXCEL_ENGINE）解析为 'openpyxl' 或 'lxml'"""
+    engine = engine or EXCEL_ENGINE
+    if engine not in EXCEL_ENGINES:
+        raise ValueError(f"未知的 Excel 读取引擎: {engine}（可选 {', '.join(EXCEL_ENGINES)}）")
+    if engine == 'auto':
+        return 'lxml' if importlib_util.find_spec("lxml") is not None else 'openpyxl'
+    return engine
+
+
+def _set_excel_engine(engine):
+    """设置本进程及之后启动的工作进程使用的读取引擎（工作进程通过环境变量继承）"""
+    global EXCEL_ENGINE
+    _resolve_excel_engine(engine)
+    EXCEL_ENGINE = os.environ["MARKITDOWN_EXCEL_ENGINE"] = engine
+
+
+_dimension_reader = None
+
+
+def _dimension_reader_class():
+    """返回打开 sheet 时只在 XML 开头查找 dimension 的 openpyxl ExcelReader 子类
+
+    openpyxl 按需导入，子类在首次调用时创建。
+    """
+    global _dimension_reader
+    if _dimension_reader is not None:
+        return _dimension_reader
+
+    from openpyxl.reader.excel import ExcelReader
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+
+    class DimensionWorksheet(ReadOnlyWorksheet):
+        def _get_size(self):
+            with self._get_source() as src:
+                dimensions = _read_dimension(src)
+            if dimensions is not None:
+                self._min_column, self._min_row, self._max_column, self._max_row = dimensions
+
+    class DimensionReader(ExcelReader):
+        def read_worksheets(self):
+            # 与 ExcelReader.read_worksheets 的只读分支相同，只是 sheet 换成 DimensionWorksheet
+            for sheet, rel in self.parser.find_sheets():
+                if rel.target not in self.valid_files:
+                    continue
+                if "chartsheet" in rel.Type:
+                    self.read_chartsheet(sheet, rel)
+                    continue
+                worksheet = DimensionWorksheet(self.wb, sheet.name, rel.target, self.shared_strings)
+                worksheet.sheet_state = sheet.state
+                self.wb._sheets.append(worksheet)
+
+    _dimension_reader = DimensionReader
+    return _dimension_reader
+
+
+def _open_workbook(filename, engine=None):
+    """以只读模式打开工作簿，engine 参见 EXCEL_ENGINES
+
+    sheet 缺少 <dimension> 时，openpyxl 要等到 sheetData 结束才确认这一点，
+    每个 sheet 都会被完整解析一遍，没有 dimension 的大文件光打开就要数十秒。
+    这里的 sheet 只在 XML 开头查找 dimension，得到的行列范围与 openpyxl 相同。
+    """
+    if _resolve_excel_engine(engine) == 'lxml':
+        return _LxmlWorkbook(filename)
+
+    reader = _dimension_reader_class()(filename, read_only=True)
+    reader.read()
+    return reader.wb
+
+
+_SHARED_STRINGS_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sharedStrings+xml'
+
+
+def _xml_iterparse(source, tag):
+    """lxml 逐个解析指定标签的元素，不解析实体、不访问网络"""
+    from lxml import etree
+    return etree.iterparse(source, events=('end',), tag=tag, resolve_entities=False,
+                           no_network=True, huge_tree=True)
+
+
+def _release_element(element):
+    """处理完一个元素后释放它及之前的兄弟元素，使内存占用不随行数增长"""
+    element.clear()
+    parent = element.getparent()
+    if parent is not None:
+        while element.getprevious() is not None:
+            del parent[0]
+
+
+_XLSX_TEXT_TAG = f'{{{_XLSX_MAIN_NS}}}t'
+
+
+def _string_item_text(node):
+    """共享字符串 <si> 或内联字符串 <is> 的文本，与 openpyxl 的 Text.from_tree(node).content 相同"""
+    # 绝大多数字符串只有一个不带格式的 <t>，其余（富文本、注音）交给 openpyxl 处理
+    if len(node) == 1 and node[0].tag == _XLSX_TEXT_TAG:
+        return node[0].text or ''
+    from openpyxl.cell.text import Text
+    return Text.from_tree(node).content
+
+
+def _read_shared_strings(source):
+    """读取共享字符串表，返回 (全部字符串拼接成的文本, 各字符串起点的数组)
+
+    第 i 个字符串为 text[offsets[i]:offsets[i + 1]]。相比每个字符串一个对象的列表，
+    字符串很多时内存占用小得多。文本的提取与 openpyxl 的 read_string_table 相同。
+    """
+    from array import array
+    parts = []
+    offsets = array('q', [0])
+    total = 0
+    for _event, node in _xml_iterparse(source, f'{{{_XLSX_MAIN_NS}}}si'):
+        text = _string_item_text(node).replace('x005F_', '')
+        parts.append(text)
+        total += len(text)
+        offsets.append(total)
+        _release_element(node)
+    return ''.join(parts), offsets
+
+
+class _LxmlWorkbook:
+    """lxml 引擎的只读工作簿，只读取转换需要的部分：sheet 位置、共享字符串和日期格式
+
+    与 openpyxl 一样在打开时读取共享字符串表；按名称取得的 sheet 支持 _iter_sheet_markdown
+    用到的 ReadOnlyWorksheet 接口。
+    """
+
+    def __init__(self, filename):
+        self._archive = zipfile.ZipFile(filename)
+        try:
+            self._load()
+        except Exception:
+            self._archive.close()
+            raise
+
+    def _load(self):
+        from openpyxl.styles.stylesheet import Stylesheet
+        from openpyxl.utils.datetime import CALENDAR_MAC_1904, WINDOWS_EPOCH
+        archive = self._archive
+        workbook_xml = ET.fromstring(archive.read('xl/workbook.xml'))
+        properties = workbook_xml.find(f'{{{_XLSX_MAIN_NS}}}workbookPr')
+        date1904 = properties is not None and properties.get('date1904', '').lower() in ('1', 'true')
+        self.epoch = CALENDAR_MAC_1904 if date1904 else WINDOWS_EPOCH
+        self._sheet_parts = {name: path for name, path in _xlsx_sheet_parts(archive.filename).items()
+                             if path in archive.NameToInfo}
+
+        # 与 openpyxl 相同：样式表中引用日期（时长）格式的单元格样式编号
+        self.date_formats = self.timedelta_formats = frozenset()
+        if 'xl/styles.xml' in archive.NameToInfo:
+            stylesheet = Stylesheet.from_tree(ET.fromstring(archive.read('xl/styles.xml')))
+            if stylesheet.cell_styles:
+                self.date_formats = stylesheet.date_formats
+                self.timedelta_formats = stylesheet.timedelta_formats
+
+        self.shared_strings = ('', None)
+        content_types = ET.fromstring(archive.read('[Content_Types].xml'))
+        for override in content_types:
+            if override.get('ContentType') == _SHARED_STRINGS_CONTENT_TYPE:
+                with archive.open(override.get('PartName', '').lstrip('/')) as src:
+                    self.shared_strings = _read_shared_strings(src)
+                break
+
+    def __getitem__(self, name):
+        path = self._sheet_parts.get(name)
+        if path is None:
+            raise KeyError(f"Worksheet {name} does not exist.")
+        return _LxmlWorksheet(self, name, path)
+
+    def close(self):
+        self._archive.close()
+
+
+class _LxmlWorksheet:
+    """lxml 引擎的只读 sheet，由 iter_values 逐行返回单元格值组成的元组
+
+    行的补齐与截取方式与 openpyxl 的 ReadOnlyWorksheet 相同，单元格值的转换与其
+    WorkSheetParser 相同（数字、日期、公式等使用 openpyxl 的函数），只是不为每个单元格
+    构建中间对象；也因此不提供返回单元格对象的 iter_rows。
+    """
+
+    _min_column = 1
+    _min_row = 1
+    _max_column = _max_row = None
+
+    def __init__(self, workbook, title, path):
+        self.parent = workbook
+        self.title = title
+        self._path = path
+        with workbook._archive.open(path) as src:
+            dimensions = _read_dimension(src)
+        if dimensions is not None:
+            self._min_column, self._min_row, self._max_column, self._max_row = dimensions
+
+    @property
+    def min_row(self):
+        return self._min_row
+
+    @property
+    def max_row(self):
+        return self._max_row
+
+    @property
+    def min_column(self):
+        return self._min_column
+
+    @property
+    def max_column(self):
+        return self._max_column
+
+    def reset_dimensions(self):
+        """与 ReadOnlyWorksheet.reset_dimensions 相同：清除 dimension 记录的行列数"""
+        self._max_row = self._max_column = None
+
+    def iter_values(self, min_row=None, max_row=None, min_col=None, max_col=None):
+        """与 ReadOnlyWorksheet.iter_rows(..., values_only=True) 相同"""
+        return self._values_by_row(min_col or 1, min_row or 1, max_col or self.max_column,
+                                   max_row or self.max_row)
+
+    def _values_by_row(self, min_col, min_row, max_col, max_row):
+        """与 ReadOnlyWorksheet._cells_by_row 相同：缺失的行以空行补上，行号超过 max_row 时停止"""
+        empty_row = (None,) * (max_col + 1 - min_col) if max_col is not None else ()
+        counter = min_row
+        idx = 1
+        for idx, row in self._parse_rows():
+            if max_row is not None and idx > max_row:
+                break
+            for _ in range(counter, idx):
+                counter += 1
+                yield empty_row
+            if counter <= idx:
+                counter += 1
+                yield self._fit_row(row, min_col, max_col)
+        if max_row is not None and max_row < idx:
+            for _ in range(counter, max_row + 1):
+                yield empty_row
+
+    @staticmethod
+    def _fit_row(row, min_col, max_col):
+        """row 为 (按列号放置的值列表, 最后一个单元格的列号)，截取 min_col 到 max_col 列
+
+        与 ReadOnlyWorksheet._get_row 相同：未指定 max_col 时取到行内最后一个单元格。
+        """
+        values, last_column = row
+        if not last_column and not max_col:
+            return ()
+        width = (max_col or last_column) + 1 - min_col
+        if width <= 0:
+            return ()
+        fitted = values[min_col - 1:min_col - 1 + width]
+        if len(fitted) < width:
+            fitted.extend([None] * (width - len(fitted)))
+        return tuple(fitted)
+
+    def _parse_rows(self):
+        """逐行解析 sheet XML，返回 (行号, (按列号放置的值列表, 最后一个单元格的列号))"""
+        from openpyxl.formula.translate import Translator
+        from openpyxl.utils.datetime import from_excel, from_ISO8601
+        from openpyxl.worksheet._reader import _cast_number
+        from openpyxl.worksheet.formula import ArrayFormula, DataTableFormula
+
+        ns = f'{{{_XLSX_MAIN_NS}}}'
+        row_tag, value_tag, formula_tag, inline_tag = ns + 'row', ns + 'v', ns + 'f', ns + 'is'
+        workbook = self.parent
+        strings, offsets = workbook.shared_strings
+        date_formats = workbook.date_formats
+        timedelta_formats = workbook.timedelta_formats
+        epoch = workbook.epoch
+        shared_formulae = {}
+        column_cache = {}
+        row_counter = 0
+
+        with workbook._archive.open(self._path) as src:
+            for _event, row_element in _xml_iterparse(src, row_tag):
+                r = row_element.get('r')
+                if r is None:
+                    row_counter += 1
+                else:
+                    try:
+                        row_counter = int(r)
+                    except ValueError:
+                        number = float(r)
+                        if not number.is_integer():
+                            raise ValueError(f"{r} is not a valid row number")
+                        row_counter = int(number)
+
+                values = []
+                column = 0
+                for cell in row_element:
+                    coordinate = cell.get('r')
+                    if coordinate:
+                        letters = coordinate.rstrip('0123456789')
+                        column = column_cache.get(letters)
+                        if column is None:
+                            column = column_cache[letters] = _column_index(letters)
+                    else:
+                        column += 1
+
+                    data_type = cell.get('t', 'n')
+                    value = formula = inline = None
+                    for child in cell:
+                        tag = child.tag
+                        if tag == value_tag:
+                            if value is None:
+                                value = child.text or None
+                        elif tag == formula_tag:
+                            formula = child
+                        elif tag == inline_tag:
+                            inline = child
+
+                    if formula is not None:
+                        # 与 openpyxl 相同，公式单元格的值为 '=' 加公式文本
+                        formula_type = formula.get('t')
+                        value = "=" + (formula.text or "")
+                        if formula_type == "array":
+                            value = ArrayFormula(ref=formula.get('ref'), text=value)
+                        elif formula_type == "shared":
+                            index = formula.get('si')
+                            if index in shared_formulae:
+                                value = shared_formulae[index].translate_formula(coordinate)
+                            elif value != "=":
+                                shared_formulae[index] = Translator(value, coordinate)
+                        elif formula_type == "dataTable":
+                            value = DataTableFormula(**dict(formula.attrib))
+                    elif data_type == 'inlineStr':
+                        value = _string_item_text(inline) if inline is not None else None
+                    elif value is not None:
+                        if data_type == 'n':
+                            value = _cast_number(value)
+                            style_id = cell.get('s')
+                            if (int(style_id) if style_id else 0) in date_formats:
+                                try:
+                                    value = from_excel(value, epoch,
+                                                       timedelta=int(style_id or 0) in timedelta_formats)
+                                except (OverflowError, ValueError):
+                                    value = "#VALUE!"
+                        elif data_type == 's':
+                            index = int(value)
+                            value = strings[offsets[index]:offsets[index + 1]]
+                        elif data_type == 'b':
+                            value = bool(int(value))
+                        elif data_type == 'd':
+                            value = from_ISO8601(value)
+
+                    # 单元格通常按列顺序出现，直接追加；乱序或重复时覆盖对应位置
+                    if column > len(values):
+                        if column > len(values) + 1:
+                            values.extend([None] * (column - len(values) - 1))
+                        values.append(value)
+                    elif column > 0:
+                        values[column - 1] = value
+                _release_element(row_element)
+                yield row_counter, (values, column)
+
+
+def _excel_sheet_workers(filename, selected_sheets, max_workers):
+    """决定转换 sheet 使用的进程数，返回 1 表示顺序转换"""
+    if max_workers == 1 or len(selected_sheets) < 2:
+        return 1
+    try:
+        if os.path.getsize(filename) < PARALLEL_SHEETS_MIN_BYTES:
+            return 1
+    except OSError:
+        return 1
+    return min(len(selected_sheets), max_workers or os.cpu_count() or 1)
+
+
+# ===== sheet 结果缓存 =====
+# 调整 sheet 选择时只需转换新选中的 sheet，其余从缓存拼接
+SHEET_CACHE_MAX_CHARS = 64 * 1024 * 1024
+# 单个 sheet 超过此字符数时不缓存，避免一个大 sheet 挤掉其他所有条目
+SHEET_CACHE_MAX_ENTRY_CHARS = SHEET_CACHE_MAX_CHARS // 4
+# 设置此环境变量后 sheet 结果同时保存到该目录，重启后仍可复用
+SHEET_CACHE_DIR = os.environ.get("MARKITDOWN_SHEET_CACHE_DIR")
+
+
+class SheetCache:
+    """以 (工作簿内容哈希, sheet 名, 范围限制) 为键缓存单个 sheet 的 Markdown
+
+    内存中按 LRU 策略保留，总字符数不超过 max_chars；
+    指定 persistent_dir 时同时写入该目录下的 ConversionCache，内存未命中时从磁盘读取。
+    """
+
+    def __init__(self, max_chars=SHEET_CACHE_MAX_CHARS, persistent_dir=None):
+        self.max_chars = max_chars
+        self.store = ConversionCache(persistent_dir) if persistent_dir else None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # key -> Markdown，最近访问的在末尾
+        self._chars = 0
+        # 路径+大小+修改时间 -> 内容哈希
+        self._hash_memo = {}
+
+    def workbook_hash(self, filename):
+        """返回工作簿内容哈希，文件未变化时复用上次的计算结果"""
+        stat = os.stat(filename)
+        memo_key = (os.path.normcase(os.path.abspath(filename)), stat.st_size, stat.st_mtime_ns)
+        with self._lock:
+            digest = self._hash_memo.get(memo_key)
+        if digest is None:
+            digest = _file_sha256(filename)
+            with self._lock:
+                self._hash_memo[memo_key] = digest
+        return digest
+
+    @staticmethod
+    def _key(digest, sheet_name, limits):
+        payload = json.dumps({
+            'content': digest,
+            'sheet': sheet_name,
+            'limits': limits,
+            'version': _converter_version(),
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, digest, sheet_name, limits=None):
+        """读取缓存的 sheet Markdown，未命中时返回 None"""
+        key = self._key(digest, sheet_name, limits)
+        with self._lock:
+            text = self._entries.get(key)
+            if text is not None:
+                self._entries.move_to_end(key)
+                return text
+        if self.store is None:
+            return None
+        text = self.store.get(key)
+        if text is not None:
+            self._remember(key, text)
+        return text
+
+    def put(self, digest, sheet_name, limits, text):
+        """写入缓存，过大的 sheet 直接忽略"""
+        if len(text) > SHEET_CACHE_MAX_ENTRY_CHARS:
+            return
+        key = self._key(digest, sheet_name, limits)
+        self._remember(key, text)
+        if self.store is not None:
+            self.store.put(key, text)
+
+    def _remember(self, key, text):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._chars -= len(previous)
+            self._entries[key] = text
+            self._chars += len(text)
+            while self._chars > self.max_chars and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._chars -= len(evicted)
+
+
+# 每个进程一个 sheet 缓存；常驻的转换进程在整个会话期间复用
+_sheet_cache = None
+
+
+def _get_sheet_cache():
+    global _sheet_cache
+    if _sheet_cache is None:
+        _sheet_cache = SheetCache(persistent_dir=SHEET_CACHE_DIR)
+    return _sheet_cache
+
+
+class _CaptureWriter:
+    """转发写入的同时记录文本，超过 limit 个字符后放弃记录"""
+
+    def __init__(self, out, limit):
+        self._out = out
+        self._limit = limit
+        self._parts = []
+        self._chars = 0
+
+    def write(self, text):
+        self._out.write(text)
+        if self._parts is not None:
+            self._chars += len(text)
+            if self._chars > self._limit:
+                self._parts = None
+            else:
+                self._parts.append(text)
+
+    def getvalue(self):
+        """返回记录的文本，超过上限时返回 None"""
+        return ''.join(self._parts) if self._parts is not None else None
+
+
+def _convert_excel_sheets(filename, selected_sheets, sink=None, max_workers=None, tracer=None,
+                          progress=None, limits=None, sheet_cache=True, engine=None):
+    """转换选中的 Excel sheets
+
+    传入 sink（任何带 write 方法的对象，如打开的文件）时结果写入 sink 并返回 None：
+    每个 sheet 的标题先写出，表格在该 sheet 读完后逐行写出（参见 _iter_sheet_markdown）。
+    否则返回完整的 Markdown 文本。max_workers 为 1 时在当前进程顺序转换，
+    否则较大的工作簿会把各 sheet 分配到多个进程并行转换。
+    progress 参见 convert_source，details 中包含 sheets_done 和 sheets_total。
+    limits 参见 LIMIT_KEYS。sheet_cache 为 True 时复用本进程的 sheet 缓存，
+    只转换缓存中没有的 sheet。engine 为读取引擎，参见 EXCEL_ENGINES。
+    """
+    if not selected_sheets:
+        raise Exception("请至少选择一个 Sheet")
+    engine = _resolve_excel_engine(engine)
+
+    tracer = tracer or Tracer()
+    limits = _normalize_limits(limits)
+    buffer = io.StringIO() if sink is None else None
+    out = sink if sink is not None else buffer
+    cache = _get_sheet_cache() if sheet_cache else None
+    cached = {}
+    if cache is not None:
+        with tracer.span('sheet_cache.lookup', sheets=len(selected_sheets)) as attributes:
+            try:
+                digest = cache.workbook_hash(filename)
+            except OSError:
+                cache = None
+            else:
+                for sheet_name in selected_sheets:
+                    text = cache.get(digest, sheet_name, limits)
+                    if text is not None:
+                        cached[sheet_name] = text
+            attributes['hits'] = len(cached)
+
+    def store_sheet(sheet_name, text):
+        cache.put(digest, sheet_name, limits, text)
+
+    on_sheet = store_sheet if cache is not None else None
+    missing = [name for name in selected_sheets if name not in cached]
+    workers = _excel_sheet_workers(filename, missing, max_workers)
+    with tracer.span('excel.convert', file_size=_source_size(filename), sheets=len(selected_sheets),
+                     cached_sheets=len(cached), workers=workers, engine=engine):
+        if workers > 1:
+            _convert_excel_sheets_parallel(filename, selected_sheets, out, workers, tracer, progress, limits,
+                                           cached, on_sheet, engine)
+        else:
+            _convert_excel_sheets_sequential(filename, selected_sheets, out, tracer, progress, limits,
+                                             cached, on_sheet, engine)
+    return buffer.getvalue() if buffer is not None else None
+
+
+class _SheetIncomplete(Exception):
+    """sheet 已写出部分内容后转换失败；错误说明已接在写出的内容之后"""
+
+
+def _sheet_error_markdown(sheet_name, e):
+    # 已写出部分内容的 sheet 不再重复标题，错误说明由 _write_sheet_markdown 写出
+    if isinstance(e, _SheetIncomplete):
+        return ""
+    return f"# {sheet_name}\n\n**错误**: 无法转换此 Sheet - {str(e)}\n\n"
+
+
+def _convert_excel_sheets_sequential(filename, selected_sheets, out, tracer, progress=None, limits=None,
+                                     cached=None, on_sheet=None, engine=None):
+    """在当前进程中顺序转换，工作簿只解析一次
+
+    cached 为 {sheet 名: Markdown}，其中的 sheet 直接写出，全部命中时不打开工作簿；
+    新转换成功的 sheet 以 on_sheet(sheet 名, Markdown) 回调，过大的 sheet 不回调。
+    总行数取自各 sheet 的 dimension 记录；有范围限制时按 sheet 数汇报进度。
+    """
+    cached = cached or {}
+    missing = [name for name in selected_sheets if name not in cached]
+    workbook = None
+    if missing:
+        try:
+            with tracer.span('workbook.open'):
+                workbook = _open_workbook(filename, engine)
+        except Exception as e:
+            out.write("\n\n---\n\n".join(
+                cached[name] if name in cached else _sheet_error_markdown(name, e) for name in selected_sheets))
+            return
+
+    try:
+        total_rows = 0
+        if progress and not limits:
+            try:
+                total_rows = sum(workbook[sheet_name].max_row for sheet_name in missing)
+            except Exception:
+                # 缺少 dimension 记录（max_row 为 None）时退回按 sheet 数汇报
+                total_rows = 0
+        rows_before = 0
+        sheets_done = 0
+
+        def report_rows(rows):
+            details = dict(sheets_done=sheets_done, sheets_total=len(selected_sheets))
+            if total_rows:
+                progress('rows', rows_before + rows, total_rows, **details)
+            else:
+                progress('sheets', sheets_done, len(selected_sheets), rows=rows_before + rows, **details)
+
+        on_rows = report_rows if progress else None
+        for index, sheet_name in enumerate(selected_sheets):
+            if index:
+                out.write("\n\n---\n\n")
+            stats = {}
+            if sheet_name in cached:
+                out.write(cached[sheet_name])
+            else:
+                capture = _CaptureWriter(out, SHEET_CACHE_MAX_ENTRY_CHARS) if on_sheet else out
+                try:
+                    # 将 sheet 数据转换为 markdown 表格，直接流式写出
+                    _write_sheet_markdown(workbook[sheet_name], sheet_name, capture, tracer,
+                                          stats=stats, on_rows=on_rows, limits=limits)
+                except Exception as e:
+                    out.write(_sheet_error_markdown(sheet_name, e))
+                else:
+                    if on_sheet and capture.getvalue() is not None:
+                        on_sheet(sheet_name, capture.getvalue())
+            if progress:
+                rows_before += stats.get('scanned_rows', 0)
+                sheets_done = index + 1
+                on_rows(0)
+    finally:
+        if workbook is not None:
+            workbook.close()
+
+
+def _convert_excel_sheets_parallel(filename, selected_sheets, out, workers, tracer, progress=None,
+                                   limits=None, cached=None, on_sheet=None, engine=None):
+    """在进程池中并行转换各 sheet，再按选择顺序拼接
+
+    每个工作进程只解析一次工作簿，之后复用于分配给它的所有 sheet。
+    各 sheet 的结果先写入临时文件，拼接时流式复制，避免在内存中保留整份结果。
+    cached 与 on_sheet 参见 _convert_excel_sheets_sequential。
+    """
+    cached = cached or {}
+    missing = [i for i, name in enumerate(selected_sheets) if name not in cached]
+    # 先提交最大的 sheet，使总耗时接近最大 sheet 的耗时
+    try:
+        parts = _xlsx_sheet_parts(filename)
+        with zipfile.ZipFile(filename) as archive:
+            sizes = {name: archive.getinfo(path).file_size
+                     for name, path in parts.items() if path in archive.NameToInfo}
+    except Exception:
+        sizes = {}
+    order = sorted(missing, key=lambda i: sizes.get(selected_sheets[i], 0), reverse=True)
+
+    context = multiprocessing.get_context('spawn')
+    with tempfile.TemporaryDirectory(prefix='markitdown_sheets_') as temp_dir:
+        paths = [os.path.join(temp_dir, f"{i}.md") for i in range(len(selected_sheets))]
+        converted = set()
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context) as executor:
+            futures = {executor.submit(_convert_sheet_to_file, filename, selected_sheets[i], paths[i], limits,
+                                       engine): i
+                       for i in order}
+            # 各 sheet 在其他进程中转换，只能按完成的 sheet 数汇报进度
+            rows = 0
+            sheets_done = len(cached)
+            for future in as_completed(futures):
+                spans, ok = future.result()
+                tracer.extend(spans)
+                if ok:
+                    converted.add(futures[future])
+                rows += sum(span['attributes'].get('rows', 0) for span in spans if span['name'] == 'sheet')
+                sheets_done += 1
+                if progress:
+                    progress('sheets', sheets_done, len(selected_sheets), rows=rows,
+                             sheets_done=sheets_done, sheets_total=len(selected_sheets))
+
+        for index, path in enumerate(paths):
+            if index:
+                out.write("\n\n---\n\n")
+            sheet_name = selected_sheets[index]
+            if sheet_name in cached:
+                out.write(cached[sheet_name])
+                continue
+            with open(path, 'r', encoding='utf-8') as f:
+                shutil.copyfileobj(f, out)
+            if on_sheet and index in converted and os.path.getsize(path) <= SHEET_CACHE_MAX_ENTRY_CHARS:
+                with open(path, 'r', encoding='utf-8') as f:
+                    on_sheet(sheet_name, f.read())
+
+
+# 并行转换 sheet 时，每个工作进程缓存自己打开的工作簿
+_process_workbooks = {}
+
+
+def _convert_sheet_to_file(filename, sheet_name, output_path, limits=None, engine=None):
+    """在工作进程中将单个 sheet 的 Markdown 写入 output_path，返回 (记录的 span, 是否成功)"""
+    tracer = Tracer()
+    with open(output_path, 'w', encoding='utf-8') as f:
+        try:
+            workbook = _process_workbooks.get((filename, engine))
+            if workbook is None:
+                with tracer.span('workbook.open'):
+                    workbook = _open_workbook(filename, engine)
+                _process_workbooks[(filename, engine)] = workbook
+            _write_sheet_markdown(workbook[sheet_name], sheet_name, f, tracer, limits=limits)
+        except Exception as e:
+            f.write(_sheet_error_markdown(sheet_name, e))
+            return tracer.spans, False
+    return tracer.spans, True
+
+
+def _worksheet_to_markdown(worksheet, sheet_name, limits=None):
+    """将 Excel worksheet 转换为 Markdown"""
+    buffer = io.StringIO()
+    _write_sheet_markdown(worksheet, sheet_name, buffer, limits=limits)
+    return buffer.getvalue()
+
+
+def _write_sheet_markdown(worksheet, sheet_name, sink, tracer=None, stats=None, on_rows=None, limits=None):
+    """将 worksheet 的 Markdown 写入 sink，表格在 sheet 读完后逐行写出
+
+    记录 sheet.read（遍历单元格）和 sheet.assemble（生成并写出 Markdown）两个阶段。
+    stats、on_rows 与 limits 参见 _iter_sheet_markdown。已写出部分内容后出错时，
+    在已写出的内容之后写入错误说明并抛出 _SheetIncomplete，调用方不必再写出整个 sheet 的错误。
+    """
+    tracer = tracer or Tracer()
+    write = sink.write
+    stats = {} if stats is None else stats
+    with tracer.span('sheet', sheet=sheet_name) as attributes:
+        start = time.perf_counter()
+        written = False
+        try:
+            for line in _iter_sheet_markdown(worksheet, sheet_name, stats, on_rows, limits):
+                write(line)
+                written = True
+        except Exception as e:
+            if not written:
+                raise
+            write(f"\n**错误**: 此 Sheet 转换中途失败，以上内容不完整 - {str(e)}\n\n")
+            raise _SheetIncomplete(str(e)) from e
+        elapsed = time.perf_counter() - start
+        read_seconds = stats.get('read_seconds', 0.0)
+        attributes.update(rows=stats.get('rows', 0), columns=stats.get('columns', 0))
+        if stats.get('truncated'):
+            attributes['truncated'] = True
+        tracer.add('sheet.read', read_seconds)
+        tracer.add('sheet.assemble', max(0.0, elapsed - read_seconds))
+
+
+# 每遍历这么多行回调一次 on_rows
+PROGRESS_ROW_INTERVAL = 1000
+
+# 转换范围限制（limits 字典）支持的键：
+#   max_rows     表头之后最多转换的行数
+#   max_columns  最多转换的列数（从区域的第一列算起）
+#   cell_range   A1 形式的区域，如 'B2:F200'、'A:D'
+#   tail_rows    抽样模式：除前 max_rows 行外，再附上最后这么多行
+LIMIT_KEYS = ('max_rows', 'max_columns', 'cell_range', 'tail_rows')
+
+
+_LIMIT_LABELS = {'max_rows': '最大行数', 'max_columns': '最大列数', 'tail_rows': '末尾行数'}
+
+
+def _normalize_limits(limits):
+    """检查并去掉未设置（None 或空字符串）的项，没有任何限制时返回 None，便于作为缓存键和跨进程传递
+
+    行列数必须是正整数，cell_range 必须是有效的 A1 区域，否则抛出 ValueError。
+    """
+    if not limits:
+        return None
+    if not isinstance(limits, dict):
+        raise ValueError("转换范围限制必须是对象")
+    unknown = set(limits) - set(LIMIT_KEYS)
+    if unknown:
+        raise ValueError(f"未知的转换范围限制: {', '.join(sorted(unknown))}")
+    normalized = {}
+    for key in LIMIT_KEYS:
+        value = limits.get(key)
+        if value is None or value == '':
+            continue
+        if key == 'cell_range':
+            if not isinstance(value, str):
+                raise ValueError(f"无效的单元格区域: {value!r}")
+            _parse_cell_range(value)  # 尽早报告无效区域
+        elif isinstance(value, bool) or not isinstance(value, int) or value <= 0:
+            raise ValueError(f"{_LIMIT_LABELS[key]}必须是正整数: {value!r}")
+        normalized[key] = value
+    return normalized or None
+
+
+def _sheet_bounds(worksheet, limits):
+    """根据 limits 计算要遍历的 (min_row, max_row, min_col, max_col)
+
+    上界不超过 sheet 的 dimension。
+    """
+    min_col = min_row = max_col = max_row = None
+    if limits.get('cell_range'):
+        min_col, min_row, max_col, max_row = _parse_cell_range(limits['cell_range'])
+    if limits.get('max_columns'):
+        limit = (min_col or 1) + limits['max_columns'] - 1
+        max_col = min(max_col, limit) if max_col else limit
+    if max_col and worksheet.max_column:
+        max_col = min(max_col, worksheet.max_column)
+    if max_row and worksheet.max_row:
+        max_row = min(max_row, worksheet.max_row)
+    return min_row, max_row, min_col, max_col
+
+
+def _iter_compact_rows(worksheet, min_row=None, max_row=None, min_col=None, max_col=None):
+    """逐行返回单元格值，去掉末尾的空单元格
+
+    read-only 模式下 openpyxl 会把每一行补齐到 dimension 记录的列数，
+    而 dimension 常因整列设置了格式被放大到 XFD 列。未指定 max_col 时
+    调用 reset_dimensions() 清除记录的行列数（行数仍取原来的 max_row），
+    每行只取到最后一个实际存在的单元格，缺失的行返回空元组。
+
+    lxml 引擎的 sheet 使用 iter_values，openpyxl 的 sheet 使用 iter_rows(values_only=True)。
+    """
+    reset_dimensions = getattr(worksheet, 'reset_dimensions', None)
+    if max_col is None and reset_dimensions is not None:
+        if max_row is None:
+            max_row = worksheet.max_row
+        reset_dimensions()
+    iter_values = getattr(worksheet, 'iter_values', None)
+    if iter_values is not None:
+        rows = iter_values(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col)
+    else:
+        rows = worksheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col,
+                                   values_only=True)
+    for row in rows:
+        n = len(row)
+        while n and row[n - 1] is None:
+            n -= 1
+        yield row if n == len(row) else row[:n]
+
+
+# 表格列数取 sheet 前这么多个非空行的最大列数，这些行暂存后一起输出，之后的行读到即输出
+SHEET_WIDTH_PROBE_ROWS = 1000
+# 暂存的行超过此大小写入临时文件
+SHEET_SPOOL_MEMORY_BYTES = 16 * 1024 * 1024
+
+
+def _read_spooled_rows(spool):
+    """逐个读回暂存的行，返回 (列数, 拼接后的文本)
+
+    每行以 "列数 字节数\n" 开头，后接该行 UTF-8 编码的文本。
+    """
+    spool.seek(0)
+    while True:
+        header = spool.readline()
+        if not header:
+            return
+        n, size = map(int, header.split())
+        yield n, spool.read(size).decode('utf-8')
+
+
+def _iter_sheet_markdown(worksheet, sheet_name, stats=None, on_rows=None, limits=None):
+    """生成 worksheet 的 Markdown 文本
+
+    表格列数取实际用到的列，不依赖可能被放大的 dimension：遍历时每行只保留到最后一个
+    非空单元格，前 SHEET_WIDTH_PROBE_ROWS 个非空行暂存在 SpooledTemporaryFile 中，
+    按其中最大的列数补齐后输出，之后的行读到即输出。因此表格内容最多延迟这么多行才开始生成，
+    暂存超过 SHEET_SPOOL_MEMORY_BYTES 后写入临时文件。之后出现的更宽的行按实际列数输出，
+    不再补齐前面的行。传入 stats 字典时，结束后填入行数、最大列数、遍历的总行数（含空行）
+    和读取单元格所用的时间。传入 on_rows 时每遍历 PROGRESS_ROW_INTERVAL 行以已遍历行数调用一次。
+
+    limits 参见 LIMIT_KEYS。只限制行数时读到足够的行即停止；抽样模式需要
+    读到末尾，但表头和前 max_rows 行之后的行只保留最后 tail_rows 行。
+    """
+    yield f"# {sheet_name}\n\n"
+
+    # 获取有数据的区域
+    if worksheet.max_row == 1 and worksheet.max_column == 1:
+        yield "此 Sheet 为空\n"
+        return
+
+    limits = limits or {}
+    tail_rows = limits.get('tail_rows') or 0
+    head_rows = limits.get('max_rows') or (0 if tail_rows else None)
+    tail = deque(maxlen=tail_rows) if tail_rows else None
+    truncated = False
+    skipped = 0
+
+    width = 0
+    # 表格的列数，确定之前为 None，此前的行都在暂存中
+    table_width = None
+    row_count = 0
+    scanned = 0
+    read_seconds = 0.0
+    clock = time.perf_counter
+    rows = _iter_compact_rows(worksheet, *_sheet_bounds(worksheet, limits))
+    with tempfile.SpooledTemporaryFile(max_size=SHEET_SPOOL_MEMORY_BYTES) as spool, closing(rows):
+
+        def flush_spool():
+            # 第一行有数据的行作为表头，暂存的各行补齐到 table_width 列
+            for index, (n, line) in enumerate(_read_spooled_rows(spool)):
+                yield "| " + line + " | " * (table_width - n) + " |\n"
+                if not index:
+                    yield "| " + " | ".join(['---'] * table_width) + " |\n"
+            spool.seek(0)
+            spool.truncate()
+
+        while True:
+            read_start = clock()
+            row = next(rows, None)
+            read_seconds += clock() - read_start
+            if row is None:
+                break
+            scanned += 1
+            if on_rows and not scanned % PROGRESS_ROW_INTERVAL:
+                on_rows(scanned)
+            # 跳过完全空的行（末尾空单元格已去掉）
+            if not row:
+                continue
+            if head_rows is not None and row_count > head_rows:
+                # 已取得表头和前 max_rows 行：之后的非空行只标记截断（抽样模式下保留在 tail 中），
+                # 不再拼接输出
+                if not any(cell is not None and str(cell).strip() for cell in row):
+                    continue
+                truncated = True
+                if tail is None:
+                    break
+                if len(tail) == tail_rows:
+                    skipped += 1
+                tail.append(row)
+                continue
+            # 将 None 值转换为空字符串，其他值转换为字符串
+            cells = ['' if cell is None else str(cell) for cell in row]
+            if not any(cell.strip() for cell in cells):
+                continue
+            row_count += 1
+            width = max(width, len(cells))
+            line = " | ".join(cells)
+            if table_width is not None:
+                yield "| " + line + " | " * (table_width - len(cells)) + " |\n"
+                continue
+            data = line.encode('utf-8')
+            spool.write(f"{len(cells)} {len(data)}\n".encode('ascii') + data)
+            if row_count == SHEET_WIDTH_PROBE_ROWS:
+                table_width = width
+                yield from flush_spool()
+
+        tail_lines = []
+        for row in tail or ():
+            cells = ['' if cell is None else str(cell) for cell in row]
+            width = max(width, len(cells))
+            tail_lines.append((len(cells), " | ".join(cells)))
+        row_count += len(tail_lines)
+
+        if stats is not None:
+            stats.update(rows=row_count, columns=width, scanned_rows=scanned, read_seconds=read_seconds,
+                         truncated=truncated)
+        if not width:
+            yield "此 Sheet 为空\n"
+            return
+        if table_width is None:
+            table_width = width
+            yield from flush_spool()
+    if skipped:
+        yield "| " + " | ".join(['…'] * table_width) + " |\n"
+    for n, line in tail_lines:
+        yield "| " + line + " | " * (table_width - n) + " |\n"
+
+    if truncated and tail is None:
+        yield f"\n> 已截断：仅转换前 {head_rows:,} 行\n"
+    elif skipped:
+        yield f"\n> 抽样：前 {head_rows:,} 行和最后 {tail_rows:,} 行，省略 {skipped:,} 行\n"
+
+
+# ===== 批量转换（在进程池中运行）=====
+# 每个工作进程各自持有一个 MarkItDown 实例，只转换 Excel 的进程不会初始化它
+_process_md = LazyMarkItDown()
+
+
+# 批量转换中，这段时间内已下载的 URL 不再重新验证
+BATCH_URL_MAX_AGE = 3600
+
+
+def _batch_convert_file(source, output_path, sheets=None, trace_log=None, limits=None, pages=None,
+                        chunks=None):
+    """在工作进程中转换单个文件并写出结果，返回 (是否成功, 信息, 耗时)，成功时信息为输出路径
+
+    sheets 为 None 时 Excel 文件转换全部 sheet，limits 只作用于 Excel 文件，pages 只作用于 PDF。
+    URL 通常已由主进程预先下载到 HTTP 缓存，这里直接使用缓存的内容。
+    chunks 为 (分块格式, 每块字符数) 时分块写出，参见 convert_source_to_chunks。
+    """
+    start = time.perf_counter()
+    tracer = Tracer()
+    try:
+        with tracer.span('batch.file', source=source, file_size=_source_size(source)):
+            selected_sheets = None
+            if EXCEL_SUPPORT and not _is_url(source) and Path(source).suffix.lower() == '.xlsx':
+                selected_sheets = list(sheets) if sheets else list(_xlsx_sheet_parts(source))
+            # 批量任务本身已占满进程池，sheet 不再并行；结果直接写入输出文件。
+            # 每个文件只转换一次，不必占用内存缓存 sheet
+            options = dict(max_workers=1, tracer=tracer, limits=limits, preview_chars=0,
+                           sheet_cache=False, url_max_age=BATCH_URL_MAX_AGE,
+                           pages=pages if _is_pdf_path(source) else None)
+            if chunks:
+                chunk_format, chunk_chars = chunks
+                output_path = convert_source_to_chunks(_process_md, source, output_path, chunk_format, chunk_chars,
+                                                       source, selected_sheets, **options)['output_path']
+            else:
+                convert_source_to_file(_process_md, source, output_path, source, selected_sheets, **options)
+        return True, output_path, time.perf_counter() - start
+    except Exception as e:
+        return False, _conversion_error_message(e), time.perf_counter() - start
+    finally:
+        _write_trace_log(tracer, trace_log)
+
+
+# 批量转换时在后台计算内容哈希的线程数；哈希提前进行，与转换并行
+BATCH_HASH_WORKERS = 2
+
+
+def _copy_batch_output(output, source, output_path, chunks=None):
+    """将已转换文件的结果复制为 source 的输出，返回实际写入的路径
+
+    output 为已转换文件实际写入的路径；分块输出时逐块复制，JSONL 中的 source 改为新文件。
+    """
+    if not chunks:
+        with _atomic_output(output_path) as f:
+            with open(output, 'r', encoding='utf-8') as src:
+                shutil.copyfileobj(src, f)
+        return output_path
+    chunk_format = chunks[0]
+    target = _chunk_output_path(output_path, chunk_format)
+    try:
+        if chunk_format == 'files':
+            sink = _ChunkFileSink(target, source)
+            names = sorted((name for name in os.listdir(output) if _CHUNK_FILE_RE.match(name)
+                            and not name.endswith('.part')), key=lambda name: int(name.split('.')[0]))
+            for name in names:
+                with open(os.path.join(output, name), 'r', encoding='utf-8') as f:
+                    sink.write({'index': int(name.split('.')[0]), 'text': f.read()})
+        else:
+            sink = _ChunkJsonlSink(target, source)
+            with open(output, 'r', encoding='utf-8') as f:
+                for line in f:
+                    record = json.loads(line)
+                    record.pop('source', None)
+                    sink.write(record)
+        sink.close()
+    except BaseException:
+        _remove_chunk_output(target, chunk_format)
+        raise
+    return target
+
+
+class _BatchDeduper:
+    """批量转换的重复输入检测
+
+    在后台线程中按任务顺序提前计算本地文件的内容哈希。内容相同（扩展名和 sheet 选择也相同）
+    的文件只转换第一个，其余等它完成后复制其结果；第一个失败时其余以相同的原因失败。
+    duplicates、saved_bytes 和 saved_seconds 记录跳过的文件数、输入大小和省下的转换时间。
+    """
+
+    def __init__(self, jobs, report, chunks=None, on_duplicate=None, workers=BATCH_HASH_WORKERS):
+        self._report = report
+        self._chunks = chunks
+        self._on_duplicate = on_duplicate
+        self._executor = ThreadPoolExecutor(max_workers=max(1, workers))
+        self._hashes = {index: self._executor.submit(_file_sha256, source)
+                        for index, source, _, _ in jobs if not _is_url(source)}
+        self._primaries = {}
+        self._results = {}
+        self._waiting = {}
+        self.duplicates = 0
+        self.saved_bytes = 0
+        self.saved_seconds = 0.0
+
+    def defer(self, job):
+        """job 与已提交的任务内容相同时返回 True，结果稍后（或立即）由复制得到"""
+        index, source, _, sheets = job
+        future = self._hashes.get(index)
+        if future is None:
+            return False
+        try:
+            sha256 = future.result()
+        except OSError:
+            # 读取失败交给转换报告错误
+            return False
+        key = (sha256, Path(source).suffix.lower(), tuple(sheets) if sheets else None)
+        primary = self._primaries.setdefault(key, index)
+        if primary == index:
+            return False
+        if self._on_duplicate:
+            self._on_duplicate(index, primary)
+        if primary in self._results:
+            self._fan_out(job, primary)
+        else:
+            self._waiting.setdefault(primary, []).append(job)
+        return True
+
+    def finished(self, index, success, message, seconds):
+        """转换完成的任务如有内容相同的文件在等待，为它们复制结果"""
+        self._results[index] = (success, message, seconds)
+        for job in self._waiting.pop(index, ()):
+            self._fan_out(job, index)
+
+    def _fan_out(self, job, primary):
+        index, source, output_path, _ = job
+        success, message, seconds = self._results[primary]
+        if not success:
+            self._report(index, False, message, 0.0)
+            return
+        start = time.perf_counter()
+        try:
+            path = _copy_batch_output(message, source, output_path, self._chunks)
+        except Exception as e:
+            self._report(index, False, f"复制重复文件的结果失败: {e}", time.perf_counter() - start)
+            return
+        self.duplicates += 1
+        self.saved_bytes += _source_size(source) or 0
+        self.saved_seconds += seconds
+        self._report(index, True, path, time.perf_counter() - start)
+
+    def stats(self):
+        return {'duplicates': self.duplicates, 'saved_bytes': self.saved_bytes,
+                'saved_seconds': self.saved_seconds}
+
+    def close(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+def _run_batch(jobs, max_workers, on_started=None, on_finished=None, should_stop=None, trace_log=None,
+               limits=None, pages=None, chunks=None, dedupe=True, on_duplicate=None, stats=None):
+    """转换一组 (index, source, output_path, sheets) 任务，返回 (成功数, 失败数)
+
+    max_workers 为 1 时在当前进程中依次转换，否则使用进程池；
+    on_started(index) 与 on_finished(index, success, message, seconds) 用于汇报状态。
+    chunks 参见 _batch_convert_file。dedupe 为 True 时内容相同的文件只转换一次，
+    参见 _BatchDeduper；发现重复时以 on_duplicate(index, 内容相同的任务 index) 通知，
+    传入 stats 字典时结束后填入 duplicates、saved_bytes 和 saved_seconds。
+    """
+    succeeded = failed = 0
+    deduper = None
+
+    def report(index, success, message, seconds):
+        nonlocal succeeded, failed
+        if success:
+            succeeded += 1
+        else:
+            failed += 1
+        if on_finished:
+            on_finished(index, success, message, seconds)
+        if deduper is not None:
+            deduper.finished(index, success, message, seconds)
+
+    if dedupe and len(jobs) > 1:
+        deduper = _BatchDeduper(jobs, report, chunks, on_duplicate)
+    try:
+        _run_batch_jobs(jobs, max_workers, report, deduper, on_started, should_stop, trace_log,
+                        limits, pages, chunks)
+    finally:
+        if deduper is not None:
+            deduper.close()
+            if stats is not None:
+                stats.update(deduper.stats())
+    return succeeded, failed
+
+
+def _run_batch_jobs(jobs, max_workers, report, deduper, on_started, should_stop, trace_log, limits, pages,
+                    chunks):
+    """_run_batch 的调度部分：依次或在进程池中转换，重复的文件交给 deduper"""
+    if max_workers == 1:
+        for job in jobs:
+            if should_stop and should_stop():
+                break
+            if deduper is not None and deduper.defer(job):
+                continue
+            index, source, output_path, sheets = job
+            if on_started:
+                on_started(index)
+            report(index, *_batch_convert_file(source, output_path, sheets, trace_log, limits, pages, chunks))
+        return
+
+    pending = iter(jobs)
+    running = {}
+    # spawn 方式启动子进程，避免 fork 带着 Qt 线程状态
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=max_workers, mp_context=context, **_recycling_options()) as executor:
+        while True:
+            # 保持提交的任务数与进程数一致，这样“转换中”的状态是准确的
+            while not (should_stop and should_stop()) and len(running) < max_workers:
+                job = next(pending, None)
+                if job is None:
+                    break
+                if deduper is not None and deduper.defer(job):
+                    continue
+                index, source, output_path, sheets = job
+                running[executor.submit(_batch_convert_file, source, output_path, sheets,
+                                        trace_log, limits, pages, chunks)] = index
+                if on_started:
+                    on_started(index)
+            if not running:
+                break
+            done, _ = wait(running, timeout=0.5, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = (False, f"转换失败: {str(e)}", 0.0)
+                report(index, *result)
+
+
+def _dedupe_summary(stats):
+    """重复输入节省的工作量，stats 参见 _run_batch"""
+    return (f"{stats['duplicates']} 个文件与其他文件内容相同，已复用结果，"
+            f"少转换 {_format_bytes(stats['saved_bytes'])}，约节省 {stats['saved_seconds']:.1f}s")
+
+
+def _plan_batch_jobs(files, output_dir=None, sheets=None):
+    """为每个文件分配输出路径，返回 _run_batch 所需的任务列表"""
+    used_paths = set()
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    return [(index, source, _batch_output_path(source, output_dir, used_paths), sheets)
+            for index, source in enumerate(files)]
+
+
+def _collect_batch_files(paths):
+    """展开文件夹和通配符并过滤出支持的文件，保持顺序且去除重复路径"""
+    files = []
+    seen = set()
+    expanded = []
+    for path in paths:
+        # Windows 的命令行不会展开通配符，这里统一处理
+        if glob.has_magic(str(path)):
+            expanded.extend(sorted(glob.glob(str(path), recursive=True)))
+        else:
+            expanded.append(path)
+    for path in expanded:
+        path = Path(path)
+        if path.is_dir():
+            candidates = sorted(
+                Path(root) / name
+                for root, _, names in os.walk(path)
+                for name in names
+                if Path(name).suffix.lower() in BATCH_EXTENSIONS
+            )
+        elif path.is_file():
+            candidates = [path]
+        else:
+            continue
+        for candidate in candidates:
+            key = os.path.normcase(str(candidate.resolve()))
+            if key not in seen:
+                seen.add(key)
+                files.append(str(candidate))
+    return files
+
+
+def _batch_output_path(source, output_dir, used_paths):
+    """计算批量转换的输出路径：源文件旁或输出目录中，重名时追加序号
+
+    URL 没有所在目录，未指定输出目录时保存在当前目录。
+    """
+    if _is_url(source):
+        target_dir = Path(output_dir or '.')
+        stem = _url_output_stem(source)
+    else:
+        source_path = Path(source)
+        target_dir = Path(output_dir) if output_dir else source_path.parent
+        stem = source_path.stem
+    candidate = target_dir / f"{stem}.md"
+    index = 1
+    while os.path.normcase(str(candidate)) in used_paths:
+        candidate = target_dir / f"{stem}_{index}.md"
+        index += 1
+    used_paths.add(os.path.normcase(str(candidate)))
+    return str(candidate)
+
+
+def _url_output_stem(url):
+    """由 URL 路径的最后一段（没有时用主机名）生成输出文件名"""
+    parsed = urlparse(url)
+    name = Path(posixpath.basename(parsed.path.rstrip('/'))).stem or parsed.hostname or 'web_content'
+    return re.sub(r'[<>:"/\\|?*\s]+', '_', name).strip('._') or 'web_content'
+
+
+# ===== 监视文件夹 =====
+# 清单保存在输出目录（未指定时为被监视的文件夹）中，记录已转换文件的状态
+WATCH_MANIFEST_NAME = '.markitdown_watch.json'
+WATCH_MANIFEST_VERSION = 1
+WATCH_POLL_INTERVAL = 2.0
+# 文件的修改时间和大小在这段时间内保持不变才认为已写完，避免转换写到一半的文件
+WATCH_DEBOUNCE_SECONDS = 2.0
+
+
+def _ignore_sigint():
+    """工作进程忽略 Ctrl+C，由主进程负责停止并等待正在转换的文件完成"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _watch_convert_file(source, output_path, sheets, trace_log, limits, previous_sha256):
+    """监视模式的单个任务：先计算内容哈希，内容未变时不再转换
+
+    返回 (sha256, 是否转换, 是否成功, 信息, 耗时)。
+    """
+    sha256 = _file_sha256(source)
+    if sha256 == previous_sha256:
+        return sha256, False, True, output_path, 0.0
+    return (sha256, True) + _batch_convert_file(source, output_path, sheets, trace_log, limits)
+
+
+class FolderWatcher:
+    """轮询监视文件夹，自动转换新增或修改过的文件
+
+    清单记录每个源文件的修改时间、大小和内容哈希，重启后只处理真正变化的文件；
+    修改时间变了但内容未变的文件只更新清单，不会重新转换。
+    """
+
+    def __init__(self, root, output_dir=None, max_workers=None, sheets=None, limits=None,
+                 poll_interval=WATCH_POLL_INTERVAL, debounce=WATCH_DEBOUNCE_SECONDS, trace_log=None):
+        self.root = os.path.abspath(root)
+        self.output_dir = os.path.abspath(output_dir) if output_dir else None
+        self.max_workers = max(1, max_workers or os.cpu_count() or 1)
+        self.sheets = sheets
+        self.limits = limits
+        self.poll_interval = poll_interval
+        self.debounce = debounce
+        self.trace_log = trace_log
+        self.manifest_path = os.path.join(self.output_dir or self.root, WATCH_MANIFEST_NAME)
+        self.manifest = self._load_manifest()
+        self._pending = {}  # 相对路径 -> ((mtime_ns, size), 首次观察到该状态的时间)
+        self._running = {}  # future -> (相对路径, (mtime_ns, size), 输出路径)
+        self._dirty = False
+        self._pool_broken = False
+
+    def _load_manifest(self):
+        try:
+            with open(self.manifest_path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return {}
+        if not isinstance(data, dict) or data.get('version') != WATCH_MANIFEST_VERSION:
+            return {}
+        files = data.get('files')
+        return files if isinstance(files, dict) else {}
+
+    def _save_manifest(self):
+        self._dirty = False
+        os.makedirs(os.path.dirname(self.manifest_path), exist_ok=True)
+        temp_path = f"{self.manifest_path}.{uuid.uuid4().hex}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump({'version': WATCH_MANIFEST_VERSION, 'files': self.manifest}, f,
+                      ensure_ascii=False, indent=1)
+        os.replace(temp_path, self.manifest_path)
+
+    def _scan(self):
+        """返回 {相对路径: (mtime_ns, size)}，跳过隐藏文件和 Office 的 ~$ 临时文件"""
+        found = {}
+        for dirpath, dirnames, filenames in os.walk(self.root):
+            dirnames[:] = [name for name in dirnames if not name.startswith('.')]
+            for name in filenames:
+                if name.startswith(('.', '~$')) or Path(name).suffix.lower() not in BATCH_EXTENSIONS:
+                    continue
+                path = os.path.join(dirpath, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue  # 扫描期间被删除
+                found[os.path.relpath(path, self.root)] = (stat.st_mtime_ns, stat.st_size)
+        return found
+
+    def _output_path(self, rel):
+        """输出路径：输出目录中保持相同的子目录结构；同名不同扩展名的文件改用完整文件名"""
+        entry = self.manifest.get(rel)
+        if entry and entry.get('output'):
+            return entry['output']
+        rel_path = Path(rel)
+        target_dir = Path(self.output_dir or self.root) / rel_path.parent
+        claimed = {os.path.normcase(e.get('output') or '') for r, e in self.manifest.items() if r != rel}
+        claimed.update(os.path.normcase(output) for _, _, output in self._running.values())
+        candidate = target_dir / f"{rel_path.stem}.md"
+        if os.path.normcase(str(candidate)) in claimed:
+            candidate = target_dir / f"{rel_path.name}.md"
+        return str(candidate)
+
+    def _ready_files(self, now):
+        """返回已稳定且与清单不一致、可以提交的文件；清单中已删除的文件会被移除"""
+        current = self._scan()
+        busy = {rel for rel, _, _ in self._running.values()}
+        ready = []
+        for rel, stat in current.items():
+            entry = self.manifest.get(rel)
+            if entry and (entry.get('mtime_ns'), entry.get('size')) == stat:
+                self._pending.pop(rel, None)
+                continue
+            if rel in busy:
+                continue  # 转换完成后如仍有变化会在下一轮发现
+            seen = self._pending.get(rel)
+            if seen is None or seen[0] != stat:
+                self._pending[rel] = (stat, now)
+            elif now - seen[1] >= self.debounce:
+                ready.append(rel)
+        for rel in list(self._pending):
+            if rel not in current:
+                del self._pending[rel]
+        removed = [rel for rel in self.manifest if rel not in current and rel not in busy]
+        for rel in removed:
+            del self.manifest[rel]
+            self._dirty = True
+        return ready, removed
+
+    def _collect(self, futures, on_event):
+        """记录已完成任务的结果并更新清单"""
+        for future in futures:
+            rel, stat, output_path = self._running.pop(future)
+            try:
+                sha256, converted, success, message, seconds = future.result()
+            except Exception as e:
+                # 工作进程崩溃或文件读取失败：不写入清单，下一轮会重新提交
+                self._pool_broken = self._pool_broken or isinstance(e, BrokenProcessPool)
+                if on_event:
+                    on_event({'event': 'failed', 'source': os.path.join(self.root, rel), 'output': output_path,
+                              'message': f"转换失败: {str(e)}", 'seconds': 0.0})
+                continue
+            self._dirty = True
+            # 转换失败的文件不记录哈希，文件再次修改时会重试，而不是每轮都重试
+            self.manifest[rel] = {
+                'mtime_ns': stat[0],
+                'size': stat[1],
+                'sha256': sha256 if success else None,
+                'output': output_path if success else self.manifest.get(rel, {}).get('output'),
+                'error': None if success else message,
+            }
+            if on_event:
+                kind = ('converted' if converted else 'unchanged') if success else 'failed'
+                on_event({'event': kind, 'source': os.path.join(self.root, rel),
+                          'output': output_path, 'message': message, 'seconds': seconds})
+
+    def run(self, on_event=None, should_stop=None):
+        """持续监视直到 should_stop() 返回 True；on_event(dict) 汇报每个文件的处理结果"""
+        # spawn 方式启动子进程，避免 fork 带着 Qt 线程状态
+        context = multiprocessing.get_context('spawn')
+
+        def new_pool():
+            return ProcessPoolExecutor(max_workers=self.max_workers, mp_context=context,
+                                       initializer=_ignore_sigint, **_recycling_options())
+
+        executor = new_pool()
+        try:
+            while not (should_stop and should_stop()):
+                if self._pool_broken:
+                    # 某个文件让工作进程崩溃后进程池不可再用，换一个新的继续
+                    self._pool_broken = False
+                    executor.shutdown(wait=False)
+                    executor = new_pool()
+                ready, removed = self._ready_files(time.monotonic())
+                for rel in removed:
+                    if on_event:
+                        on_event({'event': 'removed', 'source': os.path.join(self.root, rel)})
+                # 提交的任务数不超过进程数，其余文件留到下一轮
+                for rel in ready[:self.max_workers - len(self._running)]:
+                    stat = self._pending.pop(rel)[0]
+                    output_path = self._output_path(rel)
+                    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+                    previous = self.manifest.get(rel, {}).get('sha256')
+                    future = executor.submit(_watch_convert_file, os.path.join(self.root, rel), output_path,
+                                             self.sheets, self.trace_log, self.limits, previous)
+                    self._running[future] = (rel, stat, output_path)
+                    if on_event:
+                        on_event({'event': 'started', 'source': os.path.join(self.root, rel)})
+                if self._running:
+                    done, _ = wait(self._running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                    self._collect(done, on_event)
+                else:
+                    time.sleep(self.poll_interval)
+                if self._dirty:
+                    self._save_manifest()
+        finally:
+            # 停止时不再提交新任务，等待正在转换的文件完成后记录到清单
+            executor.shutdown(wait=True, cancel_futures=True)
+            self._collect([f for f in list(self._running) if not f.cancelled()], on_event)
+            self._running.clear()
+            if self._dirty:
+                self._save_manifest()
+
+
+# ===== 转换结果缓存 =====
+# 缓存格式版本，转换逻辑改变输出时需递增，使旧缓存失效
+CACHE_FORMAT_VERSION = 1
+DEFAULT_CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def _default_cache_dir():
+    """返回当前平台的缓存目录"""
+    if sys.platform == 'win32':
+        base = os.environ.get('LOCALAPPDATA') or Path.home() / 'AppData' / 'Local'
+        return Path(base) / 'MarkItDownConverter' / 'cache'
+    base = os.environ.get('XDG_CACHE_HOME') or Path.home() / '.cache'
+    return Path(base) / 'markitdown_ui'
+
+
+def _converter_version():
+    """转换器版本标识，参与缓存键计算"""
+    versions = [f"format={CACHE_FORMAT_VERSION}"]
+    for package in ('markitdown', 'openpyxl'):
+        try:
+            versions.append(f"{package}={metadata.version(package)}")
+        except metadata.PackageNotFoundError:
+            versions.append(f"{package}=none")
+    return ";".join(versions)
+
+
+def _file_sha256(path, chunk_size=1024 * 1024):
+    """计算文件内容的 SHA-256"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(chunk_size)
+            if not chunk:
+                break
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ConversionCache:
+    """以文件内容哈希和转换参数为键的磁盘缓存，按 LRU 策略限制总大小
+
+    访问顺序和命中统计保存在内存中；索引在写入、淘汰、调整上限和清空时立即保存，
+    仅因读取而变化时最多每 INDEX_SAVE_INTERVAL 秒保存一次，关闭时（close 或进程退出）保存剩余的改动。
+    """
+
+    INDEX_NAME = 'index.json'
+    # 只有访问顺序和统计变化时，两次保存索引的最短间隔（秒）
+    INDEX_SAVE_INTERVAL = 5.0
+
+    def __init__(self, cache_dir=None):
+        self.cache_dir = Path(cache_dir) if cache_dir else _default_cache_dir()
+        self._lock = threading.Lock()
+        # key -> {"size": 字节数}，顺序即访问顺序（最近访问的在末尾）
+        self._entries = OrderedDict()
+        # 路径+大小+修改时间 -> 内容哈希，避免未修改的大文件重复计算哈希
+        self._hash_memo = {}
+        self.max_bytes = DEFAULT_CACHE_MAX_BYTES
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0
+        self._dirty = False
+        self._saved_at = time.monotonic()
+        self._load_index()
+        atexit.register(self.close)
+
+    def _load_index(self):
+        try:
+            with open(self.cache_dir / self.INDEX_NAME, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.max_bytes = index.get('max_bytes', DEFAULT_CACHE_MAX_BYTES)
+        self.hits = index.get('hits', 0)
+        self.misses = index.get('misses', 0)
+        self.bytes_saved = index.get('bytes_saved', 0)
+        for key, size in index.get('entries', []):
+            if (self.cache_dir / f"{key}.md").exists():
+                self._entries[key] = size
+        self._hash_memo = index.get('hash_memo', {})
+
+    # 哈希备忘录最多保留的条目数
+    HASH_MEMO_LIMIT = 2000
+
+    def _save_index(self):
+        if len(self._hash_memo) > self.HASH_MEMO_LIMIT:
+            recent = list(self._hash_memo.items())[-self.HASH_MEMO_LIMIT:]
+            self._hash_memo = dict(recent)
+        index = {
+            'max_bytes': self.max_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'bytes_saved': self.bytes_saved,
+            'entries': list(self._entries.items()),
+            'hash_memo': self._hash_memo,
+        }
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(index, f)
+        os.replace(tmp_path, self.cache_dir / self.INDEX_NAME)
+        self._dirty = False
+        self._saved_at = time.monotonic()
+
+    def _touch_index(self):
+        """记录只影响访问顺序和统计的改动，距上次保存超过 INDEX_SAVE_INTERVAL 秒时才写入"""
+        self._dirty = True
+        if time.monotonic() - self._saved_at >= self.INDEX_SAVE_INTERVAL:
+            self._save_index()
+
+    def flush(self):
+        """保存尚未写入的索引改动"""
+        with self._lock:
+            if self._dirty:
+                self._save_index()
+
+    def close(self):
+        """保存索引；之后仍可继续使用"""
+        try:
+            self.flush()
+        except OSError:
+            pass
+
+    def content_hash(self, path):
+        """返回文件内容哈希，文件未变化时复用上次的计算结果"""
+        stat = os.stat(path)
+        memo_key = f"{os.path.normcase(os.path.abspath(path))}|{stat.st_size}|{stat.st_mtime_ns}"
+        with self._lock:
+            cached = self._hash_memo.get(memo_key)
+        if cached:
+            return cached
+        digest = _file_sha256(path)
+        with self._lock:
+            self._hash_memo[memo_key] = digest
+            self._dirty = True
+        return digest
+
+    def make_key(self, path, **params):
+        """根据文件内容哈希、转换参数和转换器版本生成缓存键"""
+        payload = json.dumps({
+            'content': self.content_hash(path),
+            'params': params,
+            'version': _converter_version(),
+        }, sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        """读取缓存，未命中时返回 None"""
+        path = self.get_path(key)
+        if path is None:
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def get_path(self, key):
+        """返回缓存文件的路径，用于直接复制大结果；未命中时返回 None"""
+        with self._lock:
+            path = self.cache_dir / f"{key}.md"
+            if key not in self._entries or not path.is_file():
+                self._entries.pop(key, None)
+                self.misses += 1
+                self._touch_index()
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.bytes_saved += self._entries[key]
+            self._touch_index()
+            return path
+
+    def put(self, key, content):
+        """写入缓存并按大小上限淘汰最久未使用的条目"""
+        data = content.encode('utf-8')
+        self._store(key, len(data), lambda f: f.write(data))
+
+    def put_file(self, key, path):
+        """将已写好的结果文件复制进缓存，不读入内存"""
+        def copy(f):
+            with open(path, 'rb') as src:
+                shutil.copyfileobj(src, f)
+        self._store(key, os.path.getsize(path), copy)
+
+    def _store(self, key, size, write):
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+            with os.fdopen(fd, 'wb') as f:
+                write(f)
+            os.replace(tmp_path, self.cache_dir / f"{key}.md")
+            self._entries[key] = size
+            self._entries.move_to_end(key)
+            self._evict()
+            self._save_index()
+
+    def _evict(self):
+        total = sum(self._entries.values())
+        while total > self.max_bytes and self._entries:
+            key, size = self._entries.popitem(last=False)
+            total -= size
+            try:
+                os.remove(self.cache_dir / f"{key}.md")
+            except OSError:
+                pass
+
+    def set_max_bytes(self, max_bytes):
+        """调整缓存大小上限"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+            self._save_index()
+
+    def clear(self):
+        """清空所有缓存条目和统计"""
+        with self._lock:
+            for key in self._entries:
+                try:
+                    os.remove(self.cache_dir / f"{key}.md")
+                except OSError:
+                    pass
+            self._entries.clear()
+            self._hash_memo.clear()
+            self.hits = self.misses = self.bytes_saved = 0
+            self._save_index()
+
+    def stats(self):
+        """返回缓存统计信息"""
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'bytes_saved': self.bytes_saved,
+                'entries': len(self._entries),
+                'total_bytes': sum(self._entries.values()),
+                'max_bytes': self.max_bytes,
+            }
+
+
+def _peak_rss_bytes():
+    """当前进程的峰值常驻内存（字节），无法获取时返回 None"""
+    if sys.platform == 'win32':
+        counters = _windows_memory_counters()
+        return counters.PeakWorkingSetSize if counters else None
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux 以 KB 为单位，macOS 以字节为单位
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _current_rss_bytes():
+    """当前进程的常驻内存（字节），无法获取时返回 None"""
+    if sys.platform == 'win32':
+        counters = _windows_memory_counters()
+        return counters.WorkingSetSize if counters else None
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _windows_memory_counters():
+    """通过 GetProcessMemoryInfo 读取当前进程的内存计数"""
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+        _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD),
+                    ('PeakWorkingSetSize', ctypes.c_size_t), ('WorkingSetSize', ctypes.c_size_t),
+                    ('QuotaPeakPagedPoolUsage', ctypes.c_size_t), ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                    ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t), ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                    ('PagefileUsage', ctypes.c_size_t), ('PeakPagefileUsage', ctypes.c_size_t)]
+
+    counters = PROCESS_MEMORY_COUNTERS()
+    counters.cb = ctypes.sizeof(counters)
+    process = ctypes.windll.kernel32.GetCurrentProcess()
+    if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+        return None
+    return counters
+
+
+def _format_bytes(size):
+    """将字节数格式化为易读的字符串"""
+    for unit in ('B', 'KB', 'MB', 'GB'):
+        if size < 1024 or unit == 'GB':
+            return f"{size:.0f} {unit}" if unit == 'B' else f"{size:.1f} {unit}"
+        size /= 1024
+
+
+# ===== 隔离的转换进程 =====
+class ConversionCancelled(Exception):
+    """转换被用户取消"""
+
+
+class ConversionTimeout(Exception):
+    """转换超过时间限制"""
+
+
+class ConversionProcessError(Exception):
+    """子进程中的转换失败，消息已是用户可读的文本"""
+
+
+def _kill_process_tree(pid):
+    """强制结束进程及其所有子进程（如 sheet 并行转换的进程池）"""
+    if sys.platform == 'win32':
+        subprocess.run(['taskkill', '/F', '/T', '/PID', str(pid)],
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+                       creationflags=getattr(subprocess, 'CREATE_NO_WINDOW', 0))
+    else:
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+# 子进程回传进度的最小间隔（秒），避免大量小消息占满管道
+PROGRESS_SEND_INTERVAL = 0.2
+
+
+# 转换进程处理这么多个任务后回收重建，释放转换库积累的内存碎片（0 表示不限）
+WORKER_MAX_JOBS = _env_int("MARKITDOWN_WORKER_MAX_JOBS", 100)
+# 转换进程的常驻内存超过此值（MB）时回收重建（0 表示不限）
+WORKER_MAX_RSS_MB = _env_int("MARKITDOWN_WORKER_MAX_RSS_MB", 1024)
+# 任务进行中检查子进程内存的间隔（秒）
+WORKER_MEMORY_CHECK_INTERVAL = 0.5
+# 子进程在任务中途因内存超限而自行退出时使用的退出码
+_WORKER_RECYCLE_EXIT_CODE = 75
+
+
+def _recycling_options():
+    """长时间运行的进程池按 WORKER_MAX_JOBS 回收工作进程的参数（需要 Python 3.11+）"""
+    if WORKER_MAX_JOBS > 0 and sys.version_info >= (3, 11):
+        return {'max_tasks_per_child': WORKER_MAX_JOBS}
+    return {}
+
+
+class _MemoryGuard:
+    """转换子进程中的内存监视线程：启用期间常驻内存超过上限时立即结束进程"""
+
+    def __init__(self, max_rss, interval=WORKER_MEMORY_CHECK_INTERVAL):
+        self.max_rss = max_rss
+        self.interval = interval
+        self._armed = threading.Event()
+        threading.Thread(target=self._run, name='memory-guard', daemon=True).start()
+
+    def arm(self):
+        self._armed.set()
+
+    def disarm(self):
+        self._armed.clear()
+
+    def _run(self):
+        while True:
+            self._armed.wait()
+            rss = _current_rss_bytes()
+            if rss is not None and rss > self.max_rss and self._armed.is_set():
+                os._exit(_WORKER_RECYCLE_EXIT_CODE)
+            time.sleep(self.interval)
+
+
+def _conversion_process_main(conn, max_rss=None):
+    """转换子进程主循环：接收请求、转换并回传结果
+
+    转换过程中会插入 ('progress', 进度字典, []) 消息；每个请求结束前先发送
+    ('stats', {'pid', 'rss', 'jobs'}, [])，最后以 'done' 或 'error' 结束。
+    max_rss 为常驻内存上限（字节），已处理过任务的进程在转换中途超过上限时以
+    _WORKER_RECYCLE_EXIT_CODE 退出，由父进程换新进程重试。
+    """
+    if sys.platform != 'win32':
+        # 独立进程组，终止时可连同孙进程一起结束
+        os.setpgrp()
+    md = LazyMarkItDown()
+    memory_guard = _MemoryGuard(max_rss) if max_rss else None
+    jobs = 0
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        action, kwargs = request
+        tracer = Tracer()
+        last_sent = 0.0
+
+        def report(unit, done, total, **details):
+            nonlocal last_sent
+            now = time.monotonic()
+            if now - last_sent < PROGRESS_SEND_INTERVAL and done != total:
+                return
+            last_sent = now
+            conn.send(('progress', dict(unit=unit, done=done, total=total, **details), []))
+
+        status, payload = 'done', None
+        try:
+            if action == 'warm':
+                md.warm_up()
+            else:
+                # 新进程不设限：单个任务本身需要的内存在重试时仍会超限，不应被反复打断
+                if memory_guard is not None and jobs:
+                    memory_guard.arm()
+                try:
+                    if action == 'convert_to_file':
+                        payload = convert_source_to_file(md, tracer=tracer, progress=report, **kwargs)
+                    elif action == 'convert_to_chunks':
+                        payload = convert_source_to_chunks(md, tracer=tracer, progress=report, **kwargs)
+                    else:
+                        payload = convert_source(md, tracer=tracer, progress=report, **kwargs)
+                finally:
+                    if memory_guard is not None:
+                        memory_guard.disarm()
+                    jobs += 1
+        except Exception as e:
+            status, payload = 'error', _conversion_error_message(e)
+        conn.send(('stats', {'pid': os.getpid(), 'rss': _current_rss_bytes(), 'jobs': jobs}, []))
+        conn.send((status, payload, tracer.spans))
+
+
+class _WorkerRecycled(Exception):
+    """子进程在任务中途因内存超限退出"""
+
+
+class ConversionProcess:
+    """在独立子进程中执行转换，卡住或取消时可直接终止并重建
+
+    子进程常驻并保持转换器已加载，同一时刻只处理一个请求。处理满 max_jobs 个任务
+    或常驻内存超过 max_rss 字节后，子进程在后台回收重建；任务进行中超过内存上限时
+    子进程立即退出，该任务在新进程中透明地重试一次。
+    """
+
+    def __init__(self, max_jobs=WORKER_MAX_JOBS, max_rss=WORKER_MAX_RSS_MB * 1024 * 1024):
+        self._context = multiprocessing.get_context('spawn')
+        self._lock = threading.Lock()
+        self._process = None
+        self._conn = None
+        self.max_jobs = max_jobs
+        self.max_rss = max_rss
+        self.rss = None  # 子进程最近一次汇报的常驻内存
+        self.jobs = 0  # 当前子进程已处理的任务数
+        self.recycled = 0
+        self.retried = 0
+        atexit.register(self.shutdown)
+
+    def _ensure_started(self):
+        if self._process is not None and self._process.is_alive():
+            return
+        self._close()
+        parent_conn, child_conn = self._context.Pipe()
+        self._process = self._context.Process(
+            target=_conversion_process_main, args=(child_conn, self.max_rss or None),
+            name='markitdown-conversion')
+        self._process.start()
+        child_conn.close()
+        self._conn = parent_conn
+
+    def warm_up(self):
+        """启动子进程并等待转换器加载完成"""
+        self.run(('warm', {}))
+
+    def convert(self, timeout=None, cancel_event=None, tracer=None, progress=None, **kwargs):
+        """在子进程中执行 convert_source，返回 Markdown 文本
+
+        子进程记录的各阶段耗时会合并到 tracer 中；
+        progress(unit, done, total, **details) 在收到子进程的进度时调用。
+        """
+        return self.run(('convert', kwargs), timeout, cancel_event, tracer, progress)
+
+    def convert_to_file(self, timeout=None, cancel_event=None, tracer=None, progress=None, **kwargs):
+        """在子进程中执行 convert_source_to_file，结果不经过管道，只返回预览和文件大小"""
+        return self.run(('convert_to_file', kwargs), timeout, cancel_event, tracer, progress)
+
+    def convert_to_chunks(self, timeout=None, cancel_event=None, tracer=None, progress=None, **kwargs):
+        """在子进程中执行 convert_source_to_chunks，只返回预览、大小和块数"""
+        return self.run(('convert_to_chunks', kwargs), timeout, cancel_event, tracer, progress)
+
+    def run(self, request, timeout=None, cancel_event=None, tracer=None, progress=None):
+        with self._lock:
+            deadline = time.monotonic() + timeout if timeout else None
+            try:
+                try:
+                    return self._run_once(request, timeout, deadline, cancel_event, tracer, progress)
+                except _WorkerRecycled:
+                    # 子进程因内存超限在任务中途退出，在新进程中重试
+                    self.recycled += 1
+                    self.retried += 1
+                    return self._run_once(request, timeout, deadline, cancel_event, tracer, progress)
+            finally:
+                if self._should_recycle():
+                    self._recycle()
+
+    def _run_once(self, request, timeout, deadline, cancel_event, tracer, progress):
+        if cancel_event is not None and cancel_event.is_set():
+            raise ConversionCancelled("转换已取消")
+        self._ensure_started()
+        self._conn.send(request)
+        while True:
+            if cancel_event is not None and cancel_event.is_set():
+                self._kill()
+                raise ConversionCancelled("转换已取消")
+            if deadline is not None and time.monotonic() > deadline:
+                self._kill()
+                raise ConversionTimeout(f"转换超时（超过 {timeout} 秒），已终止转换进程")
+            if self._conn.poll(0.1):
+                try:
+                    status, payload, spans = self._conn.recv()
+                except (EOFError, OSError):
+                    self._process_exited()
+                if status == 'progress':
+                    if progress:
+                        progress(**payload)
+                    continue
+                if status == 'stats':
+                    self.rss = payload['rss']
+                    self.jobs = payload['jobs']
+                    continue
+                if tracer is not None:
+                    tracer.extend(spans)
+                if status == 'error':
+                    raise ConversionProcessError(payload)
+                return payload
+            if not self._process.is_alive():
+                self._process_exited()
+
+    def _process_exited(self):
+        """子进程在任务中途退出：内存超限时交给 run 重试，否则报告错误"""
+        pid = self._process.pid
+        self._process.join(1)
+        exitcode = self._process.exitcode
+        # 子进程自行退出时可能留下孙进程（如 sheet 并行转换的进程池）
+        _kill_process_tree(pid)
+        self._kill()
+        if exitcode == _WORKER_RECYCLE_EXIT_CODE:
+            raise _WorkerRecycled()
+        raise ConversionProcessError("转换进程意外退出")
+
+    def _should_recycle(self):
+        if self._process is None or self.jobs == 0:
+            return False
+        return ((self.max_jobs > 0 and self.jobs >= self.max_jobs)
+                or (self.max_rss > 0 and self.rss is not None and self.rss > self.max_rss))
+
+    def _recycle(self):
+        """结束当前子进程，并在后台启动和预热新进程，不耽误本次结果返回"""
+        self._stop()
+        self.recycled += 1
+        threading.Thread(target=self._warm_up_quietly, name='conversion-recycle', daemon=True).start()
+
+    def _warm_up_quietly(self):
+        try:
+            self.warm_up()
+        except Exception:
+            pass  # 预热失败时由下一个请求重新启动进程并报告错误
+
+    def _kill(self):
+        if self._process is not None and self._process.is_alive():
+            _kill_process_tree(self._process.pid)
+            self._process.kill()
+            self._process.join(5)
+        self._close()
+
+    def _close(self):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = None
+        self._process = None
+        self.rss = None
+        self.jobs = 0
+
+    def is_running(self):
+        """子进程是否存活"""
+        process = self._process
+        return process is not None and process.is_alive()
+
+    def stats(self):
+        """子进程的 pid、最近汇报的常驻内存、已处理任务数以及回收和重试次数"""
+        process = self._process
+        return {
+            'pid': process.pid if process is not None and process.is_alive() else None,
+            'rss': self.rss,
+            'jobs': self.jobs,
+            'max_jobs': self.max_jobs,
+            'max_rss': self.max_rss,
+            'recycled': self.recycled,
+            'retried': self.retried,
+        }
+
+    def shutdown(self):
+        """通知子进程退出，未及时退出则强制终止"""
+        self._stop()
+
+    def _stop(self):
+        process = self._process
+        if process is None:
+            return
+        if process.is_alive():
+            try:
+                self._conn.send(None)
+            except (OSError, ValueError):
+                pass
+            process.join(2)
+        if process.is_alive():
+            _kill_process_tree(process.pid)
+            process.kill()
+            process.join(5)
+        self._close()
+
+
+class ConversionPool:
+    """由多个常驻转换进程组成的池，每个请求分配一个空闲进程
+
+    接口与 ConversionProcess 相同，另外提供排队和运行中的任务数以及每个进程的内存。
+    max_jobs 和 max_rss 是每个进程的回收条件，参见 ConversionProcess。
+    """
+
+    def __init__(self, size, max_jobs=WORKER_MAX_JOBS, max_rss=WORKER_MAX_RSS_MB * 1024 * 1024):
+        self.size = max(1, size)
+        self._processes = [ConversionProcess(max_jobs, max_rss) for _ in range(self.size)]
+        self._idle = queue.Queue()
+        for process in self._processes:
+            self._idle.put(process)
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.active = 0
+        self.completed = 0
+        self.failed = 0
+
+    def warm_up(self):
+        """并行启动并预热所有转换进程"""
+        threads = [threading.Thread(target=process.warm_up) for process in self._processes]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def convert(self, timeout=None, cancel_event=None, **kwargs):
+        return self._dispatch('convert', timeout=timeout, cancel_event=cancel_event, **kwargs)
+
+    def convert_to_file(self, timeout=None, cancel_event=None, **kwargs):
+        return self._dispatch('convert_to_file', timeout=timeout, cancel_event=cancel_event, **kwargs)
+
+    def convert_to_chunks(self, timeout=None, cancel_event=None, **kwargs):
+        return self._dispatch('convert_to_chunks', timeout=timeout, cancel_event=cancel_event, **kwargs)
+
+    def _dispatch(self, method, **kwargs):
+        cancel_event = kwargs.get('cancel_event')
+        with self._lock:
+            self.queued += 1
+        while True:
+            # 排队等待空闲进程时也响应取消
+            if cancel_event is not None and cancel_event.is_set():
+                with self._lock:
+                    self.queued -= 1
+                raise ConversionCancelled("转换已取消")
+            try:
+                process = self._idle.get(timeout=0.1)
+                break
+            except queue.Empty:
+                pass
+        with self._lock:
+            self.queued -= 1
+            self.active += 1
+        try:
+            result = getattr(process, method)(**kwargs)
+            with self._lock:
+                self.completed += 1
+            return result
+        except Exception:
+            with self._lock:
+                self.failed += 1
+            raise
+        finally:
+            with self._lock:
+                self.active -= 1
+            self._idle.put(process)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.size,
+                'ready': sum(process.is_running() for process in self._processes),
+                'queued': self.queued,
+                'active': self.active,
+                'completed': self.completed,
+                'failed': self.failed,
+                'recycled': sum(process.recycled for process in self._processes),
+                'worker_stats': [process.stats() for process in self._processes],
+            }
+
+    def shutdown(self):
+        for process in self._processes:
+            process.shutdown()
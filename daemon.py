@@ -0,0 +1,396 @@
+"""本地转换服务：常驻进程通过 HTTP 接收转换请求；图形界面通过 DaemonClient 使用它"""
+import sys
+import os
+from pathlib import Path
+import io
+import time
+import json
+import uuid
+import urllib.request
+import urllib.error
+from urllib.parse import urlparse, parse_qs
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+import shutil
+import threading
+import tempfile
+
+from converter import (EXCEL_SUPPORT, Tracer, _conversion_error_message, OUTPUT_PREVIEW_CHARS, _atomic_output,
+                       _PreviewWriter, _is_url, _get_url_fetcher, _normalize_pages, _xlsx_sheet_parts,
+                       LIMIT_KEYS, _LIMIT_LABELS, _normalize_limits, ConversionCancelled, ConversionTimeout,
+                       ConversionProcessError, WORKER_MAX_JOBS, WORKER_MAX_RSS_MB, ConversionPool)
+
+
+# ===== 本地转换服务 =====
+DAEMON_DEFAULT_URL = "http://127.0.0.1:8765"
+
+
+class DaemonUnavailable(Exception):
+    """无法连接本地转换服务"""
+
+
+def _parse_timeout(value):
+    """请求中的超时秒数，未指定时返回 None"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = float(value)
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or not value > 0:
+        raise ValueError(f"timeout 必须是正数: {value!r}")
+    return value
+
+
+def _parse_job(value):
+    """请求中由客户端生成的任务 id（用于 POST /cancel），未指定时返回 None"""
+    if value is None:
+        return None
+    if not isinstance(value, str) or not value:
+        raise ValueError(f"job 必须是非空字符串: {value!r}")
+    return value
+
+
+def _parse_convert_request(request):
+    """检查 POST /convert 的 JSON 请求体，返回 (path, sheets, timeout, limits, pages, job)
+
+    limits 和 pages 已规范化；请求无效时抛出 ValueError。
+    """
+    if not isinstance(request, dict):
+        raise ValueError("请求体必须是 JSON 对象")
+    source = request.get("path")
+    if not source:
+        raise ValueError("缺少 path")
+    if not isinstance(source, str):
+        raise ValueError("path 必须是字符串")
+    sheets = request.get("sheets")
+    if sheets is not None and (not isinstance(sheets, list) or not all(isinstance(name, str) for name in sheets)):
+        raise ValueError("sheets 必须是 sheet 名称的列表")
+    pages = request.get("pages")
+    if pages is not None and not isinstance(pages, (str, int)):
+        raise ValueError("pages 必须是页码范围文本，如 '1-20,35'")
+    return (source, sheets or None, _parse_timeout(request.get("timeout")),
+            _normalize_limits(request.get("limits")), _normalize_pages(pages), _parse_job(request.get("job")))
+
+
+def _parse_upload_query(query):
+    """检查上传文件时的查询参数，返回 (filename, sheets, timeout, limits, pages, job)，无效时抛出 ValueError"""
+    filename = query.get("filename", ["upload"])[0]
+    sheets = [name for name in query["sheets"][0].split(",") if name] if "sheets" in query else None
+    limits = {key: query[key][0] for key in LIMIT_KEYS if key in query}
+    for key in ('max_rows', 'max_columns', 'tail_rows'):
+        if key in limits:
+            try:
+                limits[key] = int(limits[key])
+            except ValueError:
+                raise ValueError(f"{_LIMIT_LABELS[key]}必须是正整数: {limits[key]!r}")
+    return (filename, sheets or None, _parse_timeout(query["timeout"][0] if "timeout" in query else None),
+            _normalize_limits(limits), _normalize_pages(query["pages"][0] if "pages" in query else None),
+            _parse_job(query["job"][0] if "job" in query else None))
+
+
+def _download_to_temp(url, suffix):
+    """经 UrlFetcher 下载 url 并复制到带 suffix 扩展名的临时文件，返回其路径"""
+    fetched = _get_url_fetcher().fetch(url)
+    fd, temp_path = tempfile.mkstemp(suffix=suffix, prefix="markitdown_download_")
+    try:
+        with os.fdopen(fd, 'wb') as f, open(fetched['body_path'], 'rb') as src:
+            shutil.copyfileobj(src, f)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+class _JobRegistry:
+    """正在进行的转换任务 id 及其取消事件，POST /cancel 通过它终止转换"""
+
+    def __init__(self):
+        self._events = {}
+        self._lock = threading.Lock()
+
+    def register(self, job):
+        """登记任务并返回其取消事件；job 为 None 时只返回一个不会被设置的事件"""
+        event = threading.Event()
+        if job is not None:
+            with self._lock:
+                if job in self._events:
+                    raise ValueError(f"任务 id 重复: {job}")
+                self._events[job] = event
+        return event
+
+    def unregister(self, job, event):
+        """任务结束后移除登记，event 为 register 返回的事件"""
+        with self._lock:
+            if self._events.get(job) is event:
+                del self._events[job]
+
+    def cancel(self, job):
+        """设置任务的取消事件，任务不存在（未登记或已结束）时返回 False"""
+        with self._lock:
+            event = self._events.get(job)
+        if event is None:
+            return False
+        event.set()
+        return True
+
+
+class _ConversionRequestHandler(BaseHTTPRequestHandler):
+    """转换服务的 HTTP 接口
+
+    GET  /health   服务状态，包括每个转换进程的内存、已处理任务数和回收次数
+    GET  /queue    排队、运行中和已完成的任务数
+    POST /convert  JSON {"path": 文件路径或URL, "sheets": [...], "timeout": 秒, "limits": {...},
+                   "pages": PDF 页码范围, "job": 任务 id}，或直接上传文件内容（查询参数 filename、
+                   sheets、timeout、pages、job，以及 max_rows、max_columns、cell_range、tail_rows），
+                   返回 Markdown。参数类型或取值无效时返回 400；远程 .xlsx 先下载到本地再列出 sheet；
+                   转换被取消时返回 409
+    POST /cancel   JSON {"job": 任务 id}，终止该任务的转换进程；任务不存在或已结束时返回 404
+    """
+
+    server_version = "MarkItDownConverter"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == "/health":
+            self._send_json(200, dict(self.server.pool.stats(), status="ok"))
+        elif path == "/queue":
+            stats = self.server.pool.stats()
+            self._send_json(200, {key: stats[key] for key in ('queued', 'active', 'completed', 'failed', 'workers')})
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def do_POST(self):
+        url = urlparse(self.path)
+        if url.path not in ("/convert", "/cancel"):
+            self._send_json(404, {"error": "not found"})
+            return
+        length = self.headers.get("Content-Length")
+        if length is None:
+            self._send_json(411, {"error": "需要 Content-Length"})
+            return
+        try:
+            length = int(length)
+        except ValueError:
+            length = -1
+        if length < 0:
+            self._send_json(400, {"error": "无效的 Content-Length"})
+            return
+        if url.path == "/cancel":
+            self._cancel(length)
+            return
+
+        temp_path = None
+        cancel_event = None
+        try:
+            content_type = self.headers.get("Content-Type", "").split(";")[0].strip()
+            if content_type == "application/json":
+                request = json.loads(self.rfile.read(length) or b"{}")
+                source, sheets, timeout, limits, pages, job = _parse_convert_request(request)
+                cancel_event = self.server.jobs.register(job)
+                if _is_url(source):
+                    # 工作簿要先在本地列出 sheet，先下载到临时文件
+                    suffix = Path(urlparse(source).path).suffix.lower()
+                    if EXCEL_SUPPORT and suffix == '.xlsx':
+                        source = temp_path = _download_to_temp(source, suffix)
+                elif not os.path.exists(source):
+                    self._send_json(404, {"error": f"找不到文件: {source}"})
+                    return
+            else:
+                # 上传的文件内容，按原文件名的扩展名保存到临时文件
+                filename, sheets, timeout, limits, pages, job = _parse_upload_query(parse_qs(url.query))
+                cancel_event = self.server.jobs.register(job)
+                fd, temp_path = tempfile.mkstemp(suffix=Path(filename).suffix, prefix="markitdown_upload_")
+                with os.fdopen(fd, 'wb') as f:
+                    remaining = length
+                    while remaining > 0:
+                        chunk = self.rfile.read(min(remaining, 1024 * 1024))
+                        if not chunk:
+                            break
+                        f.write(chunk)
+                        remaining -= len(chunk)
+                source = temp_path
+
+            excel_file = None
+            if EXCEL_SUPPORT and Path(source).suffix.lower() == '.xlsx':
+                excel_file = source
+                sheets = sheets or list(_xlsx_sheet_parts(source))
+
+            start = time.perf_counter()
+            markdown_content = self.server.pool.convert(
+                timeout=timeout, cancel_event=cancel_event, source=source, excel_file=excel_file,
+                selected_sheets=sheets, limits=limits, pages=pages)
+            body = markdown_content.encode('utf-8')
+            self.send_response(200)
+            self.send_header("Content-Type", "text/markdown; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.send_header("X-Conversion-Seconds", f"{time.perf_counter() - start:.3f}")
+            self.end_headers()
+            self.wfile.write(body)
+        except ConversionCancelled as e:
+            self._send_json(409, {"error": str(e)})
+        except ConversionTimeout as e:
+            self._send_json(504, {"error": str(e)})
+        except ConversionProcessError as e:
+            self._send_json(422, {"error": str(e)})
+        except (ValueError, KeyError) as e:
+            self._send_json(400, {"error": f"无效的请求: {e}"})
+        except Exception as e:
+            self._send_json(500, {"error": _conversion_error_message(e)})
+        finally:
+            if cancel_event is not None:
+                self.server.jobs.unregister(job, cancel_event)
+            if temp_path:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+    def _cancel(self, length):
+        try:
+            request = json.loads(self.rfile.read(length) or b"{}")
+            job = _parse_job(request.get("job")) if isinstance(request, dict) else None
+        except ValueError as e:
+            self._send_json(400, {"error": f"无效的请求: {e}"})
+            return
+        if job is None:
+            self._send_json(400, {"error": "无效的请求: 缺少 job"})
+        elif self.server.jobs.cancel(job):
+            self._send_json(200, {"job": job, "status": "cancelled"})
+        else:
+            self._send_json(404, {"error": f"没有正在进行的任务: {job}"})
+
+
+def serve(host="127.0.0.1", port=8765, workers=None, verbose=False, max_jobs=WORKER_MAX_JOBS,
+          max_rss_mb=WORKER_MAX_RSS_MB):
+    """启动本地转换服务，阻塞直到被中断
+
+    每个转换进程处理 max_jobs 个任务或常驻内存超过 max_rss_mb MB 后回收重建（0 表示不限）。
+    """
+    pool = ConversionPool(workers or os.cpu_count() or 1, max_jobs, max_rss_mb * 1024 * 1024)
+    server = ThreadingHTTPServer((host, port), _ConversionRequestHandler)
+    server.daemon_threads = True
+    server.pool = pool
+    server.jobs = _JobRegistry()
+    server.verbose = verbose
+    print(f"正在预热 {pool.size} 个转换进程...", file=sys.stderr)
+    pool.warm_up()
+    print(f"转换服务已启动: http://{host}:{server.server_port}", file=sys.stderr)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        pool.shutdown()
+
+
+class DaemonClient:
+    """通过本地转换服务执行转换，接口与 ConversionProcess 相同"""
+
+    def __init__(self, base_url=DAEMON_DEFAULT_URL):
+        self.base_url = base_url.rstrip("/")
+
+    def is_available(self, timeout=0.5):
+        """服务是否在运行"""
+        try:
+            with urllib.request.urlopen(f"{self.base_url}/health", timeout=timeout) as response:
+                return json.load(response).get("status") == "ok"
+        except (OSError, ValueError):
+            return False
+
+    def convert(self, timeout=None, cancel_event=None, source=None, excel_file=None,
+                selected_sheets=None, tracer=None, progress=None, limits=None, pages=None):
+        # 转换服务只返回最终结果，不提供进度
+        with (tracer or Tracer()).span('daemon.request', url=self.base_url):
+            return self._convert(timeout, cancel_event, source, excel_file, selected_sheets, limits, pages)
+
+    def convert_to_file(self, timeout=None, cancel_event=None, source=None, excel_file=None,
+                        selected_sheets=None, tracer=None, progress=None, limits=None, output_path=None,
+                        pages=None):
+        """将服务返回的结果边接收边写入 output_path，返回值同 convert_source_to_file"""
+        with (tracer or Tracer()).span('daemon.request', url=self.base_url):
+            return self._convert(timeout, cancel_event, source, excel_file, selected_sheets, limits, pages,
+                                 output_path)
+
+    def _convert(self, timeout, cancel_event, source, excel_file, selected_sheets, limits, pages,
+                 output_path=None):
+        job = uuid.uuid4().hex
+        payload = {"path": os.path.abspath(source) if os.path.exists(source) else source,
+                   "sheets": selected_sheets if excel_file == source else None,
+                   "timeout": timeout,
+                   "limits": limits,
+                   "pages": pages,
+                   "job": job}
+        request = urllib.request.Request(
+            f"{self.base_url}/convert", data=json.dumps(payload).encode('utf-8'),
+            headers={"Content-Type": "application/json"})
+
+        # 在辅助线程中等待服务响应，以便随时响应取消
+        outcome = {}
+
+        def send():
+            try:
+                with urllib.request.urlopen(request) as response:
+                    if output_path is None:
+                        outcome['result'] = response.read().decode('utf-8')
+                        return
+                    with _atomic_output(output_path) as f:
+                        writer = _PreviewWriter(f, OUTPUT_PREVIEW_CHARS)
+                        text = io.TextIOWrapper(response, encoding='utf-8')
+                        while True:
+                            if cancel_event is not None and cancel_event.is_set():
+                                raise ConversionCancelled("转换已取消")
+                            chunk = text.read(1024 * 1024)
+                            if not chunk:
+                                break
+                            writer.write(chunk)
+                    outcome['result'] = {'output_path': output_path, 'preview': writer.preview(),
+                                         'size': os.path.getsize(output_path)}
+            except ConversionCancelled as e:
+                outcome['error'] = e
+            except urllib.error.HTTPError as e:
+                try:
+                    message = json.loads(e.read()).get("error", str(e))
+                except ValueError:
+                    message = str(e)
+                if e.code == 409:
+                    outcome['error'] = ConversionCancelled(message)
+                elif e.code == 504:
+                    outcome['error'] = ConversionTimeout(message)
+                else:
+                    outcome['error'] = ConversionProcessError(message)
+            except OSError as e:
+                outcome['error'] = DaemonUnavailable(f"无法连接转换服务: {e}")
+
+        thread = threading.Thread(target=send, daemon=True)
+        thread.start()
+        while thread.is_alive():
+            if cancel_event is not None and cancel_event.is_set():
+                # 通知服务终止转换进程，不必等到超时
+                self._cancel(job)
+                raise ConversionCancelled("转换已取消")
+            thread.join(0.1)
+        if 'error' in outcome:
+            raise outcome['error']
+        return outcome['result']
+
+    def _cancel(self, job, timeout=2):
+        """请求服务取消任务，任务已结束或服务无响应时忽略"""
+        request = urllib.request.Request(
+            f"{self.base_url}/cancel", data=json.dumps({"job": job}).encode('utf-8'),
+            headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=timeout):
+                pass
+        except OSError:
+            pass
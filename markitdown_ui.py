@@ -1,139 +1,391 @@
 import sys
+import os
 from pathlib import Path
-import warnings
 import re
+import time
+import shutil
+import zipfile
+import threading
+import xml.etree.ElementTree as ET
+import multiprocessing
+
+from cli import CLI_COMMANDS, run_cli
+
+if __name__ == "__main__":
+    # 打包后的 exe 中启动进程池需要此调用；子命令在导入 PySide6 之前分派，无图形环境中也能运行
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        sys.exit(run_cli(sys.argv[1:]))
+
 from PySide6.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout,
                               QHBoxLayout, QLabel, QLineEdit, QPushButton,
                               QTextEdit, QFileDialog, QMessageBox, QProgressBar,
-                              QListWidget, QListWidgetItem, QFrame,
-                              QAbstractItemView)
-from PySide6.QtCore import QThread, Signal, Qt
-from PySide6.QtGui import QFont, QDragEnterEvent, QDropEvent
-
-try:
-    import openpyxl
-    EXCEL_SUPPORT = True
-except ImportError:
-    EXCEL_SUPPORT = False
-
-# 忽略各种警告
-warnings.filterwarnings("ignore", message="Couldn't find ffmpeg or avconv")
-warnings.filterwarnings("ignore", message="Unsupported Windows version")
-warnings.filterwarnings("ignore", category=UserWarning, module="onnxruntime")
-
-try:
-    from markitdown import MarkItDown, UnsupportedFormatException, MissingDependencyException
-except ImportError as e:
-    print("Error: Cannot import markitdown library")
-    print("Please run: pip install markitdown[all]")
-    print(f"Details: {e}")
-    sys.exit(1)
+                              QListWidget, QListWidgetItem,
+                              QAbstractItemView, QSpinBox, QDialog,
+                              QFormLayout, QDialogButtonBox, QCheckBox)
+from PySide6.QtCore import QThread, Signal, Qt, QTimer
+from PySide6.QtGui import QFont, QDragEnterEvent, QDropEvent, QTextCursor
+
+from converter import (EXCEL_SUPPORT, Tracer, _write_trace_log, _conversion_error_message, _source_size,
+                       _remove_partial, _atomic_output, _read_preview, _chunk_output_path,
+                       _remove_chunk_output, _is_pdf_path, _normalize_pages, _pdf_page_count,
+                       _xlsx_sheet_info, _normalize_limits, _run_batch, _dedupe_summary, _plan_batch_jobs,
+                       _collect_batch_files, FolderWatcher, ConversionCache, _format_bytes,
+                       ConversionCancelled, ConversionTimeout, ConversionProcessError, ConversionProcess)
+from daemon import DAEMON_DEFAULT_URL, DaemonUnavailable, DaemonClient
+
+
+# 缓存统计与设置对话框
+class CacheDialog(QDialog):
+    def __init__(self, cache, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self.setWindowTitle("转换缓存")
+        self.setMinimumWidth(360)
+
+        layout = QVBoxLayout(self)
+        form = QFormLayout()
+        self.hits_label = QLabel()
+        self.misses_label = QLabel()
+        self.saved_label = QLabel()
+        self.usage_label = QLabel()
+        form.addRow("命中次数:", self.hits_label)
+        form.addRow("未命中次数:", self.misses_label)
+        form.addRow("节省转换量:", self.saved_label)
+        form.addRow("已用空间:", self.usage_label)
+
+        self.max_size_spin = QSpinBox()
+        self.max_size_spin.setRange(16, 1024 * 1024)
+        self.max_size_spin.setSuffix(" MB")
+        self.max_size_spin.setValue(max(16, cache.max_bytes // (1024 * 1024)))
+        form.addRow("大小上限:", self.max_size_spin)
+        layout.addLayout(form)
+
+        buttons = QDialogButtonBox(QDialogButtonBox.Close)
+        clear_btn = buttons.addButton("清空缓存", QDialogButtonBox.ResetRole)
+        clear_btn.setObjectName("dangerButton")
+        clear_btn.clicked.connect(self._clear)
+        buttons.rejected.connect(self.reject)
+        layout.addWidget(buttons)
+
+        self._refresh()
+
+    def _refresh(self):
+        stats = self.cache.stats()
+        self.hits_label.setText(str(stats['hits']))
+        self.misses_label.setText(str(stats['misses']))
+        self.saved_label.setText(_format_bytes(stats['bytes_saved']))
+        self.usage_label.setText(
+            f"{_format_bytes(stats['total_bytes'])} / {_format_bytes(stats['max_bytes'])}"
+            f"（{stats['entries']} 条）")
+
+    def _clear(self):
+        self.cache.clear()
+        self._refresh()
+
+    def done(self, result):
+        # 关闭时应用新的大小上限
+        max_bytes = self.max_size_spin.value() * 1024 * 1024
+        if max_bytes != self.cache.max_bytes:
+            self.cache.set_max_bytes(max_bytes)
+        super().done(result)
+
+
+# 转换引擎预热线程
+class WarmUpWorker(QThread):
+    ready = Signal()
+    failed = Signal(str)
+
+    daemon_found = Signal(str)  # daemon url
+
+    def __init__(self, conversion_process, daemon_client=None):
+        super().__init__()
+        self.conversion_process = conversion_process
+        self.daemon_client = daemon_client
+
+    def run(self):
+        try:
+            # 本地转换服务已在运行时直接使用，不再启动自己的转换进程
+            if self.daemon_client and self.daemon_client.is_available():
+                self.daemon_found.emit(self.daemon_client.base_url)
+                return
+            self.conversion_process.warm_up()
+            self.ready.emit()
+        except ConversionCancelled:
+            pass
+        except Exception as e:
+            self.failed.emit(str(e))
+
+
+# 读取 Excel sheet 列表的后台线程
+class SheetDiscoveryWorker(QThread):
+    found = Signal(str, list)  # filename, [{'name', 'rows', 'columns', 'size'}]
+    failed = Signal(str, str)  # filename, error message
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+
+    def run(self):
+        try:
+            try:
+                sheets = _xlsx_sheet_info(self.filename)
+            except (zipfile.BadZipFile, KeyError, ET.ParseError):
+                # 不是标准的 xlsx 包，交给 openpyxl 读取
+                import openpyxl
+                workbook = openpyxl.load_workbook(self.filename, read_only=True)
+                sheets = [{'name': name, 'rows': None, 'columns': None, 'size': None}
+                          for name in workbook.sheetnames]
+                workbook.close()
+            self.found.emit(self.filename, sheets)
+        except Exception as e:
+            self.failed.emit(self.filename, str(e))
+
+
+class PdfInfoWorker(QThread):
+    found = Signal(str, int)  # filename, 页数
+    failed = Signal(str, str)  # filename, error message
+
+    def __init__(self, filename):
+        super().__init__()
+        self.filename = filename
+
+    def run(self):
+        try:
+            self.found.emit(self.filename, _pdf_page_count(self.filename))
+        except Exception as e:
+            self.failed.emit(self.filename, str(e))
+
 
 # 转换工作线程
 class ConversionWorker(QThread):
+    # 指定 output_path 时结果直接写入该文件，markdown_content 只是开头的预览；
+    # 同时指定 chunk_format 时分块写出，实际位置见 output_path（完成后更新）
     finished = Signal(str, str)  # markdown_content, source
     error = Signal(str)
+    cancelled = Signal()
+    progress = Signal(dict)  # unit, done, total 及其他详情，参见 convert_source
     
-    def __init__(self, md_instance, source, excel_file=None, selected_sheets=None):
+    def __init__(self, conversion_process, source, excel_file=None, selected_sheets=None,
+                 cache=None, timeout=None, fallback=None, limits=None, output_path=None, pages=None,
+                 chunk_format=None):
         super().__init__()
-        self.md = md_instance
+        self.limits = _normalize_limits(limits)
+        self.pages = _normalize_pages(pages)
+        self.output_path = output_path
+        self.output_size = None
+        self.chunk_format = chunk_format if output_path else None
+        self.output_chunks = None
+        self.conversion_process = conversion_process
+        self.fallback = fallback
+        self.fell_back = False
         self.source = source
         self.excel_file = excel_file
         self.selected_sheets = selected_sheets
+        self.cache = cache
+        self.timeout = timeout
+        self.from_cache = False
+        self.tracer = Tracer()
+        self._cancel_event = threading.Event()
+
+    def cancel(self):
+        """取消转换：子进程会被立即终止"""
+        self._cancel_event.set()
     
     def run(self):
         try:
-            # 检查是否为 Excel 文件且需要特殊处理
-            if (self.excel_file and 
-                self.excel_file == self.source and 
-                EXCEL_SUPPORT and 
-                self.selected_sheets):
-                
-                # 使用自定义的 Excel 转换
-                markdown_content = self._convert_excel_sheets(self.source, self.selected_sheets)
-                self.finished.emit(markdown_content, self.source)
+            # 本地文件先查缓存，命中时不经过 MarkItDown
+            cache_key = None
+            # 分块输出不经过缓存
+            if self.cache and not self.chunk_format and os.path.isfile(self.source):
+                sheets = self.selected_sheets if self.excel_file == self.source else None
+                params = dict(sheets=sheets)
+                if sheets and self.limits:
+                    params['limits'] = self.limits
+                if self.pages:
+                    params['pages'] = self.pages
+                with self.tracer.span('cache.lookup', file_size=_source_size(self.source)) as attributes:
+                    cache_key = self.cache.make_key(self.source, **params)
+                    if self.output_path:
+                        cached_path = self.cache.get_path(cache_key)
+                        markdown_content = self._copy_cached(cached_path) if cached_path else None
+                    else:
+                        markdown_content = self.cache.get(cache_key)
+                    attributes['hit'] = markdown_content is not None
+                if markdown_content is not None:
+                    self.from_cache = True
+                    self.finished.emit(markdown_content, self.source)
+                    return
+
+            request = dict(timeout=self.timeout, cancel_event=self._cancel_event, source=self.source,
+                           excel_file=self.excel_file, selected_sheets=self.selected_sheets,
+                           tracer=self.tracer, progress=self._report_progress, limits=self.limits)
+            if self.pages:
+                request['pages'] = self.pages
+            method = 'convert'
+            if self.output_path:
+                method = 'convert_to_file'
+                request['output_path'] = self.output_path
+                if self.chunk_format:
+                    method = 'convert_to_chunks'
+                    request['chunk_format'] = self.chunk_format
+            with self.tracer.span('convert', source=self.source, file_size=_source_size(self.source)):
+                try:
+                    result = getattr(self.conversion_process, method)(**request)
+                except DaemonUnavailable:
+                    # 转换服务已停止，改用本地转换进程
+                    if self.fallback is None:
+                        raise
+                    self.fell_back = True
+                    result = getattr(self.fallback, method)(**request)
+            if self.output_path:
+                markdown_content = result['preview']
+                self.output_size = result['size']
+                self.output_chunks = result.get('chunks')
+                self.output_path = result['output_path']
+                if cache_key:
+                    with self.tracer.span('cache.store', size=self.output_size):
+                        self.cache.put_file(cache_key, self.output_path)
             else:
-                # 使用 MarkItDown 的默认转换
-                result = self.md.convert(self.source)
-                self.finished.emit(result.markdown, self.source)
-                
-        except UnsupportedFormatException:
-            self.error.emit("不支持的文件格式")
-        except MissingDependencyException as e:
-            self.error.emit(f"缺少依赖: {e}")
+                markdown_content = result
+                if cache_key:
+                    with self.tracer.span('cache.store', chars=len(markdown_content)):
+                        self.cache.put(cache_key, markdown_content)
+            self.finished.emit(markdown_content, self.source)
+        except ConversionCancelled:
+            self._discard_partial_output()
+            self.cancelled.emit()
+        except (ConversionTimeout, ConversionProcessError, DaemonUnavailable) as e:
+            self._discard_partial_output()
+            self.error.emit(str(e))
         except Exception as e:
-            self.error.emit(f"转换失败: {str(e)}")
-    
-    def _convert_excel_sheets(self, filename, selected_sheets):
-        """转换选中的 Excel sheets"""
-        if not selected_sheets:
-            raise Exception("请至少选择一个 Sheet")
-        
-        results = []
-        for sheet_name in selected_sheets:
-            try:
-                workbook = openpyxl.load_workbook(filename, read_only=True)
-                worksheet = workbook[sheet_name]
-                
-                # 将 sheet 数据转换为 markdown 表格
-                markdown_content = self._worksheet_to_markdown(worksheet, sheet_name)
-                results.append(markdown_content)
-                
-                workbook.close()
-                
-            except Exception as e:
-                results.append(f"# {sheet_name}\n\n**错误**: 无法转换此 Sheet - {str(e)}\n\n")
-        
-        return "\n\n---\n\n".join(results)
-    
-    def _worksheet_to_markdown(self, worksheet, sheet_name):
-        """将 Excel worksheet 转换为 Markdown"""
-        markdown = f"# {sheet_name}\n\n"
-        
-        # 获取有数据的区域
-        if worksheet.max_row == 1 and worksheet.max_column == 1:
-            return markdown + "此 Sheet 为空\n"
-        
-        # 转换为表格
-        rows = []
-        for row in worksheet.iter_rows(values_only=True):
-            # 跳过完全空的行
-            if all(cell is None or str(cell).strip() == '' for cell in row):
-                continue
-            # 将 None 值转换为空字符串，其他值转换为字符串
-            row_data = [str(cell) if cell is not None else '' for cell in row]
-            rows.append(row_data)
-        
-        if not rows:
-            return markdown + "此 Sheet 为空\n"
-        
-        # 确定最大列数
-        max_cols = max(len(row) for row in rows) if rows else 0
-        
-        # 补齐所有行到相同列数
-        for row in rows:
-            while len(row) < max_cols:
-                row.append('')
-        
-        # 生成 Markdown 表格
-        if rows:
-            # 表头
-            header = "| " + " | ".join(rows[0]) + " |"
-            separator = "| " + " | ".join(['---'] * len(rows[0])) + " |"
-            markdown += header + "\n" + separator + "\n"
-            
-            # 数据行
-            for row in rows[1:]:
-                markdown += "| " + " | ".join(row) + " |\n"
-        
-        return markdown
+            self._discard_partial_output()
+            self.error.emit(_conversion_error_message(e))
+
+    def _copy_cached(self, cached_path):
+        """将缓存的结果复制到 output_path，返回预览"""
+        with _atomic_output(self.output_path) as f:
+            with open(cached_path, 'r', encoding='utf-8') as src:
+                shutil.copyfileobj(src, f)
+        self.output_size = os.path.getsize(self.output_path)
+        return _read_preview(self.output_path)
+
+    def _discard_partial_output(self):
+        # 子进程被终止时来不及清理自己的临时文件
+        if self.chunk_format:
+            _remove_chunk_output(_chunk_output_path(self.output_path, self.chunk_format), self.chunk_format)
+        elif self.output_path:
+            _remove_partial(self.output_path)
+
+    def _report_progress(self, unit, done, total, **details):
+        self.progress.emit(dict(unit=unit, done=done, total=total, **details))
+
+
+# 批量转换工作线程（调度进程池）
+class BatchWorker(QThread):
+    item_started = Signal(int)  # index
+    item_finished = Signal(int, bool, str, float)  # index, success, message, seconds
+    item_duplicate = Signal(int, int)  # index, 内容相同的文件的 index
+    all_done = Signal(int, int)  # succeeded, failed
+
+    def __init__(self, files, output_dir=None, max_workers=None):
+        super().__init__()
+        self.files = files
+        self.output_dir = output_dir
+        self.max_workers = max_workers or os.cpu_count() or 1
+        self.dedupe_stats = {}
+        self._stop_requested = False
+
+    def stop(self):
+        """请求停止：不再提交新任务，已在运行的任务完成后结束"""
+        self._stop_requested = True
+
+    def run(self):
+        jobs = _plan_batch_jobs(self.files, self.output_dir)
+        succeeded, failed = _run_batch(
+            jobs, self.max_workers,
+            on_started=self.item_started.emit,
+            on_finished=self.item_finished.emit,
+            should_stop=lambda: self._stop_requested,
+            on_duplicate=self.item_duplicate.emit,
+            stats=self.dedupe_stats)
+        self.all_done.emit(succeeded, failed)
+
+
+class WatchWorker(QThread):
+    event = Signal(dict)  # FolderWatcher 汇报的处理结果
+
+    def __init__(self, folder, output_dir=None, max_workers=None, limits=None):
+        super().__init__()
+        self.watcher = FolderWatcher(folder, output_dir, max_workers, limits=limits)
+        self._stop_requested = False
+
+    def stop(self):
+        """请求停止：不再提交新文件，正在转换的文件完成后结束"""
+        self._stop_requested = True
+
+    def run(self):
+        self.watcher.run(self.event.emit, should_stop=lambda: self._stop_requested)
+
+
+# 超过该字符数的结果按块加载，只在滚动到底部附近时追加下一块
+LARGE_RESULT_CHARS = 1_000_000
+RESULT_CHUNK_CHARS = 256 * 1024
 
 
 # 支持拖拽的文本编辑器
 class DragDropTextEdit(QTextEdit):
+    loaded_changed = Signal(int, int)  # loaded_chars, total_chars
+
     def __init__(self, parent=None):
         super().__init__(parent)
         self.setAcceptDrops(True)
+        self._full_text = ""
+        self._loaded_chars = 0
+        self.verticalScrollBar().valueChanged.connect(self._load_more_if_needed)
+
+    def set_result_text(self, text):
+        """显示转换结果；超大结果只加载第一块，其余随滚动加载"""
+        self._full_text = text
+        self._loaded_chars = 0
+        if len(text) <= LARGE_RESULT_CHARS:
+            self._loaded_chars = len(text)
+            self.setPlainText(text)
+        else:
+            self.setPlainText(self._next_chunk())
+            self.moveCursor(QTextCursor.Start)
+        self.loaded_changed.emit(self._loaded_chars, len(text))
+
+    def is_partial(self):
+        return self._loaded_chars < len(self._full_text)
+
+    def clear(self):
+        self._full_text = ""
+        self._loaded_chars = 0
+        super().clear()
+        self.loaded_changed.emit(0, 0)
+
+    def _next_chunk(self):
+        """取下一块文本，尽量在换行处截断以免拆开表格行"""
+        start = self._loaded_chars
+        end = min(start + RESULT_CHUNK_CHARS, len(self._full_text))
+        if end < len(self._full_text):
+            newline = self._full_text.rfind('\n', start, end)
+            if newline > start:
+                end = newline + 1
+        self._loaded_chars = end
+        return self._full_text[start:end]
+
+    def _load_more_if_needed(self, value):
+        if not self.is_partial():
+            return
+        scroll_bar = self.verticalScrollBar()
+        if value < scroll_bar.maximum() - scroll_bar.pageStep():
+            return
+        cursor = QTextCursor(self.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(self._next_chunk())
+        self.loaded_changed.emit(self._loaded_chars, len(self._full_text))
         
     def dragEnterEvent(self, event: QDragEnterEvent):
         if event.mimeData().hasUrls():
@@ -143,14 +395,13 @@ class DragDropTextEdit(QTextEdit):
     
     def dropEvent(self, event: QDropEvent):
         if event.mimeData().hasUrls():
-            urls = event.mimeData().urls()
-            if urls:
-                file_path = urls[0].toLocalFile()
-                if file_path:
-                    # 发送信号给主窗口
-                    main_window = self.window()
-                    if hasattr(main_window, 'handle_file_drop'):
-                        main_window.handle_file_drop(file_path)
+            file_paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            file_paths = [path for path in file_paths if path]
+            if file_paths:
+                # 发送信号给主窗口
+                main_window = self.window()
+                if hasattr(main_window, 'handle_files_drop'):
+                    main_window.handle_files_drop(file_paths)
             event.acceptProposedAction()
         else:
             super().dropEvent(event)
@@ -170,15 +421,13 @@ class DragDropLineEdit(QLineEdit):
     
     def dropEvent(self, event: QDropEvent):
         if event.mimeData().hasUrls():
-            urls = event.mimeData().urls()
-            if urls:
-                file_path = urls[0].toLocalFile()
-                if file_path:
-                    self.setText(file_path)
-                    # 通知主窗口文件已更改
-                    main_window = self.window()
-                    if hasattr(main_window, 'handle_file_drop'):
-                        main_window.handle_file_drop(file_path)
+            file_paths = [url.toLocalFile() for url in event.mimeData().urls()]
+            file_paths = [path for path in file_paths if path]
+            if file_paths:
+                # 通知主窗口文件已更改（多个文件或文件夹会进入批量队列）
+                main_window = self.window()
+                if hasattr(main_window, 'handle_files_drop'):
+                    main_window.handle_files_drop(file_paths)
             event.acceptProposedAction()
         else:
             super().dropEvent(event)
@@ -195,19 +444,46 @@ class MarkItDownUI(QMainWindow):
         self.excel_sheets = []
         self.selected_sheets = []
         self.current_excel_file = None
+        self.sheet_discovery_worker = None
+        self.current_pdf_file = None
+        self.pdf_info_worker = None
         self.current_result = ""
+        self.current_result_path = None  # 直接保存到文件时结果所在的路径
         self.current_title = ""
+        self.progress_pass = 1
+        self.progress_pass_started_at = 0.0
+        self.batch_files = []
+        self.batch_worker = None
+        self.batch_done = 0
+        self.batch_failed = 0
+        self.batch_duplicates = {}  # 批量转换中重复文件的 index -> 内容相同的文件的 index
+        self.watch_worker = None
+        self.watch_converted = 0
+        self.watch_failed = 0
+        self.worker = None
+        self.discarded_workers = []
+        self.warm_up_worker = None
+        self.cache = ConversionCache()
 
         # 设置现代化样式
         self.setup_style()
 
-        # 初始化MarkItDown
-        try:
-            self.md = MarkItDown()
-            self.setup_ui()
-        except Exception as e:
-            QMessageBox.critical(self, "初始化错误", f"无法初始化MarkItDown: {e}")
-            sys.exit(1)
+        self.setup_ui()
+
+        # 转换在可终止的子进程中运行；在后台预热，窗口无需等待转换器加载即可显示
+        self.conversion_process = ConversionProcess()
+        # 设置 MARKITDOWN_DAEMON_URL 为空可禁止使用本地转换服务
+        daemon_url = os.environ.get("MARKITDOWN_DAEMON_URL", DAEMON_DEFAULT_URL)
+        self.daemon_client = DaemonClient(daemon_url) if daemon_url else None
+        self.use_daemon = False
+        self.engine_ready = False
+        self.status_label.setText("正在预热转换引擎... 可以先选择文件")
+        self._start_warm_up()
+
+        # 转换进程可能在后台回收重建，定时刷新其内存显示
+        self.worker_timer = QTimer(self)
+        self.worker_timer.timeout.connect(self._refresh_worker_label)
+        self.worker_timer.start(2000)
 
     def setup_style(self):
         """设置现代化的应用样式 - 基于Material Design原则"""
@@ -473,6 +749,15 @@ class MarkItDownUI(QMainWindow):
                 font-weight: 500;
             }
 
+            /* ===== 大文件预览提示 ===== */
+            QLabel#hintLabel {
+                background-color: #fff3cd;
+                border-radius: 6px;
+                padding: 6px 10px;
+                color: #664d03;
+                font-size: 12px;
+            }
+
             QLabel#sectionTitle {
                 font-size: 13px;
                 font-weight: 600;
@@ -568,6 +853,22 @@ class MarkItDownUI(QMainWindow):
         browse_btn.clicked.connect(self.browse_file)
         input_control_layout.addWidget(browse_btn)
 
+        folder_btn = QPushButton("文件夹")
+        folder_btn.setObjectName("browseButton")
+        folder_btn.setMinimumWidth(80)
+        folder_btn.setFixedHeight(36)
+        folder_btn.clicked.connect(self.browse_folder)
+        input_control_layout.addWidget(folder_btn)
+
+        self.watch_btn = QPushButton("监视文件夹")
+        self.watch_btn.setObjectName("browseButton")
+        self.watch_btn.setCheckable(True)
+        self.watch_btn.setMinimumWidth(100)
+        self.watch_btn.setFixedHeight(36)
+        self.watch_btn.setToolTip("自动转换文件夹中新增或修改的文件，输出到批量转换的输出目录（未设置时保存在源文件旁）")
+        self.watch_btn.toggled.connect(self.toggle_watch)
+        input_control_layout.addWidget(self.watch_btn)
+
         input_section_layout.addLayout(input_control_layout)
         input_layout.addWidget(input_section)
 
@@ -615,9 +916,139 @@ class MarkItDownUI(QMainWindow):
         self.sheet_listbox.setMaximumHeight(150)
         excel_main_layout.addWidget(self.sheet_listbox)
 
+        # 转换范围限制，用于快速预览很大的 sheet，0 表示不限
+        limits_layout = QHBoxLayout()
+        limits_layout.setSpacing(8)
+
+        limits_layout.addWidget(QLabel("前:"))
+        self.max_rows_spin = QSpinBox()
+        self.max_rows_spin.setRange(0, 10 ** 9)
+        self.max_rows_spin.setSuffix(" 行")
+        self.max_rows_spin.setSpecialValueText("不限")
+        self.max_rows_spin.setFixedHeight(32)
+        limits_layout.addWidget(self.max_rows_spin)
+
+        limits_layout.addWidget(QLabel("抽样末尾:"))
+        self.tail_rows_spin = QSpinBox()
+        self.tail_rows_spin.setRange(0, 10 ** 6)
+        self.tail_rows_spin.setSuffix(" 行")
+        self.tail_rows_spin.setSpecialValueText("不抽样")
+        self.tail_rows_spin.setFixedHeight(32)
+        limits_layout.addWidget(self.tail_rows_spin)
+
+        limits_layout.addWidget(QLabel("最多:"))
+        self.max_columns_spin = QSpinBox()
+        self.max_columns_spin.setRange(0, 16384)
+        self.max_columns_spin.setSuffix(" 列")
+        self.max_columns_spin.setSpecialValueText("不限")
+        self.max_columns_spin.setFixedHeight(32)
+        limits_layout.addWidget(self.max_columns_spin)
+
+        limits_layout.addWidget(QLabel("区域:"))
+        self.cell_range_entry = QLineEdit()
+        self.cell_range_entry.setPlaceholderText("如 A1:F200，留空为全部")
+        self.cell_range_entry.setFixedHeight(32)
+        limits_layout.addWidget(self.cell_range_entry, stretch=1)
+
+        excel_main_layout.addLayout(limits_layout)
+
         main_layout.addWidget(self.excel_container)
         self.excel_container.hide()  # 初始隐藏
 
+        # ===== PDF 页码选择区域（初始隐藏）=====
+        self.pdf_container = QWidget()
+        self.pdf_container.setObjectName("cardContainer")
+        pdf_main_layout = QHBoxLayout(self.pdf_container)
+        pdf_main_layout.setSpacing(8)
+        pdf_main_layout.setContentsMargins(16, 12, 16, 12)
+
+        pdf_title = QLabel("PDF 页码选择")
+        pdf_title.setObjectName("sectionTitle")
+        pdf_main_layout.addWidget(pdf_title)
+
+        self.pdf_pages_label = QLabel()
+        pdf_main_layout.addWidget(self.pdf_pages_label)
+
+        # 只转换部分页面；指定页码或页数较多时按页段并行转换
+        self.page_range_entry = QLineEdit()
+        self.page_range_entry.setPlaceholderText("如 1-20, 35, 40-，留空为全部页")
+        self.page_range_entry.setFixedHeight(32)
+        pdf_main_layout.addWidget(self.page_range_entry, stretch=1)
+
+        all_pages_btn = QPushButton("全部")
+        all_pages_btn.setObjectName("compactButton")
+        all_pages_btn.clicked.connect(self.page_range_entry.clear)
+        pdf_main_layout.addWidget(all_pages_btn)
+
+        main_layout.addWidget(self.pdf_container)
+        self.pdf_container.hide()  # 初始隐藏
+
+        # ===== 批量转换队列（初始隐藏）=====
+        self.batch_container = QWidget()
+        self.batch_container.setObjectName("cardContainer")
+        batch_main_layout = QVBoxLayout(self.batch_container)
+        batch_main_layout.setSpacing(8)
+        batch_main_layout.setContentsMargins(16, 12, 16, 12)
+
+        batch_header_layout = QHBoxLayout()
+        batch_header_layout.setSpacing(10)
+
+        batch_title = QLabel("批量转换队列")
+        batch_title.setObjectName("sectionTitle")
+        batch_header_layout.addWidget(batch_title)
+
+        batch_header_layout.addStretch()
+
+        clear_queue_btn = QPushButton("清空队列")
+        clear_queue_btn.setObjectName("compactButton")
+        clear_queue_btn.clicked.connect(self.clear_batch_queue)
+        batch_header_layout.addWidget(clear_queue_btn)
+
+        batch_main_layout.addLayout(batch_header_layout)
+
+        # 每个文件一行，显示转换状态
+        self.batch_listbox = QListWidget()
+        self.batch_listbox.setSelectionMode(QAbstractItemView.NoSelection)
+        self.batch_listbox.setMinimumHeight(100)
+        self.batch_listbox.setMaximumHeight(180)
+        batch_main_layout.addWidget(self.batch_listbox)
+
+        batch_options_layout = QHBoxLayout()
+        batch_options_layout.setSpacing(8)
+
+        self.output_dir_entry = QLineEdit()
+        self.output_dir_entry.setPlaceholderText("输出目录（留空则保存在源文件旁）")
+        self.output_dir_entry.setFixedHeight(32)
+        batch_options_layout.addWidget(self.output_dir_entry, stretch=1)
+
+        output_dir_btn = QPushButton("选择")
+        output_dir_btn.setObjectName("compactButton")
+        output_dir_btn.clicked.connect(self.browse_output_dir)
+        batch_options_layout.addWidget(output_dir_btn)
+
+        batch_options_layout.addWidget(QLabel("并发进程:"))
+        self.batch_workers_spin = QSpinBox()
+        self.batch_workers_spin.setRange(1, max(64, os.cpu_count() or 1))
+        self.batch_workers_spin.setValue(os.cpu_count() or 1)
+        self.batch_workers_spin.setFixedHeight(32)
+        batch_options_layout.addWidget(self.batch_workers_spin)
+
+        self.batch_start_btn = QPushButton("开始批量转换")
+        self.batch_start_btn.setObjectName("compactButton")
+        self.batch_start_btn.clicked.connect(self.start_batch)
+        batch_options_layout.addWidget(self.batch_start_btn)
+
+        self.batch_stop_btn = QPushButton("停止")
+        self.batch_stop_btn.setObjectName("compactButton")
+        self.batch_stop_btn.setEnabled(False)
+        self.batch_stop_btn.clicked.connect(self.stop_batch)
+        batch_options_layout.addWidget(self.batch_stop_btn)
+
+        batch_main_layout.addLayout(batch_options_layout)
+
+        main_layout.addWidget(self.batch_container)
+        self.batch_container.hide()  # 初始隐藏
+
         # ===== 操作按钮区域 =====
         button_container = QWidget()
         button_main_layout = QVBoxLayout(button_container)
@@ -634,6 +1065,30 @@ class MarkItDownUI(QMainWindow):
         convert_btn.clicked.connect(self.convert_file)
         button_layout.addWidget(convert_btn)
 
+        self.cancel_btn = QPushButton("取消")
+        self.cancel_btn.setObjectName("dangerButton")
+        self.cancel_btn.setMinimumHeight(38)
+        self.cancel_btn.setMinimumWidth(70)
+        self.cancel_btn.setEnabled(False)
+        self.cancel_btn.clicked.connect(self.cancel_conversion)
+        button_layout.addWidget(self.cancel_btn)
+
+        # 单次转换的时间上限，0 表示不限
+        button_layout.addWidget(QLabel("超时:"))
+        self.timeout_spin = QSpinBox()
+        self.timeout_spin.setRange(0, 24 * 3600)
+        self.timeout_spin.setValue(600)
+        self.timeout_spin.setSuffix(" 秒")
+        self.timeout_spin.setSpecialValueText("不限")
+        self.timeout_spin.setFixedHeight(32)
+        button_layout.addWidget(self.timeout_spin)
+
+        # 结果直接写入文件，内存中只保留预览，适合非常大的输入
+        self.to_file_check = QCheckBox("直接保存到文件")
+        self.to_file_check.setToolTip("转换前选择保存位置，结果边生成边写入磁盘，界面只显示开头部分；"
+                                      "保存类型选择分块时按结构切成多块写出，供索引等下游处理")
+        button_layout.addWidget(self.to_file_check)
+
         # 添加弹性空间
         button_layout.addStretch()
 
@@ -652,6 +1107,13 @@ class MarkItDownUI(QMainWindow):
         clear_btn.clicked.connect(self.clear_result)
         button_layout.addWidget(clear_btn)
 
+        cache_btn = QPushButton("缓存")
+        cache_btn.setObjectName("secondaryButton")
+        cache_btn.setMinimumHeight(38)
+        cache_btn.setMinimumWidth(70)
+        cache_btn.clicked.connect(self.show_cache_dialog)
+        button_layout.addWidget(cache_btn)
+
         button_main_layout.addLayout(button_layout)
 
         # 进度条（初始状态隐藏）
@@ -674,37 +1136,236 @@ class MarkItDownUI(QMainWindow):
         result_title.setObjectName("sectionTitle")
         result_main_layout.addWidget(result_title)
 
+        # 大文件预览提示（仅在结果未完全加载时显示）
+        self.preview_label = QLabel()
+        self.preview_label.setObjectName("hintLabel")
+        self.preview_label.hide()
+        result_main_layout.addWidget(self.preview_label)
+
         self.result_text = DragDropTextEdit()
         self.result_text.setPlaceholderText("转换结果将显示在这里...\n\n您也可以直接拖拽文件到此处进行转换。")
         self.result_text.setFont(QFont("Consolas", 10))
         self.result_text.setMinimumHeight(180)
         # 设置文档边距，避免文字被裁剪
         self.result_text.document().setDocumentMargin(5)
+        self.result_text.loaded_changed.connect(self._update_preview_label)
         result_main_layout.addWidget(self.result_text)
 
         main_layout.addWidget(result_container, stretch=1)
 
         # ===== 状态栏 =====
+        status_layout = QHBoxLayout()
         self.status_label = QLabel("就绪 - 请选择文件或输入URL")
         self.status_label.setObjectName("statusLabel")
-        main_layout.addWidget(self.status_label)
+        status_layout.addWidget(self.status_label, stretch=1)
+
+        # 转换进程的内存和已处理任务数，进程按上限回收重建
+        self.worker_label = QLabel()
+        self.worker_label.setObjectName("hintLabel")
+        self.worker_label.hide()
+        status_layout.addWidget(self.worker_label)
+        main_layout.addLayout(status_layout)
         
     def browse_file(self):
-        filename, _ = QFileDialog.getOpenFileName(
+        filenames, _ = QFileDialog.getOpenFileNames(
             self,
             "选择要转换的文件",
             "",
             "所有支持的文件 (*.pdf *.docx *.pptx *.xlsx *.csv *.html *.epub *.jpg *.png);;PDF文件 (*.pdf);;Word文档 (*.docx);;PowerPoint (*.pptx);;Excel文件 (*.xlsx *.xls);;图像文件 (*.jpg *.jpeg *.png *.gif *.bmp);;所有文件 (*.*)"
         )
-        if filename:
-            self.file_entry.setText(filename)
-            self._check_excel_file(filename)
+        if len(filenames) == 1:
+            self.file_entry.setText(filenames[0])
+            self._check_excel_file(filenames[0])
+            self._check_pdf_file(filenames[0])
+        elif filenames:
+            self._add_batch_files(filenames)
+
+    def browse_folder(self):
+        """选择文件夹，将其中支持的文件加入批量队列"""
+        folder = QFileDialog.getExistingDirectory(self, "选择要批量转换的文件夹")
+        if folder:
+            self._add_batch_files([folder])
     
+    def toggle_watch(self, checked):
+        """开始或停止监视文件夹"""
+        if not checked:
+            if self.watch_worker and self.watch_worker.isRunning():
+                self.watch_worker.stop()
+                self.watch_btn.setEnabled(False)
+                self.status_label.setText("正在停止监视，等待进行中的转换完成...")
+            return
+        folder = QFileDialog.getExistingDirectory(self, "选择要监视的文件夹")
+        if not folder:
+            self.watch_btn.setChecked(False)
+            return
+        try:
+            limits = self._get_limits()
+        except ValueError as e:
+            QMessageBox.warning(self, "错误", str(e))
+            self.watch_btn.setChecked(False)
+            return
+        output_dir = self.output_dir_entry.text().strip() or None
+        self.watch_converted = 0
+        self.watch_failed = 0
+        self.watch_worker = WatchWorker(folder, output_dir, self.batch_workers_spin.value(), limits)
+        self.watch_worker.event.connect(self._watch_event)
+        self.watch_worker.finished.connect(self._watch_stopped)
+        self.watch_btn.setText("停止监视")
+        self.status_label.setText(f"正在监视: {folder}")
+        self.watch_worker.start()
+
+    def _watch_event(self, info):
+        name = Path(info['source']).name
+        event = info['event']
+        if event == 'started':
+            message = f"转换中: {name}"
+        elif event == 'converted':
+            self.watch_converted += 1
+            message = f"已转换: {name} ({info['seconds']:.1f}s)"
+        elif event == 'unchanged':
+            message = f"内容未变，跳过: {name}"
+        elif event == 'failed':
+            self.watch_failed += 1
+            message = f"转换失败: {name}: {info['message']}"
+        else:
+            message = f"已删除: {name}"
+        self.status_label.setText(
+            f"监视中（已转换 {self.watch_converted}，失败 {self.watch_failed}）· {message}")
+
+    def _watch_stopped(self):
+        self.watch_btn.blockSignals(True)
+        self.watch_btn.setChecked(False)
+        self.watch_btn.blockSignals(False)
+        self.watch_btn.setEnabled(True)
+        self.watch_btn.setText("监视文件夹")
+        self.status_label.setText(
+            f"已停止监视: 已转换 {self.watch_converted}，失败 {self.watch_failed}")
+
     def handle_file_drop(self, file_path):
         """处理文件拖拽"""
         self.file_entry.setText(file_path)
         self._check_excel_file(file_path)
+        self._check_pdf_file(file_path)
+
+    def handle_files_drop(self, file_paths):
+        """处理拖拽：单个文件直接载入，多个文件或文件夹进入批量队列"""
+        if len(file_paths) == 1 and not Path(file_paths[0]).is_dir():
+            self.handle_file_drop(file_paths[0])
+        else:
+            self._add_batch_files(file_paths)
+
+    def _add_batch_files(self, paths):
+        """将文件或文件夹加入批量队列"""
+        if self.batch_worker and self.batch_worker.isRunning():
+            QMessageBox.warning(self, "批量转换", "批量转换正在进行，请等待完成后再添加文件")
+            return
+
+        known = {os.path.normcase(str(Path(f).resolve())) for f in self.batch_files}
+        added = 0
+        for file_path in _collect_batch_files(paths):
+            if os.path.normcase(str(Path(file_path).resolve())) in known:
+                continue
+            self.batch_files.append(file_path)
+            self.batch_listbox.addItem(QListWidgetItem(f"{Path(file_path).name} — 等待中"))
+            added += 1
+
+        if not self.batch_files:
+            QMessageBox.warning(self, "批量转换", "没有找到支持的文件")
+            return
+        self.batch_container.show()
+        self.status_label.setText(f"已加入 {added} 个文件，队列共 {len(self.batch_files)} 个文件")
+
+    def browse_output_dir(self):
+        """选择批量转换的输出目录"""
+        folder = QFileDialog.getExistingDirectory(self, "选择输出目录")
+        if folder:
+            self.output_dir_entry.setText(folder)
+
+    def clear_batch_queue(self):
+        """清空批量队列"""
+        if self.batch_worker and self.batch_worker.isRunning():
+            QMessageBox.warning(self, "批量转换", "批量转换正在进行，请先停止")
+            return
+        self.batch_files = []
+        self.batch_listbox.clear()
+        self.batch_container.hide()
+
+    def start_batch(self):
+        """开始批量转换队列中的文件"""
+        if not self.batch_files:
+            QMessageBox.warning(self, "批量转换", "批量队列为空")
+            return
+        if self.batch_worker and self.batch_worker.isRunning():
+            return
+
+        output_dir = self.output_dir_entry.text().strip() or None
+        for i, file_path in enumerate(self.batch_files):
+            self.batch_listbox.item(i).setText(f"{Path(file_path).name} — 等待中")
+        self.batch_failed = 0
+        self.batch_done = 0
+        self.batch_duplicates = {}
+
+        self.batch_worker = BatchWorker(self.batch_files, output_dir, self.batch_workers_spin.value())
+        self.batch_worker.item_started.connect(self._batch_item_started)
+        self.batch_worker.item_finished.connect(self._batch_item_finished)
+        self.batch_worker.item_duplicate.connect(self.batch_duplicates.__setitem__)
+        self.batch_worker.all_done.connect(self._batch_complete)
+
+        self.batch_start_btn.setEnabled(False)
+        self.batch_stop_btn.setEnabled(True)
+        self.progress.setRange(0, len(self.batch_files))
+        self.progress.setValue(0)
+        self.progress.show()
+        self.status_label.setText(f"批量转换中: 0/{len(self.batch_files)}")
+        self.batch_worker.start()
+
+    def stop_batch(self):
+        """停止批量转换（正在转换的文件会完成）"""
+        if self.batch_worker and self.batch_worker.isRunning():
+            self.batch_worker.stop()
+            self.batch_stop_btn.setEnabled(False)
+            self.status_label.setText("正在停止批量转换，等待进行中的文件完成...")
+
+    def _batch_item_started(self, index):
+        self.batch_listbox.item(index).setText(f"{Path(self.batch_files[index]).name} — 转换中...")
+
+    def _batch_item_finished(self, index, success, message, seconds):
+        name = Path(self.batch_files[index]).name
+        if index in self.batch_duplicates:
+            name += f"（与 {Path(self.batch_files[self.batch_duplicates[index]]).name} 内容相同，复用结果）"
+        if success:
+            self.batch_listbox.item(index).setText(f"{name} — 完成 ({seconds:.1f}s) → {message}")
+        else:
+            self.batch_failed += 1
+            self.batch_listbox.item(index).setText(f"{name} — 失败: {message}")
+        self.batch_done += 1
+        self.progress.setValue(self.batch_done)
+        self.status_label.setText(
+            f"批量转换中: {self.batch_done}/{len(self.batch_files)}，失败 {self.batch_failed}")
+
+    def _batch_complete(self, succeeded, failed):
+        self.progress.hide()
+        self.progress.setRange(0, 0)
+        self.batch_start_btn.setEnabled(True)
+        self.batch_stop_btn.setEnabled(False)
+        skipped = len(self.batch_files) - succeeded - failed
+        message = f"批量转换完成: 成功 {succeeded}，失败 {failed}"
+        if skipped:
+            message += f"，未处理 {skipped}"
+        dedupe_stats = self.batch_worker.dedupe_stats
+        if dedupe_stats.get('duplicates'):
+            message += f" · {_dedupe_summary(dedupe_stats)}"
+        self.status_label.setText(message)
             
+    # “直接保存到文件”时可选的保存类型及对应的分块格式
+    _OUTPUT_FILTERS = {
+        "Markdown文件 (*.md)": None,
+        "文本文件 (*.txt)": None,
+        "分块 JSONL，每块一行 (*.jsonl)": 'jsonl',
+        "分块 Markdown，写入 <名称>.chunks 文件夹 (*.md)": 'files',
+        "所有文件 (*.*)": None,
+    }
+
     def convert_file(self):
         source = self.file_entry.text().strip()
 
@@ -712,44 +1373,242 @@ class MarkItDownUI(QMainWindow):
             QMessageBox.warning(self, "错误", "请选择文件或输入URL")
             return
 
+        if self.current_excel_file and self._is_loading_sheets():
+            QMessageBox.information(self, "提示", "正在读取 Excel 的 sheet 列表，请稍候")
+            return
+
+        try:
+            limits = self._get_limits()
+            pages = self._get_pages() if source == self.current_pdf_file else None
+        except ValueError as e:
+            QMessageBox.warning(self, "错误", str(e))
+            return
+
+        output_path = chunk_format = None
+        if self.to_file_check.isChecked():
+            output_path, selected_filter = QFileDialog.getSaveFileName(
+                self,
+                "选择转换结果的保存位置",
+                f"{self._sanitize_filename(self._result_title(source))}.md",
+                ";;".join(self._OUTPUT_FILTERS)
+            )
+            if not output_path:
+                return
+            chunk_format = self._OUTPUT_FILTERS.get(selected_filter)
+
+        # 先清理上一次仍在进行的转换
+        self._discard_worker()
+
         # 在后台线程中执行转换
         selected_sheets = self._get_selected_sheets() if self.current_excel_file else None
         
-        self.worker = ConversionWorker(self.md, source, self.current_excel_file, selected_sheets)
+        # 转换服务不支持分块输出，分块时使用本地转换进程
+        use_daemon = self.use_daemon and not chunk_format
+        converter = self.daemon_client if use_daemon else self.conversion_process
+        self.worker = ConversionWorker(converter, source, self.current_excel_file,
+                                       selected_sheets, self.cache, self.timeout_spin.value() or None,
+                                       fallback=self.conversion_process if use_daemon else None,
+                                       limits=limits, output_path=output_path, pages=pages,
+                                       chunk_format=chunk_format)
         self.worker.finished.connect(self._conversion_complete)
         self.worker.error.connect(self._conversion_error)
+        self.worker.cancelled.connect(self._conversion_cancelled)
+        self.worker.progress.connect(self._conversion_progress)
         
         self._start_conversion()
         self.worker.start()
+
+    def cancel_conversion(self):
+        """取消当前转换并终止转换进程"""
+        if self.worker and self.worker.isRunning():
+            self.worker.cancel()
+            self.cancel_btn.setEnabled(False)
+            self.status_label.setText("正在取消转换...")
+
+    def _discard_worker(self):
+        """放弃上一次转换：断开信号并终止其子进程，结果不再显示"""
+        if self.worker is None or not self.worker.isRunning():
+            return
+        self.worker.finished.disconnect(self._conversion_complete)
+        self.worker.error.disconnect(self._conversion_error)
+        self.worker.cancelled.disconnect(self._conversion_cancelled)
+        self.worker.progress.disconnect(self._conversion_progress)
+        self.worker.cancel()
+        # 保留引用直到线程结束，新的转换会在同一进程宿主中重建子进程
+        self.discarded_workers = [w for w in self.discarded_workers if w.isRunning()]
+        self.discarded_workers.append(self.worker)
+
+    def _start_warm_up(self):
+        """启动（或在进程被终止后重建）转换子进程"""
+        if self.warm_up_worker and self.warm_up_worker.isRunning():
+            return
+        self.engine_ready = False
+        self.warm_up_worker = WarmUpWorker(self.conversion_process, self.daemon_client)
+        self.warm_up_worker.ready.connect(self._warm_up_complete)
+        self.warm_up_worker.daemon_found.connect(self._daemon_found)
+        self.warm_up_worker.failed.connect(self._warm_up_failed)
+        self.warm_up_worker.start()
+
+    def _conversion_cancelled(self):
+        self.progress.hide()
+        self.cancel_btn.setEnabled(False)
+        if self.use_daemon:
+            # 转换服务会按自己的超时结束任务，本地进程无需重建
+            self.status_label.setText("转换已取消")
+            return
+        self.status_label.setText("转换已取消，正在重新准备转换引擎...")
+        self._start_warm_up()
         
+    def _warm_up_complete(self):
+        self.engine_ready = True
+        self._refresh_worker_label()
+        # 只在仍显示预热提示时更新，避免覆盖用户操作后的状态
+        if self.status_label.text().startswith(("正在预热", "转换已取消")):
+            self.status_label.setText("就绪 - 请选择文件或输入URL")
+
+    def _refresh_worker_label(self):
+        """显示转换进程的内存和已处理任务数；使用转换服务时不显示"""
+        stats = self.conversion_process.stats()
+        if self.use_daemon or stats['pid'] is None:
+            self.worker_label.hide()
+            return
+        parts = [f"转换进程 {stats['pid']}"]
+        if stats['rss'] is not None:
+            limit = f" / {_format_bytes(stats['max_rss'])}" if stats['max_rss'] > 0 else ""
+            parts.append(f"内存 {_format_bytes(stats['rss'])}{limit}")
+        jobs = f"{stats['jobs']}/{stats['max_jobs']}" if stats['max_jobs'] > 0 else str(stats['jobs'])
+        parts.append(f"已处理 {jobs} 个")
+        if stats['recycled']:
+            parts.append(f"已回收 {stats['recycled']} 次")
+        self.worker_label.setText(" · ".join(parts))
+        self.worker_label.show()
+
+    def _daemon_found(self, url):
+        self.use_daemon = True
+        self.engine_ready = True
+        if self.status_label.text().startswith(("正在预热", "转换已取消")):
+            self.status_label.setText(f"就绪 - 已连接本地转换服务 {url}")
+
+    def _stop_using_daemon(self):
+        """转换服务不可用后改用本地转换进程，并不再自动探测服务"""
+        self.use_daemon = False
+        self.daemon_client = None
+        self._start_warm_up()
+
+    def _warm_up_failed(self, error_message):
+        self.status_label.setText(f"转换引擎初始化失败: {error_message}")
+        QMessageBox.critical(self, "初始化错误", error_message)
+
     def _start_conversion(self):
+        self.progress.setRange(0, 0)  # 收到进度前显示为无限进度条
         self.progress.show()  # 显示进度条
-        self.status_label.setText("正在转换...")
+        self.progress_pass = 1
+        self.progress_pass_started_at = time.monotonic()
+        self.cancel_btn.setEnabled(True)
+        if self.engine_ready:
+            self.status_label.setText("正在转换...")
+        else:
+            self.status_label.setText("正在转换...（转换引擎预热中）")
         self.result_text.clear()
 
+    def _conversion_progress(self, info):
+        """显示转换进度：百分比、已处理数量和吞吐量"""
+        unit, done, total = info['unit'], info['done'], info['total']
+        if total:
+            self.progress.setRange(0, 1000)
+            self.progress.setValue(min(1000, int(done * 1000 / total)))
+        if info.get('pass_no', 1) != self.progress_pass:
+            # PDF 新的一遍从头计数，吞吐量也从这一遍开始计算
+            self.progress_pass = info.get('pass_no', 1)
+            self.progress_pass_started_at = time.monotonic()
+        elapsed = max(time.monotonic() - self.progress_pass_started_at, 1e-6)
+
+        parts = []
+        if info.get('sheets_total'):
+            parts.append(f"Sheet {info['sheets_done']}/{info['sheets_total']}")
+        if unit == 'bytes':
+            received = _format_bytes(done) + (f" / {_format_bytes(total)}" if total else "")
+            parts.append(f"已下载 {received}，{_format_bytes(done / elapsed)}/秒")
+        elif unit == 'pages':
+            pass_label = f"第 {info['pass_no']} 遍，" if info.get('pass_no', 1) > 1 else ""
+            parts.append(f"{pass_label}第 {done}/{total or '?'} 页，{done / elapsed:.1f} 页/秒")
+        else:
+            rows = info.get('rows', done)
+            counted = f"{done:,}/{total:,}" if unit == 'rows' and total else f"{rows:,}"
+            parts.append(f"{counted} 行，{rows / elapsed:,.0f} 行/秒")
+
+        percent = f" {done * 100 // total}%" if total else ""
+        self.status_label.setText(f"正在转换...{percent}（{'，'.join(parts)}）")
+
     def _conversion_complete(self, markdown_content, source):
         self.progress.hide()  # 隐藏进度条
-        self.status_label.setText(f"转换完成: {Path(source).name if not source.startswith('http') else source}")
+        self.cancel_btn.setEnabled(False)
+        if self.worker.fell_back:
+            self._stop_using_daemon()
+        display_name = Path(source).name if not source.startswith('http') else source
+        tracer = self.worker.tracer
         
         # 显示结果
-        self.result_text.setPlainText(markdown_content)
+        with tracer.span('render', chars=len(markdown_content)):
+            self.result_text.set_result_text(markdown_content)
+
+        output_path = self.worker.output_path
+        state = "转换完成并已保存" if output_path else "转换完成"
+        if self.worker.from_cache:
+            state += "（缓存命中）"
+        self.status_label.setText(f"{state}: {display_name} · {tracer.summary()}")
+        _write_trace_log(tracer)
+        self._refresh_worker_label()
         
-        # 存储结果用于保存
-        self.current_result = markdown_content
+        # 存储结果用于保存；直接写入文件时内存中只有预览
+        self.current_result = "" if output_path else markdown_content
+        self.current_result_path = output_path if not self.worker.chunk_format else None
+        if self.worker.chunk_format:
+            self.preview_label.setText(
+                f"结果已分为 {self.worker.output_chunks:,} 块写入 {output_path}"
+                f"（{_format_bytes(self.worker.output_size)}），此处只显示开头 {len(markdown_content):,} 个字符")
+            self.preview_label.show()
+        elif output_path:
+            self.preview_label.setText(
+                f"结果已保存到 {output_path}（{_format_bytes(self.worker.output_size)}），"
+                f"此处只显示开头 {len(markdown_content):,} 个字符")
+            self.preview_label.show()
         
         # 根据源文件生成标题
+        self.current_title = self._result_title(source)
+
+    def _result_title(self, source):
+        """保存结果时的默认文件名（不含扩展名）"""
         if source.startswith('http'):
-            self.current_title = "web_content"
-        else:
-            # 使用原文件名（不含扩展名）作为标题
-            source_path = Path(source)
-            self.current_title = source_path.stem  # 文件名不含扩展名
+            return "web_content"
+        # 使用原文件名（不含扩展名）作为标题
+        return Path(source).stem
     
     def _conversion_error(self, error_message):
         self.progress.hide()
+        self.cancel_btn.setEnabled(False)
+        if self.worker.fell_back:
+            self._stop_using_daemon()
+        elif not self.use_daemon and not self.conversion_process.is_running():
+            # 超时或进程崩溃后子进程已被终止，在后台重建
+            self._start_warm_up()
         self.status_label.setText(f"转换失败: {error_message}")
         QMessageBox.critical(self, "转换错误", error_message)
         
+    def _update_preview_label(self, loaded_chars, total_chars):
+        """大文件预览时提示已加载的比例，完整内容可通过保存获取"""
+        if loaded_chars < total_chars:
+            self.preview_label.setText(
+                f"大文件预览：已显示 {loaded_chars:,} / {total_chars:,} 字符，"
+                f"向下滚动加载更多，完整内容请点击“保存结果”")
+            self.preview_label.show()
+        else:
+            self.preview_label.hide()
+
+    def show_cache_dialog(self):
+        """显示缓存统计和设置"""
+        CacheDialog(self.cache, self).exec()
+
     def _sanitize_filename(self, filename):
         """清理文件名中的非法字符"""
         # Windows文件名非法字符
@@ -764,7 +1623,7 @@ class MarkItDownUI(QMainWindow):
         return sanitized
 
     def save_result(self):
-        if not self.current_result:
+        if not self.current_result and not self.current_result_path:
             QMessageBox.warning(self, "警告", "没有可保存的转换结果")
             return
         
@@ -780,60 +1639,163 @@ class MarkItDownUI(QMainWindow):
         
         if filename:
             try:
-                with open(filename, 'w', encoding='utf-8') as f:
-                    f.write(self.current_result)
-                self.status_label.setText(f"已保存: {Path(filename).name}")
+                tracer = Tracer()
+                if self.current_result_path:
+                    # 结果已在磁盘上，另存时直接复制文件
+                    with tracer.span('save', path=filename, size=os.path.getsize(self.current_result_path)):
+                        if os.path.abspath(filename) != os.path.abspath(self.current_result_path):
+                            shutil.copyfile(self.current_result_path, filename)
+                else:
+                    with tracer.span('save', path=filename, chars=len(self.current_result)):
+                        with open(filename, 'w', encoding='utf-8') as f:
+                            f.write(self.current_result)
+                _write_trace_log(tracer)
+                self.status_label.setText(f"已保存: {Path(filename).name} · {tracer.summary()}")
                 QMessageBox.information(self, "成功", f"文件已保存到: {filename}")
             except Exception as e:
                 QMessageBox.critical(self, "保存错误", f"保存文件失败: {str(e)}")
                 
+    def closeEvent(self, event):
+        """关闭窗口前停止批量转换、文件夹监视和转换进程，避免遗留工作进程"""
+        if self.batch_worker and self.batch_worker.isRunning():
+            self.batch_worker.stop()
+            self.batch_worker.wait()
+        if self.watch_worker and self.watch_worker.isRunning():
+            self.watch_worker.stop()
+            self.watch_worker.wait()
+        if self.worker and self.worker.isRunning():
+            self.worker.cancel()
+            self.worker.wait()
+        if self._is_loading_sheets():
+            self.sheet_discovery_worker.wait()
+        if self.pdf_info_worker and self.pdf_info_worker.isRunning():
+            self.pdf_info_worker.wait()
+        self.worker_timer.stop()
+        self.conversion_process.shutdown()
+        self.cache.close()
+        super().closeEvent(event)
+
     def clear_result(self):
         self.result_text.clear()
         self.file_entry.clear()
         self.status_label.setText("就绪 - 请选择文件或输入URL")
         self.current_result = ""
+        self.current_result_path = None
+
+        # 批量转换未运行时一并清空队列
+        if not (self.batch_worker and self.batch_worker.isRunning()):
+            self.clear_batch_queue()
 
         # 隐藏 Excel 选择区域
         self.excel_container.hide()
         self.current_excel_file = None
         self.excel_sheets = []
         self.selected_sheets = []
+        self.pdf_container.hide()
+        self.current_pdf_file = None
 
     def _check_excel_file(self, filename):
-        """检查是否为 Excel 文件，如果是则显示 sheet 选择"""
+        """检查是否为 Excel 文件，如果是则在后台读取 sheet 列表"""
         if not EXCEL_SUPPORT:
             return
 
         file_ext = Path(filename).suffix.lower()
         if file_ext in ['.xlsx', '.xls']:
-            try:
-                self.current_excel_file = filename
-                self._load_excel_sheets(filename)
-                self.excel_container.show()  # 显示 Excel 选择区域
-            except Exception as e:
-                QMessageBox.critical(self, "Excel 文件错误", f"无法读取 Excel 文件: {str(e)}")
+            self.current_excel_file = filename
+            self._load_excel_sheets(filename)
+            self.excel_container.show()  # 显示 Excel 选择区域
         else:
             self.excel_container.hide()  # 隐藏 Excel 选择区域
             self.current_excel_file = None
 
+    def _check_pdf_file(self, filename):
+        """检查是否为 PDF 文件，如果是则显示页码选择并在后台读取页数"""
+        if not _is_pdf_path(filename):
+            self.pdf_container.hide()
+            self.current_pdf_file = None
+            return
+        self.current_pdf_file = filename
+        self.page_range_entry.clear()
+        self.pdf_pages_label.setText("正在读取页数...")
+        self.pdf_container.show()
+        if self.pdf_info_worker and self.pdf_info_worker.isRunning():
+            # 上一个文件仍在读取，保留引用直到线程结束，其结果会被忽略
+            self.discarded_workers = [w for w in self.discarded_workers if w.isRunning()]
+            self.discarded_workers.append(self.pdf_info_worker)
+        self.pdf_info_worker = PdfInfoWorker(filename)
+        self.pdf_info_worker.found.connect(self._pdf_info_loaded)
+        self.pdf_info_worker.failed.connect(self._pdf_info_failed)
+        self.pdf_info_worker.start()
+
+    def _pdf_info_loaded(self, filename, page_count):
+        if filename == self.current_pdf_file:
+            self.pdf_pages_label.setText(f"共 {page_count:,} 页")
+
+    def _pdf_info_failed(self, filename, error_message):
+        if filename != self.current_pdf_file:
+            return
+        # 无法分页读取的文件仍可整体交给 MarkItDown 转换
+        self.pdf_container.hide()
+        self.current_pdf_file = None
+
+    def _get_pages(self):
+        """读取 PDF 页码范围，无效时抛出 ValueError"""
+        return _normalize_pages(self.page_range_entry.text())
+
     def _load_excel_sheets(self, filename):
-        """加载 Excel 文件的所有 sheet"""
-        try:
-            workbook = openpyxl.load_workbook(filename, read_only=True)
-            self.excel_sheets = workbook.sheetnames
-            workbook.close()
-            
-            # 更新 listbox
-            self.sheet_listbox.clear()
-            for sheet in self.excel_sheets:
-                item = QListWidgetItem(sheet)
-                self.sheet_listbox.addItem(item)
-            
-            # 默认选择所有 sheet
-            self.select_all_sheets()
-            
-        except Exception as e:
-            raise Exception(f"读取 Excel 文件失败: {str(e)}")
+        """在后台线程读取 Excel 文件的 sheet 列表，避免大文件卡住界面"""
+        self.excel_sheets = []
+        self.sheet_listbox.clear()
+        placeholder = QListWidgetItem("正在读取 sheet 列表...")
+        placeholder.setFlags(Qt.NoItemFlags)
+        self.sheet_listbox.addItem(placeholder)
+
+        if self._is_loading_sheets():
+            # 上一个文件仍在读取，保留引用直到线程结束，其结果会被忽略
+            self.discarded_workers = [w for w in self.discarded_workers if w.isRunning()]
+            self.discarded_workers.append(self.sheet_discovery_worker)
+        self.sheet_discovery_worker = SheetDiscoveryWorker(filename)
+        self.sheet_discovery_worker.found.connect(self._excel_sheets_loaded)
+        self.sheet_discovery_worker.failed.connect(self._excel_sheets_failed)
+        self.sheet_discovery_worker.start()
+
+    def _is_loading_sheets(self):
+        worker = self.sheet_discovery_worker
+        return worker is not None and worker.isRunning()
+
+    def _excel_sheets_loaded(self, filename, sheets):
+        if filename != self.current_excel_file:
+            return  # 已切换到其他文件
+        self.excel_sheets = [sheet['name'] for sheet in sheets]
+
+        # 更新 listbox，显示每个 sheet 的规模以便取消选择过大的 sheet
+        self.sheet_listbox.clear()
+        for sheet in sheets:
+            item = QListWidgetItem(self._sheet_item_text(sheet))
+            item.setData(Qt.UserRole, sheet['name'])
+            self.sheet_listbox.addItem(item)
+
+        # 默认选择所有 sheet
+        self.select_all_sheets()
+
+    def _excel_sheets_failed(self, filename, error_message):
+        if filename != self.current_excel_file:
+            return
+        self.sheet_listbox.clear()
+        self.excel_container.hide()
+        self.current_excel_file = None
+        QMessageBox.critical(self, "Excel 文件错误", f"无法读取 Excel 文件: {error_message}")
+
+    def _sheet_item_text(self, sheet):
+        """sheet 名称加上行列数和 XML 大小提示"""
+        hints = []
+        if sheet['rows'] is not None and sheet['columns'] is not None:
+            hints.append(f"{sheet['rows']:,} 行 × {sheet['columns']:,} 列")
+        if sheet['size'] is not None:
+            hints.append(f"约 {_format_bytes(sheet['size'])}")
+        if not hints:
+            return sheet['name']
+        return f"{sheet['name']}    （{'，'.join(hints)}）"
 
     def select_all_sheets(self):
         """选择所有 sheet"""
@@ -851,17 +1813,33 @@ class MarkItDownUI(QMainWindow):
             item = self.sheet_listbox.item(i)
             item.setSelected(not item.isSelected())
 
+    def _get_limits(self):
+        """读取 Excel 转换范围限制，无效区域抛出 ValueError"""
+        if not self.current_excel_file:
+            return None
+        # 数值框为 0 时显示“不限”
+        return _normalize_limits({
+            'max_rows': self.max_rows_spin.value() or None,
+            'max_columns': self.max_columns_spin.value() or None,
+            'cell_range': self.cell_range_entry.text().strip(),
+            'tail_rows': self.tail_rows_spin.value() or None,
+        })
+
     def _get_selected_sheets(self):
         """获取选中的 sheet 名称列表"""
         selected_sheets = []
         for i in range(self.sheet_listbox.count()):
             item = self.sheet_listbox.item(i)
             if item.isSelected():
-                selected_sheets.append(item.text())
+                selected_sheets.append(item.data(Qt.UserRole))
         return selected_sheets
 
 
 def main():
+    # 打包后的 exe 中启动进程池需要此调用
+    multiprocessing.freeze_support()
+    if len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+        sys.exit(run_cli(sys.argv[1:]))
     app = QApplication(sys.argv)
     window = MarkItDownUI()
     window.show()
@@ -869,6 +1847,3 @@ def main():
 
 if __name__ == "__main__":
     main()
-
-
-
@@ -0,0 +1,55 @@
+import os
+import sys
+
+import pytest
+
+# 测试直接导入仓库根目录下的模块
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# 不连接可能正在运行的转换服务
+os.environ.setdefault("MARKITDOWN_DAEMON_URL", "")
+
+
+def _write_pdf(path, page_count, declared_count=None):
+    """写出每页一行文字 "Page N" 的最小 PDF"""
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>", None,
+               "<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    kids = []
+    for number in range(1, page_count + 1):
+        stream = f"BT /F1 12 Tf 72 720 Td (Page {number}) Tj ET"
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}\nendstream")
+        kids.append(f"{len(objects) + 1} 0 R")
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+                       f"/Resources << /Font << /F1 3 0 R >> >> /Contents {len(objects)} 0 R >>")
+    count = page_count if declared_count is None else declared_count
+    objects[1] = f"<< /Type /Pages /Kids [{' '.join(kids)}] /Count {count} >>"
+    data = b"%PDF-1.4\n"
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(data))
+        data += f"{number} 0 obj\n{body}\nendobj\n".encode('latin-1')
+    xref = len(data)
+    data += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode('latin-1')
+    data += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode('latin-1')
+    data += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode('latin-1')
+    path.write_bytes(data)
+    return path
+
+
+@pytest.fixture
+def write_pdf():
+    return _write_pdf
+
+
+def _rewrite_member(path, member, transform):
+    """以 transform(bytes) 的结果替换 zip 文件（如 xlsx）中的一个文件"""
+    import zipfile
+    with zipfile.ZipFile(path) as archive:
+        contents = [(info, archive.read(info.filename)) for info in archive.infolist()]
+    with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for info, data in contents:
+            archive.writestr(info, transform(data) if info.filename == member else data)
+
+
+@pytest.fixture
+def rewrite_member():
+    return _rewrite_member
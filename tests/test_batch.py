@@ -0,0 +1,76 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+from converter import _batch_output_path, _collect_batch_files, _plan_batch_jobs, _run_batch, _url_output_stem
+
+
+def _workbook(path, value):
+    wb = Workbook()
+    wb.active.append(["值", "说明"])
+    wb.active.append([value, "行"])
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def tree(tmp_path):
+    (tmp_path / "docs" / "sub").mkdir(parents=True)
+    _workbook(tmp_path / "docs" / "b.xlsx", 2)
+    _workbook(tmp_path / "docs" / "sub" / "a.xlsx", 1)
+    (tmp_path / "docs" / "notes.txt").write_text("x", encoding='utf-8')
+    (tmp_path / "docs" / "skip.bin").write_bytes(b"\0")
+    return tmp_path
+
+
+def test_collect_expands_folders_and_globs(tree):
+    docs = tree / "docs"
+    files = _collect_batch_files([str(docs / "*.xlsx"), str(docs), str(docs / "missing.pdf")])
+    assert files == [str(docs / "b.xlsx"), str(docs / "notes.txt"), str(docs / "sub" / "a.xlsx")]
+    assert _collect_batch_files([str(docs / "**" / "*.xlsx")]) == [str(docs / "b.xlsx"), str(docs / "sub" / "a.xlsx")]
+
+
+def test_output_paths_do_not_collide(tmp_path):
+    used = set()
+    out = str(tmp_path / "out")
+    paths = [_batch_output_path(source, out, used)
+             for source in ("a/report.pdf", "b/report.docx", "c/report.pdf", "https://example.com/x/report.html")]
+    assert [os.path.basename(path) for path in paths] == ["report.md", "report_1.md", "report_2.md", "report_3.md"]
+    assert _batch_output_path(str(tmp_path / "src" / "a.pdf"), None, set()) == str(tmp_path / "src" / "a.md")
+
+
+@pytest.mark.parametrize("url, stem", [
+    ("https://example.com/docs/guide.html", "guide"),
+    ("https://example.com/", "example.com"),
+    ("https://example.com/a b/c%20d?x=1", "c%20d"),
+    ("https://example.com/ /", "web_content"),
+])
+def test_url_output_stem(url, stem):
+    assert _url_output_stem(url) == stem
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_run_batch_reports_every_job(tree, tmp_path, max_workers):
+    broken = tree / "docs" / "broken.xlsx"
+    broken.write_bytes(b"PK\x03\x04 broken")
+    files = _collect_batch_files([str(tree / "docs" / "b.xlsx"), str(broken), str(tree / "docs" / "sub")])
+    jobs = _plan_batch_jobs(files, str(tmp_path / "out"))
+    started, finished = [], {}
+    counts = _run_batch(jobs, max_workers, on_started=started.append,
+                        on_finished=lambda index, success, message, seconds: finished.setdefault(index, (success, message)))
+    assert counts == (2, 1)
+    assert sorted(started) == [0, 1, 2]
+    assert finished[0] == (True, jobs[0][2]) and finished[2] == (True, jobs[2][2])
+    assert finished[1][0] is False and finished[1][1].startswith("转换失败")
+    with open(jobs[2][2], encoding='utf-8') as f:
+        assert "| 1 | 行 |" in f.read()
+
+
+def test_run_batch_stops(tree, tmp_path):
+    files = _collect_batch_files([str(tree / "docs" / "b.xlsx"), str(tree / "docs" / "sub")])
+    jobs = _plan_batch_jobs(files, str(tmp_path / "out"))
+    finished = []
+    counts = _run_batch(jobs, 1, on_finished=lambda index, *result: finished.append(index),
+                        should_stop=lambda: bool(finished))
+    assert counts == (1, 0) and finished == [0]
@@ -0,0 +1,64 @@
+import argparse
+import json
+from pathlib import Path
+
+import pytest
+
+import benchmark
+
+SMALL = dict(seed=7, xlsx_rows=20, xlsx_cols=3, xlsx_sheets=2, docx_paragraphs=5, pptx_slides=2, pdf_pages=2,
+             csv_rows=30, csv_cols=4)
+
+
+def _small_args(argv):
+    return argv + [f"--{key.replace('_', '-')}={value}" for key, value in SMALL.items()]
+
+
+def test_corpus_is_reproducible_and_reused(tmp_path):
+    first = benchmark.generate_corpus(tmp_path / "a", argparse.Namespace(**SMALL))
+    second = benchmark.generate_corpus(tmp_path / "b", argparse.Namespace(**SMALL))
+    assert sorted(first) == ["csv", "docx", "pdf", "pptx", "xlsx"]
+    with open(first["csv"], 'rb') as f, open(second["csv"], 'rb') as g:
+        assert f.read() == g.read()
+
+    mtimes = {name: Path(path).stat().st_mtime_ns for name, path in first.items()}
+    again = benchmark.generate_corpus(tmp_path / "a", argparse.Namespace(**SMALL))
+    assert again == first
+    assert {name: Path(path).stat().st_mtime_ns for name, path in again.items()} == mtimes
+
+
+def test_compare_flags_regressions(capsys):
+    baseline = {"cases": {"csv": {"wall_seconds": 1.0, "peak_rss_bytes": 100},
+                          "pdf": {"wall_seconds": 1.0, "peak_rss_bytes": 100}}}
+    results = {"cases": {"csv": {"wall_seconds": 1.05, "peak_rss_bytes": 150},
+                         "pdf": {"wall_seconds": 2.0, "peak_rss_bytes": None},
+                         "docx": {"wall_seconds": 9.0, "peak_rss_bytes": 1}}}
+    assert benchmark.compare(results, baseline, 0.10) == ["csv.peak_rss_bytes", "pdf.wall_seconds"]
+
+
+@pytest.mark.parametrize("name", ["csv", "xlsx_lxml"])
+def test_main_measures_cases(tmp_path, name):
+    output = tmp_path / "results.json"
+    argv = _small_args(["--corpus-dir", str(tmp_path / "corpus"), "-o", str(output), "--repeat", "1",
+                        "--only", name])
+    assert benchmark.main(argv) == 0
+    results = json.loads(output.read_text(encoding='utf-8'))
+    case = results["cases"][name]
+    assert "error" not in case and case["output_chars"] > 0 and case["input_bytes"] > 0
+    assert list(results["cases"]) == [name]
+
+    baseline = tmp_path / "baseline.json"
+    baseline.write_text(json.dumps({"cases": {name: dict(case, wall_seconds=case["wall_seconds"] / 100)}}),
+                        encoding='utf-8')
+    assert benchmark.main(argv + ["--baseline", str(baseline)]) == 1
+
+
+def test_status_without_peak_memory(tmp_path, monkeypatch, capsys):
+    # 平台不提供峰值内存时仍显示耗时
+    monkeypatch.setattr(benchmark, "measure", lambda source, repeat, excel_engine=None: {
+        "wall_seconds": 0.5, "cpu_seconds": 0.25, "peak_rss_bytes": None, "output_chars": 1})
+    argv = _small_args(["--corpus-dir", str(tmp_path / "corpus"), "-o", str(tmp_path / "results.json"),
+                        "--repeat", "1", "--only", "csv"])
+    assert benchmark.main(argv) == 0
+    err = capsys.readouterr().err
+    assert "墙钟" in err and "峰值内存" not in err
@@ -0,0 +1,132 @@
+import json
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import converter
+from converter import MarkdownChunker, _chunk_output_path, convert_source_to_chunks
+
+
+def _chunk(text, chunk_chars, pieces=None):
+    chunks = []
+    chunker = MarkdownChunker(chunks.append, chunk_chars)
+    if pieces is None:
+        chunker.write(text)
+    else:
+        for start in range(0, len(text), pieces):
+            chunker.write(text[start:start + pieces])
+    chunker.close()
+    return chunks
+
+
+def _table(rows):
+    return "| 编号 | 名称 |\n| --- | --- |\n" + "".join(f"| {i} | 行{i} |\n" for i in range(rows))
+
+
+def test_splits_at_headings_and_blank_lines():
+    text = "".join(f"## 第{i}节\n\n" + "正文内容。" * 10 + "\n\n" for i in range(6))
+    chunks = _chunk(text, 150)
+    assert len(chunks) > 1
+    assert [chunk['index'] for chunk in chunks] == list(range(1, len(chunks) + 1))
+    for chunk in chunks:
+        assert chunk['text'].startswith("## ")
+        assert chunk['chars'] == len(chunk['text']) <= 150
+    assert "".join(chunk['text'] for chunk in chunks).replace("\n", "") == text.replace("\n", "")
+
+
+def test_fragmented_writes_match_single_write():
+    text = "# 总标题\n\n" + _table(40) + "\n```\ncode\n\nmore\n```\n\n## 结尾\n\n文字\n"
+    assert _chunk(text, 120, pieces=7) == _chunk(text, 120)
+
+
+def test_table_header_is_repeated():
+    chunks = _chunk("# 表\n\n" + _table(50), 200)
+    assert len(chunks) > 2
+    for chunk in chunks[1:]:
+        assert chunk['text'].startswith("| 编号 | 名称 |\n| --- | --- |\n| ")
+        assert chunk['headings'] == ["表"]
+    rows = [line for chunk in chunks for line in chunk['text'].splitlines() if line.startswith("| ") and "行" in line]
+    assert rows == [f"| {i} | 行{i} |" for i in range(50)]
+
+
+def test_code_fence_is_not_split():
+    code = "```python\n" + "".join(f"x = {i}\n\n" for i in range(30)) + "```\n"
+    chunks = _chunk("前言\n\n" + code + "\n后记\n", 40)
+    assert sum(code in chunk['text'] for chunk in chunks) == 1
+    assert chunks[-1]['text'] == "后记\n"
+
+
+def test_headings_track_nesting():
+    text = "# A\n\n## B\n\n" + "b" * 50 + "\n\n### C\n\n" + "c" * 50 + "\n\n## D\n\n" + "d" * 50 + "\n"
+    chunks = _chunk(text, 60)
+    # 标题不会单独留在块末尾
+    assert [chunk['text'].split("\n")[0] for chunk in chunks] == ["# A", "### C", "## D"]
+    assert [chunk['headings'] for chunk in chunks] == [["A"], ["A", "B", "C"], ["A", "D"]]
+
+
+def test_long_line_is_kept_whole():
+    chunks = _chunk("短\n\n" + "长" * 500 + "\n\n尾\n", 100)
+    assert [chunk['chars'] for chunk in chunks] == [2, 501, 2]
+
+
+def test_sheet_separators_are_trimmed():
+    chunks = _chunk("# S1\n\nx\n\n---\n\n# S2\n\ny\n", 10)
+    assert [chunk['text'] for chunk in chunks] == ["# S1\n\nx\n", "# S2\n\ny\n"]
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "数据"
+    wb.active.append(["编号", "名称"])
+    for i in range(200):
+        wb.active.append([i, f"名称{i}"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_jsonl_output(workbook, tmp_path):
+    output = str(tmp_path / "out" / "book.md")
+    os.makedirs(os.path.dirname(output))
+    result = convert_source_to_chunks(None, workbook, output, 'jsonl', 500, excel_file=workbook,
+                                      selected_sheets=["数据"], sheet_cache=False)
+    assert result['output_path'] == _chunk_output_path(output, 'jsonl') == str(tmp_path / "out" / "book.jsonl")
+    with open(result['output_path'], encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    assert len(records) == result['chunks'] > 1
+    assert all(record['source'] == workbook and record['headings'] == ["数据"] for record in records)
+    assert result['preview'].startswith("# 数据")
+
+
+def test_files_output_replaces_previous_chunks(workbook, tmp_path):
+    output = str(tmp_path / "book.md")
+    directory = _chunk_output_path(output, 'files')
+    os.makedirs(directory)
+    for name in ("9999.md", "notes.txt"):
+        with open(os.path.join(directory, name), 'w') as f:
+            f.write("old")
+    result = convert_source_to_chunks(None, workbook, output, 'files', 500, excel_file=workbook,
+                                      selected_sheets=["数据"], sheet_cache=False)
+    names = sorted(os.listdir(directory))
+    assert names == [f"{i:04d}.md" for i in range(1, result['chunks'] + 1)] + ["notes.txt"]
+
+
+@pytest.mark.parametrize("chunk_format", ["files", "jsonl"])
+def test_failure_removes_chunks(workbook, tmp_path, monkeypatch, chunk_format):
+    def fail(filename, sheets, sink=None, **kwargs):
+        sink.write("# 数据\n\n" + "x\n\n" * 500)
+        raise RuntimeError("中途失败")
+
+    monkeypatch.setattr(converter, "_convert_excel_sheets", fail)
+    output = str(tmp_path / "book.md")
+    with pytest.raises(RuntimeError):
+        convert_source_to_chunks(None, workbook, output, chunk_format, 100, excel_file=workbook,
+                                 selected_sheets=["数据"])
+    assert not os.path.exists(_chunk_output_path(output, chunk_format))
+
+
+def test_unknown_format(tmp_path):
+    with pytest.raises(ValueError):
+        convert_source_to_chunks(None, "a.txt", str(tmp_path / "a.md"), 'xml')
@@ -0,0 +1,94 @@
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+from openpyxl import Workbook
+
+import converter
+from cli import run_cli
+
+
+@pytest.fixture(autouse=True)
+def keep_engine(monkeypatch):
+    # run_cli 会修改 EXCEL_ENGINE 和对应的环境变量
+    monkeypatch.setattr(converter, "EXCEL_ENGINE", converter.EXCEL_ENGINE)
+    monkeypatch.setenv("MARKITDOWN_EXCEL_ENGINE", converter.EXCEL_ENGINE)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    source = tmp_path / "in"
+    source.mkdir()
+    for name, sheets in (("a", ["一", "二"]), ("b", ["一"])):
+        wb = Workbook()
+        wb.remove(wb.active)
+        for sheet in sheets:
+            ws = wb.create_sheet(sheet)
+            ws.append(["列", "值"])
+            for row in range(30):
+                ws.append([row, f"{name}{sheet}{row}"])
+        wb.save(source / f"{name}.xlsx")
+    return source
+
+
+def test_convert_folder_with_summary(folder, tmp_path, capsys):
+    out = tmp_path / "out"
+    summary = tmp_path / "summary.json"
+    code = run_cli(["convert", str(folder), "-o", str(out), "-j", "1", "--sheets", "一", "--max-rows", "5",
+                    "--summary", str(summary)])
+    assert code == 0
+    data = json.loads(summary.read_text(encoding='utf-8'))
+    assert (data['total'], data['succeeded'], data['failed']) == (2, 2, 0)
+    markdown = (out / "a.md").read_text(encoding='utf-8')
+    assert "# 一" in markdown and "# 二" not in markdown
+    assert "a一4" in markdown and "a一5" not in markdown
+    assert "完成: 成功 2，失败 0" in capsys.readouterr().err
+
+
+def test_summary_to_stdout_and_failure_exit_code(folder, tmp_path, capsys):
+    (folder / "broken.xlsx").write_bytes(b"PK\x03\x04 broken")
+    code = run_cli(["convert", str(folder), "-o", str(tmp_path / "out"), "-j", "1", "--summary", "-"])
+    assert code == 1
+    data = json.loads(capsys.readouterr().out)
+    failed = [item for item in data['files'] if not item['success']]
+    assert [item['source'] for item in failed] == [str(folder / "broken.xlsx")]
+    assert failed[0]['output'] is None and failed[0]['error']
+
+
+def test_chunked_output(folder, tmp_path):
+    out = tmp_path / "out"
+    assert run_cli(["convert", str(folder / "b.xlsx"), "-o", str(out), "-j", "1",
+                    "--chunks", "jsonl", "--chunk-chars", "200"]) == 0
+    records = [json.loads(line) for line in (out / "b.jsonl").read_text(encoding='utf-8').splitlines()]
+    assert len(records) > 1 and records[0]['headings'] == ["一"]
+
+
+def test_no_inputs(tmp_path, capsys):
+    assert run_cli(["convert", str(tmp_path / "missing.pdf")]) == 2
+    err = capsys.readouterr().err
+    assert "找不到" in err and "没有找到支持的文件" in err
+
+
+def test_invalid_options(folder, capsys):
+    assert run_cli(["convert", str(folder), "--range", "B2:"]) == 2
+    assert run_cli(["convert", str(folder), "--pages", "5-1"]) == 2
+    with pytest.raises(SystemExit) as exc:
+        run_cli(["convert", str(folder), "--excel-engine", "xlrd"])
+    assert exc.value.code == 2
+
+
+@pytest.mark.parametrize("script", ["markitdown_ui.py", "cli.py"])
+def test_subcommands_run_without_qt(script, folder, tmp_path):
+    # 导入 PySide6 即失败，模拟没有图形环境的服务器
+    fake = tmp_path / "fake" / "PySide6"
+    fake.mkdir(parents=True)
+    (fake / "__init__.py").write_text("raise ImportError('no Qt here')\n", encoding='utf-8')
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ, PYTHONPATH=str(tmp_path / "fake"))
+    result = subprocess.run([sys.executable, os.path.join(root, script), "convert", str(folder / "b.xlsx"),
+                             "-o", str(tmp_path / "out"), "-j", "1"],
+                            env=env, capture_output=True, text=True, encoding='utf-8', timeout=120)
+    assert result.returncode == 0, result.stderr
+    assert "b一29" in (tmp_path / "out" / "b.md").read_text(encoding='utf-8')
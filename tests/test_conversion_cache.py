@@ -0,0 +1,107 @@
+import json
+
+import pytest
+
+from converter import ConversionCache
+
+
+@pytest.fixture
+def cache(tmp_path):
+    cache = ConversionCache(tmp_path / "cache")
+    cache.max_bytes = 10
+    return cache
+
+
+def _index(cache):
+    with open(cache.cache_dir / ConversionCache.INDEX_NAME, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_evicts_least_recently_used(cache):
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    assert cache.get("a") == "aaaa"  # a 变为最近使用
+    cache.put("c", "cccc")
+    assert cache.get("b") is None
+    assert cache.get("a") == "aaaa" and cache.get("c") == "cccc"
+    assert not (cache.cache_dir / "b.md").exists()
+    assert [key for key, _ in _index(cache)['entries']] == ["a", "c"]
+
+
+def test_oversized_entry_is_not_stored(cache):
+    cache.put("big", "x" * 11)
+    assert cache.get("big") is None
+    assert cache.stats()['entries'] == 0
+
+
+def test_set_max_bytes_evicts(cache):
+    for key in "abc":
+        cache.put(key, key * 3)
+    cache.set_max_bytes(6)
+    assert cache.get("a") is None
+    assert cache.stats()['total_bytes'] == 6
+
+
+def test_reads_do_not_rewrite_index(cache, monkeypatch):
+    cache.put("a", "aaaa")
+    saves = []
+    original = cache._save_index
+    monkeypatch.setattr(cache, "_save_index", lambda: (saves.append(1), original()))
+    for _ in range(50):
+        cache.get("a")
+        cache.get("missing")
+    assert saves == []
+    assert cache.stats()['hits'] == 50 and cache.stats()['misses'] == 50
+
+    cache.close()
+    assert saves == [1]
+    cache.close()
+    assert saves == [1]
+
+
+def test_reads_are_saved_after_interval(cache, monkeypatch):
+    cache.put("a", "aaaa")
+    monkeypatch.setattr(ConversionCache, "INDEX_SAVE_INTERVAL", 0)
+    cache.get("a")
+    assert _index(cache)['hits'] == 1
+
+
+def test_order_and_stats_survive_reopen(cache, tmp_path):
+    cache.put("a", "aaaa")
+    cache.put("b", "bbbb")
+    cache.get("a")
+    cache.get("x")
+    cache.close()
+
+    reopened = ConversionCache(tmp_path / "cache")
+    assert reopened.stats()['hits'] == 1 and reopened.stats()['misses'] == 1
+    assert list(reopened._entries) == ["b", "a"]
+    reopened.put("c", "cccc")
+    assert reopened.get("b") is None and reopened.get("a") == "aaaa"
+
+
+def test_content_hash_and_key(cache, tmp_path):
+    source = tmp_path / "doc.txt"
+    source.write_text("内容", encoding='utf-8')
+    digest = cache.content_hash(str(source))
+    assert cache.content_hash(str(source)) == digest
+    assert cache.make_key(str(source), sheets=None) == cache.make_key(str(source), sheets=None)
+    assert cache.make_key(str(source), sheets=["a"]) != cache.make_key(str(source), sheets=None)
+    cache.close()
+    assert len(_index(cache)['hash_memo']) == 1
+
+
+def test_put_file(cache, tmp_path):
+    source = tmp_path / "out.md"
+    source.write_text("# 结果", encoding='utf-8')
+    cache.put_file("k", str(source))
+    assert cache.get_path("k").read_text(encoding='utf-8') == "# 结果"
+
+
+def test_clear(cache):
+    cache.put("a", "aaaa")
+    cache.get("a")
+    cache.clear()
+    assert cache.stats() == {'hits': 0, 'misses': 0, 'bytes_saved': 0, 'entries': 0, 'total_bytes': 0,
+                             'max_bytes': 10}
+    assert not (cache.cache_dir / "a.md").exists()
@@ -0,0 +1,75 @@
+import os
+import threading
+
+import pytest
+from openpyxl import Workbook
+
+from converter import ConversionCancelled, ConversionProcess, ConversionProcessError, ConversionTimeout, Tracer
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "表"
+    wb.active.append(["a", "b"])
+    wb.active.append([1, 2])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def process():
+    process = ConversionProcess(max_jobs=0, max_rss=0)
+    yield process
+    process.shutdown()
+
+
+@pytest.fixture
+def blocking_source(tmp_path):
+    """读取时一直阻塞的文件（没有写入方的命名管道）"""
+    if not hasattr(os, 'mkfifo'):
+        pytest.skip("需要命名管道")
+    path = tmp_path / "stuck.txt"
+    os.mkfifo(path)
+    return str(path)
+
+
+def _convert(process, workbook, **kwargs):
+    return process.convert(source=workbook, excel_file=workbook, selected_sheets=["表"], sheet_cache=False,
+                           **kwargs)
+
+
+def test_converts_in_child_process(process, workbook):
+    tracer = Tracer()
+    markdown = _convert(process, workbook, tracer=tracer)
+    assert markdown.startswith("# 表\n\n| a | b |")
+    assert process.is_running() and process.stats()['pid'] != os.getpid()
+    assert any(span['name'] == 'excel.convert' for span in tracer.spans)
+
+
+def test_errors_are_reported(process, tmp_path):
+    with pytest.raises(ConversionProcessError):
+        process.convert(source=str(tmp_path / "missing.docx"))
+    assert process.is_running()
+
+
+def test_timeout_kills_and_restarts(process, workbook, blocking_source):
+    _convert(process, workbook)
+    pid = process.stats()['pid']
+    with pytest.raises(ConversionTimeout):
+        process.convert(timeout=1, source=blocking_source)
+    assert not process.is_running()
+    assert _convert(process, workbook).startswith("# 表")
+    assert process.stats()['pid'] != pid
+
+
+def test_cancel(process, blocking_source):
+    process.warm_up()
+    cancel = threading.Event()
+    threading.Timer(0.5, cancel.set).start()
+    with pytest.raises(ConversionCancelled):
+        process.convert(cancel_event=cancel, source=blocking_source)
+    assert not process.is_running()
+    with pytest.raises(ConversionCancelled):
+        process.convert(cancel_event=cancel, source=blocking_source)
@@ -0,0 +1,203 @@
+import http.client
+import json
+import os
+import socket
+import threading
+import time
+
+import pytest
+from openpyxl import Workbook
+
+import daemon
+from daemon import ThreadingHTTPServer, _ConversionRequestHandler
+
+
+class FakePool:
+    def __init__(self):
+        self.calls = []
+
+    def convert(self, timeout=None, **kwargs):
+        self.calls.append(dict(kwargs, timeout=timeout))
+        return "# ok\n"
+
+    def stats(self):
+        return {'queued': 0, 'active': 0, 'completed': len(self.calls), 'failed': 0, 'workers': []}
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _ConversionRequestHandler)
+    server.pool = FakePool()
+    server.jobs = daemon._JobRegistry()
+    server.verbose = False
+    thread = threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def _post(server, body, path="/convert", content_type="application/json"):
+    conn = http.client.HTTPConnection(*server.server_address, timeout=10)
+    if not isinstance(body, bytes):
+        body = json.dumps(body).encode('utf-8')
+    conn.request("POST", path, body=body, headers={"Content-Type": content_type})
+    response = conn.getresponse()
+    return response.status, response.read().decode('utf-8')
+
+
+@pytest.fixture
+def workbook_path(tmp_path):
+    wb = Workbook()
+    wb.active.title = "第一"
+    wb.active.append(["a", "b"])
+    wb.create_sheet("第二").append([1, 2])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return path
+
+
+@pytest.mark.parametrize("body", [
+    [1],
+    "path",
+    {},
+    {"path": 5},
+    {"path": "x.txt", "limits": {"max_rows": "abc"}},
+    {"path": "x.txt", "limits": {"max_rows": -1}},
+    {"path": "x.txt", "limits": {"bogus": 1}},
+    {"path": "x.txt", "limits": [1]},
+    {"path": "x.txt", "sheets": "第一"},
+    {"path": "x.txt", "timeout": "soon"},
+    {"path": "x.txt", "timeout": 0},
+    {"path": "x.txt", "pages": [1]},
+    {"path": "x.txt", "pages": "3-1"},
+    {"path": "x.txt", "job": 5},
+])
+def test_invalid_json_request_is_400(server, body):
+    status, text = _post(server, body)
+    assert status == 400, text
+    assert "无效的请求" in json.loads(text)["error"]
+    assert server.pool.calls == []
+
+
+def test_malformed_json_is_400(server):
+    status, _ = _post(server, b"{not json")
+    assert status == 400
+
+
+def test_invalid_content_length_is_400(server):
+    with socket.create_connection(server.server_address, timeout=10) as sock:
+        sock.sendall(b"POST /convert HTTP/1.1\r\nHost: x\r\nContent-Type: application/json\r\n"
+                     b"Content-Length: abc\r\n\r\n")
+        reply = sock.makefile('rb').readline()
+    assert b" 400 " in reply
+
+
+def test_invalid_upload_query_is_400(server):
+    status, _ = _post(server, b"data", path="/convert?filename=a.txt&max_rows=abc",
+                      content_type="application/octet-stream")
+    assert status == 400
+    assert server.pool.calls == []
+
+
+def test_upload_is_converted_from_temp_file(server):
+    status, text = _post(server, "正文".encode('utf-8'), path="/convert?filename=notes.txt&timeout=2",
+                         content_type="text/plain")
+    assert status == 200 and text == "# ok\n"
+    call, = server.pool.calls
+    assert call['source'].endswith(".txt") and call['timeout'] == 2
+    # 临时文件在响应发出后删除
+    deadline = time.monotonic() + 5
+    while os.path.exists(call['source']) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(call['source'])
+
+
+def test_missing_file_is_404(server, tmp_path):
+    status, _ = _post(server, {"path": str(tmp_path / "missing.txt")})
+    assert status == 404
+
+
+def test_local_workbook_lists_sheets(server, workbook_path):
+    status, text = _post(server, {"path": str(workbook_path), "limits": {"max_rows": 5}, "timeout": 3})
+    assert status == 200 and text == "# ok\n"
+    call, = server.pool.calls
+    assert call['excel_file'] == str(workbook_path)
+    assert call['selected_sheets'] == ["第一", "第二"]
+    assert call['limits'] == {'max_rows': 5}
+    assert call['timeout'] == 3
+
+
+def test_remote_workbook_is_downloaded_first(server, workbook_path, monkeypatch):
+    fetched = []
+
+    class FakeFetcher:
+        def fetch(self, url, progress=None, max_age=0):
+            fetched.append(url)
+            return {'url': url, 'headers': {}, 'body_path': str(workbook_path),
+                    'size': workbook_path.stat().st_size, 'status': 200}
+
+    monkeypatch.setattr(daemon, "_get_url_fetcher", lambda: FakeFetcher())
+    status, text = _post(server, {"path": "https://example.com/files/book.xlsx?v=1"})
+    assert status == 200, text
+    assert fetched == ["https://example.com/files/book.xlsx?v=1"]
+    call, = server.pool.calls
+    assert call['source'].endswith(".xlsx") and call['source'] == call['excel_file']
+    assert call['selected_sheets'] == ["第一", "第二"]
+    # 下载的临时副本在响应发出后删除
+    deadline = time.monotonic() + 5
+    while os.path.exists(call['source']) and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not os.path.exists(call['source'])
+
+
+def test_remote_non_workbook_is_passed_through(server, monkeypatch):
+    monkeypatch.setattr(daemon, "_get_url_fetcher", lambda: pytest.fail("不应下载"))
+    status, _ = _post(server, {"path": "https://example.com/page.html"})
+    assert status == 200
+    assert server.pool.calls[0]['source'] == "https://example.com/page.html"
+
+
+@pytest.fixture
+def blocking_pool(server):
+    """转换一直进行到取消事件被设置"""
+    started = threading.Event()
+    cancelled = threading.Event()
+
+    def convert(timeout=None, cancel_event=None, **kwargs):
+        started.set()
+        if not cancel_event.wait(10):
+            return "# 未取消\n"
+        cancelled.set()
+        raise daemon.ConversionCancelled("转换已取消")
+
+    server.pool.convert = convert
+    return started, cancelled
+
+
+def test_cancel_endpoint_stops_job(server, blocking_pool, tmp_path):
+    started, cancelled = blocking_pool
+    source = tmp_path / "a.txt"
+    source.write_text("x", encoding='utf-8')
+    result = []
+    thread = threading.Thread(target=lambda: result.append(_post(server, {"path": str(source), "job": "j1"})))
+    thread.start()
+    assert started.wait(5)
+    assert _post(server, {"job": "j1"}, path="/cancel")[0] == 200
+    thread.join(5)
+    assert cancelled.is_set() and result[0][0] == 409
+    # 任务结束后取消登记
+    assert _post(server, {"job": "j1"}, path="/cancel")[0] == 404
+    assert _post(server, {}, path="/cancel")[0] == 400
+
+
+def test_client_cancel_stops_server_job(server, blocking_pool, tmp_path):
+    started, cancelled = blocking_pool
+    source = tmp_path / "a.txt"
+    source.write_text("x", encoding='utf-8')
+    client = daemon.DaemonClient("http://%s:%d" % server.server_address)
+    cancel_event = threading.Event()
+    threading.Thread(target=lambda: started.wait(5) and cancel_event.set(), daemon=True).start()
+    with pytest.raises(daemon.ConversionCancelled):
+        client.convert(timeout=30, cancel_event=cancel_event, source=str(source))
+    assert cancelled.wait(5)
@@ -0,0 +1,113 @@
+import json
+import os
+import shutil
+
+import pytest
+from openpyxl import Workbook
+
+from converter import _BatchDeduper, _dedupe_summary, _plan_batch_jobs, _run_batch
+
+
+def _workbook(path, value):
+    wb = Workbook()
+    wb.active.title = "表"
+    wb.active.append(["值"])
+    wb.active.append([value])
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def inputs(tmp_path):
+    """a.xlsx 与 c.xlsx 内容相同，b.xlsx 不同"""
+    source = tmp_path / "in"
+    source.mkdir()
+    a = _workbook(source / "a.xlsx", "甲")
+    b = _workbook(source / "b.xlsx", "乙")
+    c = str(source / "c.xlsx")
+    shutil.copyfile(a, c)
+    return [a, b, c]
+
+
+def _run(jobs, max_workers=1, **kwargs):
+    results, duplicates, stats = {}, [], {}
+    counts = _run_batch(jobs, max_workers, on_finished=lambda index, *result: results.setdefault(index, result),
+                        on_duplicate=lambda index, primary: duplicates.append((index, primary)), stats=stats,
+                        **kwargs)
+    return counts, results, duplicates, stats
+
+
+@pytest.mark.parametrize("max_workers", [1, 2])
+def test_identical_files_are_converted_once(inputs, tmp_path, max_workers):
+    jobs = _plan_batch_jobs(inputs, str(tmp_path / "out"))
+    counts, results, duplicates, stats = _run(jobs, max_workers)
+    assert counts == (3, 0)
+    assert duplicates == [(2, 0)]
+    assert stats['duplicates'] == 1 and stats['saved_bytes'] == os.path.getsize(inputs[2])
+    with open(jobs[0][2], encoding='utf-8') as f, open(jobs[2][2], encoding='utf-8') as g:
+        assert f.read() == g.read()
+    assert results[2][1] == jobs[2][2]
+    assert "1 个文件与其他文件内容相同" in _dedupe_summary(stats)
+
+
+def test_dedupe_can_be_disabled(inputs, tmp_path):
+    counts, _, duplicates, stats = _run(_plan_batch_jobs(inputs, str(tmp_path / "out")), dedupe=False)
+    assert counts == (3, 0) and duplicates == [] and stats == {}
+
+
+def test_different_sheet_selection_is_not_a_duplicate(inputs, tmp_path):
+    jobs = _plan_batch_jobs(inputs, str(tmp_path / "out"))
+    jobs[2] = jobs[2][:3] + (["表"],)
+    _, _, duplicates, _ = _run(jobs)
+    assert duplicates == []
+
+
+def test_failure_propagates_to_duplicates(tmp_path):
+    broken = tmp_path / "x.xlsx"
+    broken.write_bytes(b"PK\x03\x04 not a workbook")
+    copy = tmp_path / "y.xlsx"
+    shutil.copyfile(broken, copy)
+    counts, results, duplicates, _ = _run(_plan_batch_jobs([str(broken), str(copy)], str(tmp_path / "out")))
+    assert counts == (0, 2)
+    assert duplicates == [(1, 0)]
+    assert results[1][1] == results[0][1]
+
+
+@pytest.mark.parametrize("chunk_format", ["files", "jsonl"])
+def test_chunk_output_is_copied(inputs, tmp_path, chunk_format):
+    jobs = _plan_batch_jobs(inputs, str(tmp_path / "out"))
+    _, results, _, _ = _run(jobs, chunks=(chunk_format, 100))
+    primary, duplicate = results[0][1], results[2][1]
+    if chunk_format == 'files':
+        assert os.listdir(primary) == os.listdir(duplicate) == ["0001.md"]
+    else:
+        with open(primary, encoding='utf-8') as f, open(duplicate, encoding='utf-8') as g:
+            first, second = [json.loads(line) for line in f], [json.loads(line) for line in g]
+        assert [record['source'] for record in second] == [inputs[2]]
+        assert [dict(record, source=None) for record in first] == [dict(record, source=None) for record in second]
+
+
+def test_deduper_waits_for_primary(inputs, tmp_path):
+    reports = []
+    jobs = _plan_batch_jobs(inputs, str(tmp_path / "out"))
+    deduper = _BatchDeduper(jobs, lambda *result: reports.append(result))
+    try:
+        assert not deduper.defer(jobs[0])
+        assert not deduper.defer(jobs[1])
+        assert deduper.defer(jobs[2])
+        assert reports == []
+        deduper.finished(0, False, "失败原因", 1.0)
+        assert reports == [(2, False, "失败原因", 0.0)]
+        assert deduper.stats() == {'duplicates': 0, 'saved_bytes': 0, 'saved_seconds': 0.0}
+    finally:
+        deduper.close()
+
+
+def test_urls_are_not_hashed(tmp_path):
+    jobs = [(0, "https://example.com/a", str(tmp_path / "a.md"), None),
+            (1, "https://example.com/a", str(tmp_path / "b.md"), None)]
+    deduper = _BatchDeduper(jobs, lambda *result: None)
+    try:
+        assert not deduper.defer(jobs[0]) and not deduper.defer(jobs[1])
+    finally:
+        deduper.close()
@@ -0,0 +1,120 @@
+"""Excel sheet 流式转换为 Markdown"""
+import io
+
+import pytest
+from openpyxl import Workbook
+
+import converter
+
+
+class FakeSheet:
+    """按给定的行返回值的 sheet，fail_at 行处抛出异常"""
+
+    def __init__(self, rows, fail_at=None):
+        self.rows = rows
+        self.fail_at = fail_at
+        self.max_row = len(rows)
+        self.max_column = max((len(row) for row in rows), default=1)
+
+    def iter_rows(self, min_row=None, max_row=None, min_col=None, max_col=None, values_only=True):
+        for index, row in enumerate(self.rows):
+            if index == self.fail_at:
+                raise ValueError("坏数据")
+            yield row
+
+
+class FakeWorkbook(dict):
+    def close(self):
+        pass
+
+
+def _convert(monkeypatch, sheets):
+    monkeypatch.setattr(converter, "_open_workbook", lambda filename, engine=None: FakeWorkbook(sheets))
+    out = io.StringIO()
+    converter._convert_excel_sheets_sequential("book.xlsx", list(sheets), out, converter.Tracer())
+    return out.getvalue()
+
+
+def test_sheet_markdown_pads_rows_to_widest_row():
+    text = converter._worksheet_to_markdown(FakeSheet([("a", "b"), (1, None, 3), (None, None)]), "S")
+    assert text == ("# S\n\n"
+                    "| a | b |  |\n"
+                    "| --- | --- | --- |\n"
+                    "| 1 |  | 3 |\n")
+
+
+def test_rows_are_padded_to_header_width():
+    text = converter._worksheet_to_markdown(FakeSheet([("a", "b"), (1,), (None, None), ("x", "y")]), "S")
+    assert text == "# S\n\n| a | b |\n| --- | --- |\n| 1 |  |\n| x | y |\n"
+
+
+def test_rows_after_width_probe_are_streamed(monkeypatch):
+    monkeypatch.setattr(converter, "SHEET_WIDTH_PROBE_ROWS", 2)
+    lines = converter._iter_sheet_markdown(FakeSheet([("a",), (1,), (2,), (3,)], fail_at=3), "S")
+    # 读到出错的行之前，已读的行都已输出
+    output = []
+    with pytest.raises(ValueError):
+        for line in lines:
+            output.append(line)
+    assert "".join(output) == "# S\n\n| a |\n| --- |\n| 1 |\n| 2 |\n"
+
+
+def test_wider_rows_after_width_probe_are_kept(monkeypatch):
+    monkeypatch.setattr(converter, "SHEET_WIDTH_PROBE_ROWS", 2)
+    stats = {}
+    text = "".join(converter._iter_sheet_markdown(FakeSheet([("a", "b"), (1,), ("x", "y", "z"), (2,)]), "S",
+                                                  stats))
+    assert text == "# S\n\n| a | b |\n| --- | --- |\n| 1 |  |\n| x | y | z |\n| 2 |  |\n"
+    assert stats['rows'] == 4 and stats['columns'] == 3
+
+
+def test_empty_sheet():
+    assert converter._worksheet_to_markdown(FakeSheet([(None,)]), "S") == "# S\n\n此 Sheet 为空\n"
+
+
+def test_sheets_are_written_to_sink(tmp_path):
+    wb = Workbook()
+    wb.active.title = "A"
+    wb.active.append(["a"])
+    wb.active.append([1])
+    wb.create_sheet("B").append(["b", "c"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    out = io.StringIO()
+    assert converter._convert_excel_sheets(str(path), ["A", "B"], sink=out) is None
+    assert out.getvalue() == "# A\n\n| a |\n| --- |\n| 1 |\n\n\n---\n\n# B\n\n| b | c |\n| --- | --- |\n"
+
+
+def test_failing_sheet_is_replaced_by_one_error_block(monkeypatch):
+    text = _convert(monkeypatch, {"Good": FakeSheet([("a",), (1,)]),
+                                  "Bad": FakeSheet([("a",), (1,)], fail_at=1)})
+    good, bad = text.split("\n\n---\n\n")
+    assert good.startswith("# Good\n")
+    # 标题已经写出，错误说明接在后面，不再出现第二个标题
+    assert bad.count("# Bad") == 1
+    assert "以上内容不完整 - 坏数据" in bad
+
+
+def test_missing_sheet_gets_error_block(monkeypatch):
+    monkeypatch.setattr(converter, "_open_workbook", lambda filename, engine=None: FakeWorkbook())
+    out = io.StringIO()
+    converter._convert_excel_sheets_sequential("book.xlsx", ["Nope"], out, converter.Tracer())
+    assert out.getvalue().startswith("# Nope\n\n**错误**: 无法转换此 Sheet")
+
+
+def test_incomplete_sheet_is_not_cached(monkeypatch):
+    cached = {}
+    monkeypatch.setattr(converter, "_open_workbook",
+                        lambda filename, engine=None: FakeWorkbook(Bad=FakeSheet([("a",), (1,)], fail_at=1)))
+    converter._convert_excel_sheets_sequential("book.xlsx", ["Bad"], io.StringIO(), converter.Tracer(),
+                                               on_sheet=cached.__setitem__)
+    assert cached == {}
+
+
+@pytest.mark.parametrize("fail_at", [0, 1, 2])
+def test_write_sheet_raises_incomplete_after_partial_output(fail_at):
+    out = io.StringIO()
+    with pytest.raises(converter._SheetIncomplete):
+        converter._write_sheet_markdown(FakeSheet([("a",), (1,), (2,)], fail_at=fail_at), "S", out)
+    assert out.getvalue().count("# S") == 1
+    assert converter._sheet_error_markdown("S", converter._SheetIncomplete("x")) == ""
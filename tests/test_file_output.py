@@ -0,0 +1,71 @@
+import os
+
+import pytest
+from openpyxl import Workbook
+
+import converter
+from converter import _atomic_output, _partial_path, convert_source_to_file
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "数据"
+    wb.active.append(["编号", "内容"])
+    for row in range(500):
+        wb.active.append([row, "文本" * 10])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_writes_file_with_bounded_preview(workbook, tmp_path):
+    output = str(tmp_path / "book.md")
+    result = convert_source_to_file(None, workbook, output, workbook, ["数据"], max_workers=1,
+                                    preview_chars=100, sheet_cache=False)
+    with open(output, encoding='utf-8') as f:
+        text = f.read()
+    assert result == {'output_path': output, 'preview': text[:100], 'size': os.path.getsize(output)}
+    assert text == converter._convert_excel_sheets(workbook, ["数据"], max_workers=1, sheet_cache=False)
+    assert not os.path.exists(_partial_path(output))
+
+
+def test_failure_keeps_previous_output(workbook, tmp_path, monkeypatch):
+    output = tmp_path / "book.md"
+    output.write_text("旧结果", encoding='utf-8')
+
+    def fail(filename, sheets, sink=None, **kwargs):
+        sink.write("# 数据\n\n部分内容")
+        raise RuntimeError("中途失败")
+
+    monkeypatch.setattr(converter, "_convert_excel_sheets", fail)
+    with pytest.raises(RuntimeError):
+        convert_source_to_file(None, workbook, str(output), workbook, ["数据"])
+    assert output.read_text(encoding='utf-8') == "旧结果"
+    assert not os.path.exists(_partial_path(str(output)))
+
+
+def test_other_formats_use_markitdown(tmp_path):
+    class FakeMarkItDown:
+        def convert(self, source):
+            return type("Result", (), {'markdown': f"# {os.path.basename(source)}\n"})()
+
+        def convert_local(self, source):
+            return self.convert(source), 'signature'
+
+    source = tmp_path / "notes.txt"
+    source.write_text("x", encoding='utf-8')
+    output = str(tmp_path / "notes.md")
+    result = convert_source_to_file(FakeMarkItDown(), str(source), output)
+    assert result['preview'] == "# notes.txt\n"
+    with open(output, encoding='utf-8') as f:
+        assert f.read() == "# notes.txt\n"
+
+
+def test_atomic_output(tmp_path):
+    target = str(tmp_path / "a.md")
+    with _atomic_output(target) as f:
+        f.write("内容")
+        assert os.path.exists(_partial_path(target)) and not os.path.exists(target)
+    with open(target, encoding='utf-8') as f:
+        assert f.read() == "内容"
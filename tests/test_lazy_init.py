@@ -0,0 +1,39 @@
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import pytest
+
+from converter import LazyMarkItDown
+
+
+def test_import_does_not_load_converters():
+    code = ("import sys, markitdown_ui; "
+            "print(sorted(name for name in ('markitdown', 'magika', 'onnxruntime', 'openpyxl', 'pdfminer') "
+            "if name in sys.modules))")
+    result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                            cwd=str(Path(__file__).resolve().parents[1]),
+                            env=dict(os.environ, QT_QPA_PLATFORM="offscreen"))
+    assert result.stdout.strip() == "[]"
+
+
+def test_known_formats_skip_markitdown_instance(write_pdf, tmp_path):
+    md = LazyMarkItDown()
+    md.warm_up()
+    result, detection = md.convert_local(str(write_pdf(tmp_path / "a.pdf", 2)))
+    assert detection == 'signature'
+    assert "Page 1" in result.markdown and "Page 2" in result.markdown
+    assert not md.is_ready()
+
+
+def test_import_error_is_reported_once(monkeypatch):
+    monkeypatch.setitem(sys.modules, 'markitdown', None)
+    md = LazyMarkItDown()
+    with pytest.raises(RuntimeError, match="pip install markitdown") as first:
+        md.get()
+    monkeypatch.delitem(sys.modules, 'markitdown')
+    with pytest.raises(RuntimeError) as second:
+        md.get()
+    assert second.value is first.value
+    assert not md.is_ready()
@@ -0,0 +1,106 @@
+"""Excel 转换范围限制：行列数、A1 区域和首尾抽样"""
+import argparse
+
+import pytest
+
+import cli
+import converter
+
+
+@pytest.mark.parametrize("ref, expected", [
+    ("B2:D10", (2, 2, 4, 10)),
+    ("A1", (1, 1, 1, 1)),
+    ("A:C", (1, None, 3, None)),
+    ("2:100", (None, 2, None, 100)),
+    ("$b$2:$aa$3", (2, 2, 27, 3)),
+])
+def test_parse_cell_range(ref, expected):
+    assert converter._parse_cell_range(ref) == expected
+
+
+@pytest.mark.parametrize("ref", ["", ":", "A1:", "1A", "ABCD1", "A1:B2:C3"])
+def test_parse_cell_range_rejects_invalid(ref):
+    with pytest.raises(ValueError):
+        converter._parse_cell_range(ref)
+
+
+def test_normalize_limits_drops_unset_values():
+    assert converter._normalize_limits(None) is None
+    assert converter._normalize_limits({}) is None
+    assert converter._normalize_limits({"max_rows": None, "cell_range": ""}) is None
+    assert converter._normalize_limits({"max_rows": 5, "cell_range": "A1:B2", "tail_rows": None}) == {
+        "max_rows": 5, "cell_range": "A1:B2"}
+
+
+@pytest.mark.parametrize("limits", [
+    {"max_rows": -5},
+    {"max_rows": 0},
+    {"max_columns": "3"},
+    {"tail_rows": 1.5},
+    {"max_rows": True},
+    {"cell_range": 12},
+    {"cell_range": "not a range"},
+    {"rows": 3},
+    [("max_rows", 3)],
+])
+def test_normalize_limits_rejects_invalid(limits):
+    with pytest.raises(ValueError):
+        converter._normalize_limits(limits)
+
+
+@pytest.mark.parametrize("value", ["-5", "0", "abc"])
+def test_cli_rejects_non_positive_limits(value, capsys):
+    with pytest.raises(SystemExit) as exc:
+        cli._build_cli_parser().parse_args(["convert", "x.xlsx", "--max-rows", value])
+    assert exc.value.code == 2
+    assert "--max-rows" in capsys.readouterr().err
+
+
+def test_positive_int():
+    assert cli._positive_int("7") == 7
+    with pytest.raises(argparse.ArgumentTypeError):
+        cli._positive_int("-1")
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    book = openpyxl.Workbook()
+    sheet = book.active
+    sheet.title = "Data"
+    sheet.append(["h1", "h2", "h3"])
+    for i in range(1, 21):
+        sheet.append([i, i * 10, f"r{i}"])
+    path = tmp_path / "limits.xlsx"
+    book.save(path)
+    return str(path)
+
+
+def _table_rows(markdown):
+    return [line for line in markdown.splitlines() if line.startswith("|") and "---" not in line]
+
+
+def _convert(path, limits):
+    return converter._convert_excel_sheets(path, ["Data"], max_workers=1, sheet_cache=False,
+                                           limits=converter._normalize_limits(limits))
+
+
+def test_max_rows_truncates_after_header(workbook):
+    text = _convert(workbook, {"max_rows": 3})
+    assert _table_rows(text) == ["| h1 | h2 | h3 |", "| 1 | 10 | r1 |", "| 2 | 20 | r2 |", "| 3 | 30 | r3 |"]
+    assert "已截断：仅转换前 3 行" in text
+
+
+def test_max_columns(workbook):
+    assert _table_rows(_convert(workbook, {"max_columns": 2, "max_rows": 1})) == ["| h1 | h2 |", "| 1 | 10 |"]
+
+
+def test_cell_range(workbook):
+    assert _table_rows(_convert(workbook, {"cell_range": "B3:C4"})) == ["| 20 | r2 |", "| 30 | r3 |"]
+
+
+def test_head_and_tail_sampling(workbook):
+    text = _convert(workbook, {"max_rows": 2, "tail_rows": 2})
+    assert _table_rows(text) == ["| h1 | h2 | h3 |", "| 1 | 10 | r1 |", "| 2 | 20 | r2 |",
+                                 "| … | … | … |", "| 19 | 190 | r19 |", "| 20 | 200 | r20 |"]
+    assert "省略 16 行" in text
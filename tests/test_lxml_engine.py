@@ -0,0 +1,87 @@
+import datetime
+
+import pytest
+from openpyxl import Workbook
+from openpyxl.cell.rich_text import CellRichText, TextBlock
+from openpyxl.cell.text import InlineFont
+from openpyxl.styles import Font
+
+import converter
+from converter import _LxmlWorksheet, _convert_excel_sheets, _iter_compact_rows, _open_workbook, _xlsx_sheet_parts
+
+
+@pytest.fixture
+def edge_workbook(tmp_path):
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "混合"
+    ws.append(["文本", "整数", "小数", "布尔", "日期", "时间", "公式"])
+    ws.append(["a|b", 1, 1.5, True, datetime.datetime(2024, 2, 29, 13, 45), datetime.time(8, 30), "=B2*2"])
+    ws.append([None, -7, 1e-9, False, datetime.date(1900, 3, 1), None, "=SUM(B2:B3)"])
+    ws.append([])
+    ws.append(["多行\n文本", None, None, None, None, None, "#N/A"])
+    ws["B6"] = 0.25
+    ws["B6"].number_format = "0%"
+    ws["A7"] = CellRichText("普通", TextBlock(InlineFont(b=True), "加粗"))
+    # 远离数据的带格式单元格会把 dimension 放大
+    ws["Z40"].font = Font(bold=True)
+
+    wb.create_sheet("空")
+    sparse = wb.create_sheet("稀疏")
+    sparse["C3"] = "c3"
+    sparse["A10"] = 10
+    sparse["E5"] = None
+    path = tmp_path / "edge.xlsx"
+    wb.save(path)
+    return path
+
+
+def _rows(path, engine, sheet, **bounds):
+    wb = _open_workbook(str(path), engine=engine)
+    try:
+        return [tuple(row) for row in _iter_compact_rows(wb[sheet], **bounds)]
+    finally:
+        wb.close()
+
+
+def test_lxml_worksheet_has_no_cell_iterator(edge_workbook):
+    wb = _open_workbook(str(edge_workbook), engine='lxml')
+    try:
+        sheet = wb["混合"]
+        assert isinstance(sheet, _LxmlWorksheet)
+        assert not hasattr(sheet, 'iter_rows')
+    finally:
+        wb.close()
+
+
+@pytest.mark.parametrize("sheet", ["混合", "空", "稀疏"])
+@pytest.mark.parametrize("bounds", [
+    {},
+    {'min_row': 2, 'max_row': 4},
+    {'min_col': 2, 'max_col': 4},
+    {'min_row': 3, 'max_row': 12, 'min_col': 1, 'max_col': 3},
+])
+def test_row_values_match_openpyxl(edge_workbook, sheet, bounds):
+    assert _rows(edge_workbook, 'lxml', sheet, **bounds) == _rows(edge_workbook, 'openpyxl', sheet, **bounds)
+
+
+@pytest.mark.parametrize("limits", [
+    None,
+    {'max_rows': 2},
+    {'max_columns': 3},
+    {'cell_range': 'B2:D6'},
+    {'max_rows': 1, 'tail_rows': 2},
+])
+def test_markdown_matches_openpyxl(edge_workbook, limits):
+    sheets = list(_xlsx_sheet_parts(str(edge_workbook)))
+    outputs = [_convert_excel_sheets(str(edge_workbook), sheets, max_workers=1, limits=limits,
+                                     sheet_cache=False, engine=engine)
+               for engine in ('openpyxl', 'lxml')]
+    assert outputs[0] == outputs[1]
+    assert "# 稀疏" in outputs[1]
+
+
+def test_engine_setting(monkeypatch):
+    monkeypatch.setattr(converter, "EXCEL_ENGINE", "openpyxl")
+    assert converter._resolve_excel_engine() == 'openpyxl'
+    assert converter._resolve_excel_engine('lxml') == 'lxml'
@@ -0,0 +1,49 @@
+import pytest
+
+import converter
+from converter import DetectionMemo, LazyMarkItDown, _detect_known_format
+
+
+@pytest.fixture
+def text_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_text("# 标题\n\n正文  \n\n\n\n结尾\n", encoding='utf-8')
+    return path
+
+
+def test_detect_known_format(tmp_path, text_file):
+    pdf = tmp_path / "a.pdf"
+    pdf.write_bytes(b"%PDF-1.4\n")
+    fake_pdf = tmp_path / "b.pdf"
+    fake_pdf.write_bytes(b"not a pdf")
+    fake_docx = tmp_path / "c.docx"
+    fake_docx.write_bytes(b"PK\x03\x04broken")
+    assert _detect_known_format(str(pdf)) == 'PdfConverter'
+    assert _detect_known_format(str(fake_pdf)) is None
+    assert _detect_known_format(str(fake_docx)) is None
+    assert _detect_known_format(str(text_file)) is None
+
+
+def test_detection_is_memoized(text_file, monkeypatch):
+    monkeypatch.setattr(converter, "_detection_memo", DetectionMemo())
+    md = LazyMarkItDown()
+    first, detection = md.convert_local(str(text_file))
+    assert detection == 'magika'
+    second, detection = md.convert_local(str(text_file))
+    assert detection == 'memo'
+    assert first.markdown == second.markdown
+    assert "正文" in first.markdown
+
+
+def test_falls_back_without_private_markitdown_api(text_file):
+    class PublicOnly:
+        def convert_stream(self, stream, stream_info=None):
+            self.stream_info = stream_info
+            return stream.read().decode('utf-8')
+
+    md = LazyMarkItDown()
+    md._md = PublicOnly()
+    result, detection = md.convert_local(str(text_file))
+    assert detection == 'markitdown'
+    assert result.startswith("# 标题")
+    assert md._md.stream_info.local_path == str(text_file)
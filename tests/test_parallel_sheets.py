@@ -0,0 +1,52 @@
+import pytest
+from openpyxl import Workbook
+
+import converter
+from converter import _convert_excel_sheets, _excel_sheet_workers
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "S0"
+    for index in range(4):
+        sheet = wb.active if index == 0 else wb.create_sheet(f"S{index}")
+        sheet.append(["编号", "值"])
+        for row in range(20 * (index + 1)):
+            sheet.append([row, f"{index}-{row}"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_sheet_workers(workbook, monkeypatch):
+    assert _excel_sheet_workers(workbook, ["S0", "S1"], None) == 1  # 小文件按顺序转换
+    monkeypatch.setattr(converter, "PARALLEL_SHEETS_MIN_BYTES", 0)
+    assert _excel_sheet_workers(workbook, ["S0", "S1", "S2"], 2) == 2
+    assert _excel_sheet_workers(workbook, ["S0", "S1"], 8) == 2
+    assert _excel_sheet_workers(workbook, ["S0", "S1"], 1) == 1
+    assert _excel_sheet_workers(workbook, ["S0"], 8) == 1
+    assert _excel_sheet_workers("missing.xlsx", ["S0", "S1"], 8) == 1
+
+
+@pytest.mark.parametrize("engine", ["openpyxl", "lxml"])
+def test_parallel_matches_sequential(workbook, monkeypatch, engine):
+    sheets = ["S3", "S0", "不存在", "S2"]
+    expected = _convert_excel_sheets(workbook, sheets, max_workers=1, sheet_cache=False, engine=engine)
+    monkeypatch.setattr(converter, "PARALLEL_SHEETS_MIN_BYTES", 0)
+    events = []
+    markdown = _convert_excel_sheets(workbook, sheets, max_workers=2, sheet_cache=False, engine=engine,
+                                     progress=lambda kind, done, total, **details: events.append((kind, done, total)))
+    assert markdown == expected
+    assert "# 不存在\n\n**错误**" in markdown
+    assert events[-1] == ('sheets', 4, 4)
+
+
+def test_parallel_uses_cached_sheets(workbook, monkeypatch):
+    cache = converter.SheetCache()
+    monkeypatch.setattr(converter, "_sheet_cache", cache)
+    monkeypatch.setattr(converter, "PARALLEL_SHEETS_MIN_BYTES", 0)
+    first = _convert_excel_sheets(workbook, ["S0", "S1"], max_workers=2)
+    second = _convert_excel_sheets(workbook, ["S0", "S1", "S2"], max_workers=2)
+    assert second.startswith(first.rstrip("\n"))
+    assert second == _convert_excel_sheets(workbook, ["S0", "S1", "S2"], max_workers=1, sheet_cache=False)
@@ -0,0 +1,99 @@
+import pytest
+
+import converter
+from converter import (_convert_pdf_pages, _normalize_pages, _parse_page_ranges, _pdf_declared_page_count,
+                       _pdf_page_count, _pdf_page_workers, _select_pages, _uses_pdf_pages)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    ("1-3", [(1, 3)]),
+    ("5", [(5, 5)]),
+    ("-4, 10-", [(1, 4), (10, None)]),
+    ("2～3，7", [(2, 3), (7, 7)]),
+    (" , ", []),
+])
+def test_parse_page_ranges(spec, expected):
+    assert _parse_page_ranges(spec) == expected
+
+
+@pytest.mark.parametrize("spec", ["0", "3-1", "a", "1-2-3", "0-2"])
+def test_parse_page_ranges_rejects(spec):
+    with pytest.raises(ValueError):
+        _parse_page_ranges(spec)
+
+
+@pytest.mark.parametrize("spec, expected", [
+    (None, None), ("", None), ("  ", None), (7, "7"), ("1-3, 5,8-", "1-3,5,8-"), ("-2", "1-2"),
+])
+def test_normalize_pages(spec, expected):
+    assert _normalize_pages(spec) == expected
+
+
+def test_select_pages():
+    assert _select_pages(None, 3) == [1, 2, 3]
+    assert _select_pages("2-,1,2", 4) == [1, 2, 3, 4]
+    assert _select_pages("3-10", 5) == [3, 4, 5]
+    with pytest.raises(ValueError):
+        _select_pages("9-", 5)
+
+
+def test_page_count(write_pdf, tmp_path):
+    path = write_pdf(tmp_path / "a.pdf", 3)
+    assert _pdf_page_count(path) == 3
+
+
+def test_declared_page_count_reads_page_tree_root(write_pdf, tmp_path, monkeypatch):
+    assert _pdf_declared_page_count(write_pdf(tmp_path / "a.pdf", 3)) == 3
+    path = write_pdf(tmp_path / "b.pdf", 2, declared_count=40)
+    monkeypatch.setattr(converter, "_pdf_page_count", lambda filename: pytest.fail("不应遍历页面树"))
+    assert _pdf_declared_page_count(path) == 40
+
+
+def test_page_workers(monkeypatch):
+    monkeypatch.setattr(converter.os, "cpu_count", lambda: 8)
+    assert _pdf_page_workers(400, None) == 8
+    assert _pdf_page_workers(400, 1) == 1
+    assert _pdf_page_workers(8, None) == 1
+
+
+def test_page_workers_single_cpu(monkeypatch):
+    monkeypatch.setattr(converter.os, "cpu_count", lambda: 1)
+    assert _pdf_page_workers(400, None) == 1
+    assert _pdf_page_workers(400, 8) == 1
+
+
+def test_uses_pdf_pages_gating(write_pdf, tmp_path, monkeypatch):
+    large = write_pdf(tmp_path / "large.pdf", 20)
+    small = write_pdf(tmp_path / "small.pdf", 2)
+    monkeypatch.setattr(converter.os, "cpu_count", lambda: 4)
+    assert _uses_pdf_pages(str(large), None, None)
+    assert not _uses_pdf_pages(str(small), None, None)
+    assert not _uses_pdf_pages(str(large), None, 1)
+    assert _uses_pdf_pages(str(small), "1", 1)
+    assert not _uses_pdf_pages("https://example.com/a.pdf", None, None)
+
+
+def test_uses_pdf_pages_fallbacks(write_pdf, tmp_path, monkeypatch):
+    large = write_pdf(tmp_path / "large.pdf", 2, declared_count=100)
+    monkeypatch.setattr(converter.os, "cpu_count", lambda: 1)
+    assert not _uses_pdf_pages(str(large), None, None)
+    assert not _uses_pdf_pages(str(large), None, 4)
+
+    monkeypatch.setattr(converter.os, "cpu_count", lambda: 4)
+    monkeypatch.setattr(converter, "_pdf_converter_helpers", lambda: None)
+    assert not _uses_pdf_pages(str(large), None, None)
+    assert _uses_pdf_pages(str(large), "1-2", None)
+
+
+def test_convert_pages(write_pdf, tmp_path):
+    path = write_pdf(tmp_path / "a.pdf", 4)
+    markdown = _convert_pdf_pages(str(path), "2-3", max_workers=1)
+    assert "Page 2" in markdown and "Page 3" in markdown
+    assert "Page 1" not in markdown and "Page 4" not in markdown
+
+
+def test_convert_pages_without_pdf_converter_internals(write_pdf, tmp_path, monkeypatch):
+    path = write_pdf(tmp_path / "a.pdf", 3)
+    expected = _convert_pdf_pages(str(path), "1-2", max_workers=1)
+    monkeypatch.setattr(converter, "_pdf_converter_helpers", lambda: None)
+    assert _convert_pdf_pages(str(path), "1-2", max_workers=1) == expected
@@ -0,0 +1,56 @@
+import threading
+
+import pdfminer.high_level
+from pdfminer.pdfinterp import PDFPageInterpreter
+from pdfminer.pdfpage import PDFPage
+
+from converter import _pdf_page_progress
+
+
+def test_reports_pages_of_each_pass(write_pdf, tmp_path):
+    path = write_pdf(tmp_path / "a.pdf", 3)
+    events = []
+    with _pdf_page_progress(lambda kind, done, total, **details: events.append((done, total, details))):
+        pdfminer.high_level.extract_text(str(path))
+        pdfminer.high_level.extract_text(str(path))
+    assert events == [(1, 3, {'pass_no': 1}), (2, 3, {'pass_no': 1}), (3, 3, {'pass_no': 1}),
+                      (1, 3, {'pass_no': 2}), (2, 3, {'pass_no': 2}), (3, 3, {'pass_no': 2})]
+
+    pdfminer.high_level.extract_text(str(path))
+    assert len(events) == 6
+
+
+def test_hooks_are_installed_once(write_pdf, tmp_path):
+    path = write_pdf(tmp_path / "a.pdf", 1)
+    with _pdf_page_progress(lambda *args, **kwargs: None):
+        pdfminer.high_level.extract_text(str(path))
+    hooks = (PDFPage.__dict__['create_pages'], PDFPageInterpreter.process_page)
+    with _pdf_page_progress(lambda *args, **kwargs: None):
+        pdfminer.high_level.extract_text(str(path))
+    assert (PDFPage.__dict__['create_pages'], PDFPageInterpreter.process_page) == hooks
+
+
+def test_concurrent_conversions_are_counted_separately(write_pdf, tmp_path):
+    sizes = {'a': 5, 'b': 9, 'c': 2}
+    paths = {name: write_pdf(tmp_path / f"{name}.pdf", count) for name, count in sizes.items()}
+    events = {name: [] for name in sizes}
+    barrier = threading.Barrier(len(sizes))
+    errors = []
+
+    def run(name):
+        try:
+            with _pdf_page_progress(lambda kind, done, total, **details: events[name].append((done, total))):
+                barrier.wait()
+                for _ in range(3):
+                    pdfminer.high_level.extract_text(str(paths[name]))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=run, args=(name,)) for name in sizes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    for name, count in sizes.items():
+        assert events[name] == [(done, count) for done in range(1, count + 1)] * 3
@@ -0,0 +1,73 @@
+import os
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen")
+
+from PySide6.QtWidgets import QApplication
+
+import markitdown_ui
+from markitdown_ui import DragDropTextEdit
+
+
+@pytest.fixture(scope="module")
+def app():
+    return QApplication.instance() or QApplication([])
+
+
+@pytest.fixture
+def viewer(app, monkeypatch):
+    monkeypatch.setattr(markitdown_ui, "LARGE_RESULT_CHARS", 100)
+    monkeypatch.setattr(markitdown_ui, "RESULT_CHUNK_CHARS", 40)
+    edit = DragDropTextEdit()
+    events = []
+    edit.loaded_changed.connect(lambda loaded, total: events.append((loaded, total)))
+    edit.events = events
+    yield edit
+    edit.deleteLater()
+
+
+def test_small_result_loads_at_once(viewer):
+    viewer.set_result_text("| a |\n| b |\n")
+    assert viewer.toPlainText() == "| a |\n| b |\n"
+    assert not viewer.is_partial()
+    assert viewer.events == [(12, 12)]
+
+
+def test_large_result_loads_first_chunk_at_line_boundary(viewer):
+    text = "".join(f"| row {i:03d} |\n" for i in range(20))  # 每行 12 字符
+    viewer.set_result_text(text)
+    assert viewer.is_partial()
+    shown = viewer.toPlainText()
+    assert shown == text[:36]
+    assert viewer.events[-1] == (36, len(text))
+
+
+def test_scrolling_to_bottom_loads_remaining_chunks(viewer):
+    text = "".join(f"| row {i:03d} |\n" for i in range(20))
+    viewer.set_result_text(text)
+    for _ in range(len(text)):
+        if not viewer.is_partial():
+            break
+        scroll_bar = viewer.verticalScrollBar()
+        viewer._load_more_if_needed(scroll_bar.maximum())
+    assert not viewer.is_partial()
+    assert viewer.toPlainText() == text
+    assert viewer.events[-1] == (len(text), len(text))
+
+
+def test_scrolling_away_from_bottom_keeps_partial(viewer):
+    text = "x" * 150
+    viewer.set_result_text(text)
+    scroll_bar = viewer.verticalScrollBar()
+    scroll_bar.setMaximum(1000)
+    viewer._load_more_if_needed(0)
+    assert viewer.events[-1] == (40, 150)
+
+
+def test_clear_resets_state(viewer):
+    viewer.set_result_text("y" * 150)
+    viewer.clear()
+    assert not viewer.is_partial()
+    assert viewer.toPlainText() == ""
+    assert viewer.events[-1] == (0, 0)
@@ -0,0 +1,81 @@
+import pytest
+from openpyxl import Workbook
+
+import converter
+from converter import SheetCache, _convert_excel_sheets
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "一"
+    wb.active.append(["a", 1])
+    wb.create_sheet("二").append(["b", 2])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+@pytest.fixture
+def cache(monkeypatch):
+    cache = SheetCache()
+    monkeypatch.setattr(converter, "_sheet_cache", cache)
+    return cache
+
+
+def test_memory_lru():
+    cache = SheetCache(max_chars=10)
+    cache.put("h", "s1", None, "aaaa")
+    cache.put("h", "s2", None, "bbbb")
+    assert cache.get("h", "s1") == "aaaa"
+    cache.put("h", "s3", None, "cccc")
+    assert cache.get("h", "s2") is None
+    assert cache.get("h", "s1") == "aaaa" and cache.get("h", "s3") == "cccc"
+
+
+def test_key_includes_limits():
+    cache = SheetCache()
+    cache.put("h", "s", {'max_rows': 5}, "前5行")
+    assert cache.get("h", "s") is None
+    assert cache.get("h", "s", {'max_rows': 5}) == "前5行"
+
+
+def test_persistent_store(tmp_path):
+    SheetCache(persistent_dir=tmp_path / "sheets").put("h", "s", None, "内容")
+    reopened = SheetCache(persistent_dir=tmp_path / "sheets")
+    assert reopened.get("h", "s") == "内容"
+
+
+def test_workbook_hash_follows_content(workbook, tmp_path):
+    cache = SheetCache()
+    digest = cache.workbook_hash(workbook)
+    other = tmp_path / "other.xlsx"
+    other.write_bytes(open(workbook, 'rb').read())
+    assert cache.workbook_hash(str(other)) == digest
+
+
+def test_reconversion_reads_only_missing_sheets(workbook, cache, monkeypatch):
+    first = _convert_excel_sheets(workbook, ["一"], max_workers=1)
+    opened = []
+    original = converter._open_workbook
+
+    def open_workbook(filename, engine=None):
+        opened.append(filename)
+        return original(filename, engine)
+
+    monkeypatch.setattr(converter, "_open_workbook", open_workbook)
+    assert _convert_excel_sheets(workbook, ["一"], max_workers=1) == first
+    assert opened == []
+    both = _convert_excel_sheets(workbook, ["一", "二"], max_workers=1)
+    assert both.startswith(first.rstrip("\n")) and "# 二" in both
+    assert opened == [workbook]
+    assert both == _convert_excel_sheets(workbook, ["一", "二"], max_workers=1, sheet_cache=False)
+
+
+def test_changed_workbook_is_reconverted(workbook, cache):
+    _convert_excel_sheets(workbook, ["一"], max_workers=1)
+    wb = Workbook()
+    wb.active.title = "一"
+    wb.active.append(["changed", 3])
+    wb.save(workbook)
+    assert "changed" in _convert_excel_sheets(workbook, ["一"], max_workers=1)
@@ -0,0 +1,52 @@
+import re
+
+import openpyxl
+import pytest
+from openpyxl import Workbook
+
+from converter import _read_dimension, _xlsx_sheet_info, _xlsx_sheet_parts
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "概要"
+    for row in range(3):
+        wb.active.append([row, row * 2])
+    detail = wb.create_sheet("明细 2024")
+    detail["C5"] = "x"
+    wb.create_sheet("空白")
+    wb.move_sheet("空白", offset=-2)
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def test_sheet_parts_follow_workbook_order(workbook):
+    parts = _xlsx_sheet_parts(workbook)
+    assert list(parts) == openpyxl.load_workbook(workbook, read_only=True).sheetnames == ["空白", "概要", "明细 2024"]
+    assert all(path.startswith("xl/worksheets/") for path in parts.values())
+
+
+def test_sheet_info_reads_dimensions(workbook):
+    info = {sheet['name']: sheet for sheet in _xlsx_sheet_info(workbook)}
+    assert (info["概要"]['rows'], info["概要"]['columns']) == (3, 2)
+    assert (info["明细 2024"]['rows'], info["明细 2024"]['columns']) == (1, 1)
+    assert all(sheet['size'] > 0 for sheet in info.values())
+
+
+def test_sheet_info_without_dimension(workbook, rewrite_member):
+    path = _xlsx_sheet_parts(workbook)["概要"]
+    rewrite_member(workbook, path, lambda data: re.sub(rb'<dimension ref="[^"]*"/>', b'', data))
+    info = {sheet['name']: sheet for sheet in _xlsx_sheet_info(workbook)}
+    assert info["概要"]['rows'] is None and info["概要"]['columns'] is None
+
+
+def test_read_dimension(tmp_path):
+    source = tmp_path / "sheet.xml"
+    source.write_bytes(b'<worksheet xmlns="x"><x:dimension ref="B2:D10"/><sheetData/></worksheet>')
+    with open(source, 'rb') as f:
+        assert _read_dimension(f) == (2, 2, 4, 10)
+    source.write_bytes(b'<worksheet><sheetData/></worksheet>')
+    with open(source, 'rb') as f:
+        assert _read_dimension(f) is None
@@ -0,0 +1,58 @@
+import json
+
+from converter import Tracer, _write_trace_log
+
+
+def test_spans_nest():
+    tracer = Tracer("t1")
+    with tracer.span('excel.convert', sheets=2) as attributes:
+        with tracer.span('sheet.read'):
+            pass
+        tracer.add('sheet.assemble', 0.25, rows=10)
+        attributes['workers'] = 1
+    outer, read, assemble = tracer.spans
+    assert outer['parent'] is None and outer['attributes'] == {'sheets': 2, 'workers': 1}
+    assert read['parent'] == assemble['parent'] == outer['id']
+    assert assemble['duration'] == 0.25 and assemble['attributes'] == {'rows': 10}
+    assert tracer.total('sheet.assemble') == 0.25
+
+
+def test_extend_reparents_child_spans():
+    child = Tracer()
+    with child.span('pdf.pages'):
+        with child.span('inner'):
+            pass
+    tracer = Tracer()
+    with tracer.span('pdf.convert'):
+        tracer.extend(child.spans)
+    parent, pages, inner = tracer.spans
+    assert pages['id'] == 1 and pages['parent'] == parent['id']
+    assert inner['id'] == 2 and inner['parent'] == pages['id']
+    assert child.spans[0]['id'] == 0
+
+
+def test_summary_lists_known_stages():
+    tracer = Tracer()
+    tracer.add('workbook.open', 0.1)
+    tracer.add('sheet.read', 1.2)
+    tracer.add('custom', 5.0)
+    assert tracer.summary() == "总计 6.30s（打开工作簿 0.10s，读取 1.20s）"
+    assert Tracer().summary() == "总计 0.00s"
+
+
+def test_write_jsonl_appends(tmp_path):
+    path = tmp_path / "trace.jsonl"
+    for trace_id in ("a", "b"):
+        tracer = Tracer(trace_id)
+        with tracer.span('save', path=path):
+            pass
+        _write_trace_log(tracer, str(path))
+    records = [json.loads(line) for line in path.read_text(encoding='utf-8').splitlines()]
+    assert [record['trace_id'] for record in records] == ["a", "b"]
+    assert records[0]['attributes']['path'] == str(path)
+
+
+def test_write_errors_are_ignored(tmp_path):
+    tracer = Tracer()
+    tracer.add('save', 0.1)
+    _write_trace_log(tracer, str(tmp_path / "missing" / "trace.jsonl"))
@@ -0,0 +1,94 @@
+import os
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from converter import HostRateLimiter, UrlFetcher, _fetched_response
+
+BODY = "<html><head><title>页面</title></head><body><h1>标题</h1><p>正文</p></body></html>".encode('utf-8')
+
+
+class Handler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.server.requests.append(dict(self.headers))
+        if self.path == "/nostore":
+            self._send_body({"Cache-Control": "no-store", "ETag": '"v1"'})
+        elif self.headers.get("If-None-Match") == '"v1"':
+            self.send_response(304)
+            self.end_headers()
+        else:
+            self._send_body({"ETag": '"v1"'})
+
+    def _send_body(self, headers):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/html; charset=utf-8")
+        self.send_header("Content-Length", str(len(BODY)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(BODY)
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    server.requests = []
+    threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fetcher(tmp_path):
+    return UrlFetcher(cache_dir=tmp_path / "http", limiter=HostRateLimiter(min_interval=0))
+
+
+def _url(server, path="/page"):
+    return "http://%s:%d%s" % (*server.server_address, path)
+
+
+def test_revalidates_with_etag(server, fetcher):
+    first = fetcher.fetch(_url(server))
+    assert first['status'] == 'downloaded' and first['size'] == len(BODY)
+    second = fetcher.fetch(_url(server))
+    assert second['status'] == 'not_modified'
+    assert server.requests[1].get("If-None-Match") == '"v1"'
+    with open(second['body_path'], 'rb') as f:
+        assert f.read() == BODY
+
+    assert fetcher.fetch(_url(server), max_age=3600)['status'] == 'fresh'
+    assert len(server.requests) == 2
+
+
+def test_no_store_is_not_revalidated(server, fetcher):
+    fetcher.fetch(_url(server, "/nostore"))
+    assert fetcher.fetch(_url(server, "/nostore"))['status'] == 'downloaded'
+    assert "If-None-Match" not in server.requests[1]
+
+
+def test_progress_reports_bytes(server, fetcher):
+    events = []
+    fetcher.fetch(_url(server), progress=lambda kind, done, total, **_: events.append((kind, done, total)))
+    assert events[-1] == ('bytes', len(BODY), len(BODY))
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="需要 /proc/self/fd")
+def test_fetched_response_does_not_hold_file(server, fetcher):
+    fetched = fetcher.fetch(_url(server))
+    before = len(os.listdir("/proc/self/fd"))
+    response = _fetched_response(fetched)
+    assert len(os.listdir("/proc/self/fd")) == before
+    assert b"".join(response.iter_content(chunk_size=7)) == BODY
+    assert response.headers['content-type'].startswith("text/html")
+    response.close()
+
+
+def test_fetched_response_converts(server, fetcher):
+    from markitdown import MarkItDown
+    result = MarkItDown().convert_response(_fetched_response(fetcher.fetch(_url(server))))
+    assert "# 标题" in result.markdown
@@ -0,0 +1,61 @@
+import re
+
+import pytest
+from openpyxl import Workbook
+
+from converter import _convert_excel_sheets, _open_workbook, _xlsx_sheet_parts
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    sheet = wb.active
+    sheet.title = "数据"
+    sheet.append(["名称", "数量", "备注"])
+    sheet.append(["甲", 1])
+    sheet.append(["乙", 2, "短"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def _set_dimension(workbook, rewrite_member, ref):
+    replacement = f'<dimension ref="{ref}"/>'.encode('ascii') if ref else b''
+    rewrite_member(workbook, _xlsx_sheet_parts(workbook)["数据"],
+                   lambda data: re.sub(rb'<dimension ref="[^"]*"/>', replacement, data))
+
+
+def _convert(workbook, engine):
+    return _convert_excel_sheets(workbook, ["数据"], max_workers=1, sheet_cache=False, engine=engine)
+
+
+@pytest.mark.parametrize("engine", ["openpyxl", "lxml"])
+@pytest.mark.parametrize("ref", ["A1:XFD1048576", "A1:Z3", None])
+def test_table_uses_real_used_range(workbook, rewrite_member, engine, ref):
+    expected = _convert(workbook, engine)
+    _set_dimension(workbook, rewrite_member, ref)
+    markdown = _convert(workbook, engine)
+    assert markdown == expected
+    assert "| 名称 | 数量 | 备注 |\n| --- | --- | --- |\n| 甲 | 1 |  |\n| 乙 | 2 | 短 |" in markdown
+
+
+@pytest.mark.parametrize("engine", ["openpyxl", "lxml"])
+def test_open_reads_dimension_only(workbook, rewrite_member, engine):
+    _set_dimension(workbook, rewrite_member, "B2:D9")
+    wb = _open_workbook(workbook, engine=engine)
+    try:
+        sheet = wb["数据"]
+        assert (sheet.min_column, sheet.min_row, sheet.max_column, sheet.max_row) == (2, 2, 4, 9)
+    finally:
+        wb.close()
+
+
+def test_open_leaves_openpyxl_unpatched(workbook):
+    from openpyxl.worksheet._read_only import ReadOnlyWorksheet
+    get_size = ReadOnlyWorksheet._get_size
+    wb = _open_workbook(workbook, engine="openpyxl")
+    try:
+        assert isinstance(wb["数据"], ReadOnlyWorksheet)
+        assert ReadOnlyWorksheet._get_size is get_size
+    finally:
+        wb.close()
@@ -0,0 +1,89 @@
+import json
+import os
+import time
+
+import pytest
+from openpyxl import Workbook
+
+from converter import WATCH_MANIFEST_NAME, FolderWatcher
+
+
+def _workbook(path, value):
+    wb = Workbook()
+    wb.active.append(["值", "说明"])
+    wb.active.append([value, "行"])
+    wb.save(path)
+
+
+@pytest.fixture
+def folder(tmp_path):
+    root = tmp_path / "watched"
+    (root / "sub").mkdir(parents=True)
+    (root / ".hidden").mkdir()
+    _workbook(root / "a.xlsx", 1)
+    _workbook(root / "sub" / "b.xlsx", 2)
+    _workbook(root / ".hidden" / "c.xlsx", 3)
+    _workbook(root / "~$a.xlsx", 4)
+    (root / "skip.bin").write_bytes(b"\0")
+    return root
+
+
+def _run_until(watcher, done):
+    events = []
+    deadline = time.monotonic() + 60
+    watcher.run(events.append, should_stop=lambda: done(events) or time.monotonic() > deadline)
+    return events
+
+
+def _kinds(events, kind):
+    return sorted(os.path.basename(event['source']) for event in events if event['event'] == kind)
+
+
+def test_ready_files_waits_for_debounce(folder):
+    watcher = FolderWatcher(str(folder), debounce=2.0)
+    assert watcher._ready_files(100.0) == ([], [])
+    assert sorted(watcher._pending) == ["a.xlsx", os.path.join("sub", "b.xlsx")]
+    assert watcher._ready_files(101.0)[0] == []
+    _workbook(folder / "a.xlsx", 10)  # 仍在写入的文件重新计时
+    os.utime(folder / "a.xlsx", ns=(1, 1))
+    assert watcher._ready_files(102.5)[0] == [os.path.join("sub", "b.xlsx")]
+    assert watcher._ready_files(104.5)[0] == ["a.xlsx", os.path.join("sub", "b.xlsx")]
+
+
+def test_output_paths_keep_structure(folder, tmp_path):
+    (folder / "a.csv").write_text("x,y\n", encoding='utf-8')
+    watcher = FolderWatcher(str(folder), str(tmp_path / "out"))
+    assert watcher._output_path(os.path.join("sub", "b.xlsx")) == str(tmp_path / "out" / "sub" / "b.md")
+    watcher.manifest["a.xlsx"] = {'output': str(tmp_path / "out" / "a.md")}
+    assert watcher._output_path("a.csv") == str(tmp_path / "out" / "a.csv.md")
+
+
+def test_incremental_reconversion(folder, tmp_path):
+    out = tmp_path / "out"
+    options = dict(output_dir=str(out), max_workers=1, poll_interval=0.05, debounce=0)
+    events = _run_until(FolderWatcher(str(folder), **options), lambda events: len(_kinds(events, 'converted')) == 2)
+    assert _kinds(events, 'converted') == ["a.xlsx", "b.xlsx"]
+    assert (out / "sub" / "b.md").read_text(encoding='utf-8').count("| 2 | 行 |") == 1
+    manifest = json.loads((out / WATCH_MANIFEST_NAME).read_text(encoding='utf-8'))
+    assert sorted(manifest['files']) == ["a.xlsx", os.path.join("sub", "b.xlsx")]
+
+    # 重启后：只改了修改时间的文件不重新转换，内容变化的重新转换，删除的从清单中移除
+    os.utime(folder / "a.xlsx", ns=(1, 1))
+    _workbook(folder / "sub" / "b.xlsx", 20)
+    (folder / "new.xlsx").write_bytes((folder / "a.xlsx").read_bytes())
+    events = _run_until(FolderWatcher(str(folder), **options),
+                        lambda events: len(_kinds(events, 'converted') + _kinds(events, 'unchanged')) == 3)
+    assert _kinds(events, 'unchanged') == ["a.xlsx"]
+    assert _kinds(events, 'converted') == ["b.xlsx", "new.xlsx"]
+    assert "| 20 | 行 |" in (out / "sub" / "b.md").read_text(encoding='utf-8')
+
+    os.remove(folder / "new.xlsx")
+    events = _run_until(FolderWatcher(str(folder), **options), lambda events: bool(_kinds(events, 'removed')))
+    assert _kinds(events, 'removed') == ["new.xlsx"]
+    manifest = json.loads((out / WATCH_MANIFEST_NAME).read_text(encoding='utf-8'))
+    assert "new.xlsx" not in manifest['files']
+
+
+def test_ignores_manifest_of_other_version(folder):
+    (folder / WATCH_MANIFEST_NAME).write_text(json.dumps({'version': -1, 'files': {'a.xlsx': {}}}), encoding='utf-8')
+    assert FolderWatcher(str(folder)).manifest == {}
@@ -0,0 +1,93 @@
+import threading
+import time
+
+import pytest
+from openpyxl import Workbook
+
+from converter import ConversionCancelled, ConversionPool, ConversionProcess
+
+
+@pytest.fixture
+def workbook(tmp_path):
+    wb = Workbook()
+    wb.active.title = "表"
+    wb.active.append(["a", "b"])
+    path = tmp_path / "book.xlsx"
+    wb.save(path)
+    return str(path)
+
+
+def _request(workbook):
+    return dict(source=workbook, excel_file=workbook, selected_sheets=["表"], sheet_cache=False)
+
+
+def _wait_for(condition, seconds=30):
+    deadline = time.monotonic() + seconds
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return condition()
+
+
+def test_recycles_after_max_jobs(workbook):
+    process = ConversionProcess(max_jobs=2, max_rss=0)
+    try:
+        process.convert(**_request(workbook))
+        pid = process.stats()['pid']
+        assert process.stats()['jobs'] == 1
+        process.convert(**_request(workbook))
+        assert process.stats()['recycled'] == 1
+        # 新进程在后台启动并预热
+        assert _wait_for(lambda: process.stats()['pid'] not in (None, pid))
+        process.convert(**_request(workbook))
+        assert process.stats()['jobs'] == 1
+    finally:
+        process.shutdown()
+
+
+def test_recycles_above_memory_cap(workbook):
+    process = ConversionProcess(max_jobs=0, max_rss=1)
+    try:
+        assert process.convert(**_request(workbook)).startswith("# 表")
+        assert process.stats()['recycled'] == 1 and process.stats()['retried'] == 0
+    finally:
+        process.shutdown()
+
+
+def test_pool_counts_jobs(workbook, tmp_path):
+    pool = ConversionPool(2, max_jobs=0, max_rss=0)
+    try:
+        errors = []
+
+        def convert(request):
+            try:
+                pool.convert(**request)
+            except Exception as e:
+                errors.append(e)
+
+        requests = [_request(workbook), _request(workbook), {'source': str(tmp_path / "missing.docx")}]
+        threads = [threading.Thread(target=convert, args=(request,)) for request in requests]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        stats = pool.stats()
+        assert (stats['completed'], stats['failed'], stats['queued'], stats['active']) == (2, 1, 0, 0)
+        assert len(errors) == 1
+        assert len(stats['worker_stats']) == 2 and stats['ready'] >= 1
+    finally:
+        pool.shutdown()
+
+
+def test_pool_cancels_queued_job(workbook):
+    pool = ConversionPool(1, max_jobs=0, max_rss=0)
+    try:
+        busy = pool._idle.get()
+        cancel_event = threading.Event()
+        timer = threading.Timer(0.3, cancel_event.set)
+        timer.start()
+        with pytest.raises(ConversionCancelled):
+            pool.convert(cancel_event=cancel_event, **_request(workbook))
+        assert pool.stats()['queued'] == 0
+        pool._idle.put(busy)
+    finally:
+        pool.shutdown()